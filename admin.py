@@ -694,6 +694,9 @@ def update_elo_score():
         old_score = model.elo_score
         model.elo_score = elo_score
         db.session.commit()
+        if old_score != elo_score:
+            from catalog_changelog import UPDATED, publish_catalog_changes
+            publish_catalog_changes({model_id: UPDATED})
         
         # Log the change
         logger.info(f"ELO score updated for {model_id}: {old_score} -> {elo_score} by {current_user.email}")
@@ -733,8 +736,12 @@ def reset_all_elo_scores():
         ).count()
         
         # Reset all ELO scores to NULL
+        reset_ids = [model_id for (model_id,) in db.session.query(OpenRouterModel.model_id)
+                     .filter(OpenRouterModel.elo_score.isnot(None))]
         OpenRouterModel.query.update({OpenRouterModel.elo_score: None})
         db.session.commit()
+        from catalog_changelog import UPDATED, publish_catalog_changes
+        publish_catalog_changes({model_id: UPDATED for model_id in reset_ids})
         
         # Log the action
         logger.info(f"All ELO scores reset to NULL by {current_user.email}. {models_with_elo} models affected.")
@@ -180,6 +180,11 @@ class UserModelView(SecureModelView):
     # Disable user creation/deletion from admin
     can_create = False
     can_delete = False
+    
+    def after_model_change(self, form, model, is_created):
+        """An edit may change credits or cached flags; drop the user's cached copies"""
+        from billing import invalidate_cached_balance
+        invalidate_cached_balance(model.id)
 
 class AffiliateModelView(SecureModelView):
     """Affiliate model admin view"""
@@ -6,9 +6,14 @@ optimizing performance for repetitive API calls and reducing
 the load on external services.
 """
 
+import os
 import json
+import math
+import uuid
+import random
 import hashlib
 import logging
+import threading
 import time
 from functools import wraps
 from typing import Dict, Any, Optional, Callable, TypeVar, List, Union
@@ -16,6 +21,7 @@ from typing import Dict, Any, Optional, Callable, TypeVar, List, Union
 from flask import Flask, request, g
 from werkzeug.local import LocalProxy
 
+from metrics import registry
 from redis_cache import RedisCache, handle_redis_error
 
 # Configure logging
@@ -25,6 +31,68 @@ logger = logging.getLogger(__name__)
 # Type vars for better typing support
 ResponseT = TypeVar('ResponseT')
 
+# XFetch early recomputation: higher beta recomputes earlier (1.0 is the paper's default)
+XFETCH_BETA = float(os.environ.get('API_CACHE_XFETCH_BETA', '1.0'))
+
+# Single-flight: how long a recompute may hold a key's lock, and how often
+# callers in other processes check whether the value has arrived
+SINGLE_FLIGHT_LOCK_TTL = float(os.environ.get('API_CACHE_LOCK_TTL', '30'))
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+# Marks values stored with recompute metadata; plain values from older code are still read
+_ENVELOPE_MARKER = '__xfetch__'
+
+# Raw Redis keys holding model pricing responses (written by app.py and price_updater.py)
+MODEL_RESPONSE_KEYS = ('cache:pricing_data', 'cache:pricing_table_data')
+
+# key_extractor values of ApiCache entries holding model responses
+MODEL_CACHE_ENTRIES = ('model_pricing',)
+
+# Deletes a lock only if it still holds our token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _Flight:
+    """A recompute in progress in this process, shared by callers for the same key"""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def should_recompute_early(delta: float, expires_at: float, now: Optional[float] = None,
+                           beta: float = XFETCH_BETA, rand: Callable[[], float] = random.random) -> bool:
+    """
+    XFetch: decide whether to refresh a still-valid value before it expires.
+
+    The closer the value is to expiry and the longer it took to compute, the
+    more likely a caller volunteers to recompute it, so refreshes are spread
+    out instead of all landing at the moment of expiry.
+
+    Args:
+        delta: Seconds the last recompute took
+        expires_at: Unix time the value expires
+        now: Current Unix time
+        beta: Eagerness factor
+        rand: Uniform (0, 1] random source
+
+    Returns:
+        bool: True if this caller should recompute now
+    """
+    if now is None:
+        now = time.time()
+    if delta <= 0:
+        return now >= expires_at
+    return now - delta * beta * math.log(max(rand(), 1e-12)) >= expires_at
+
 class ApiCache:
     """Redis-backed API cache for optimizing API responses"""
     
@@ -44,7 +112,8 @@ class ApiCache:
         
         # Initialize Redis with error handling
         try:
-            self.redis = RedisCache(namespace=namespace, expire_time=default_ttl)
+            # API responses are read-only once cached, so hot keys are also kept in process
+            self.redis = RedisCache(namespace=namespace, expire_time=default_ttl, local_cache=True)
             
             # Verify Redis connection by checking for required methods
             if not hasattr(self.redis, 'get') or not callable(getattr(self.redis, 'get')):
@@ -70,6 +139,10 @@ class ApiCache:
             'gpt-3.5-turbo': 1800,    # GPT-3.5 Turbo: 30 minutes
         }
         
+        # Recomputes in progress in this process, by cache key
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        
     def _generate_cache_key(self, *args, **kwargs) -> str:
         """
         Generate a cache key based on function arguments
@@ -131,6 +204,171 @@ class ApiCache:
         # Default TTL
         return self.default_ttl
     
+    def _read_entry(self, cache_key: str):
+        """
+        Read a cached value and its recompute metadata
+        
+        Returns:
+            tuple: (value, delta, expires_at), or None on a miss. Values written
+            without metadata are reported with delta 0 and no expiry.
+        """
+        if not self.redis:
+            return None
+        try:
+            cached = self.redis.get(cache_key)
+        except Exception as e:
+            logger.debug(f"Redis get operation failed: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        if isinstance(cached, dict) and cached.get(_ENVELOPE_MARKER):
+            return cached.get('value'), cached.get('delta', 0), cached.get('expires_at', float('inf'))
+        return cached, 0, float('inf')
+    
+    def _store_entry(self, cache_key: str, value: Any, delta: float, cache_ttl: int):
+        """Store a value with the time it took to compute and when it expires"""
+        if not self.redis:
+            return
+        envelope = {
+            _ENVELOPE_MARKER: 1,
+            'value': value,
+            'delta': delta,
+            'expires_at': time.time() + cache_ttl
+        }
+        try:
+            self.redis.set(cache_key, envelope, expire=cache_ttl)
+            logger.debug(f"Cached result with key: {cache_key}, TTL: {cache_ttl}s")
+        except Exception as e:
+            logger.debug(f"Redis set operation failed: {str(e)}")
+    
+    def _try_lock(self, cache_key: str) -> Optional[str]:
+        """
+        Take the cluster-wide recompute lock for a key
+        
+        Returns:
+            str: Lock token if acquired (or if Redis is unavailable), None if
+            another process holds it
+        """
+        token = uuid.uuid4().hex
+        client = self.redis.redis_client if self.redis else None
+        if client is None:
+            return token
+        try:
+            lock_key = self.redis._get_full_key(f"lock:{cache_key}")
+            if client.set(lock_key, token, nx=True, px=int(SINGLE_FLIGHT_LOCK_TTL * 1000)):
+                return token
+            return None
+        except Exception as e:
+            logger.debug(f"Redis lock operation failed: {str(e)}")
+            return token
+    
+    def _release_lock(self, cache_key: str, token: str):
+        """Release a recompute lock if we still hold it"""
+        client = self.redis.redis_client if self.redis else None
+        if client is None:
+            return
+        try:
+            client.eval(_RELEASE_LOCK_SCRIPT, 1, self.redis._get_full_key(f"lock:{cache_key}"), token)
+        except Exception as e:
+            logger.debug(f"Redis unlock operation failed: {str(e)}")
+    
+    def _recompute(self, cache_key: str, cache_ttl: int, compute: Callable[[], Any]) -> Any:
+        """Run the wrapped function and cache its result with its compute time"""
+        start_time = time.time()
+        result = compute()
+        delta = time.time() - start_time
+        logger.debug(f"API call took {delta:.3f}s")
+        self._store_entry(cache_key, result, delta, cache_ttl)
+        return result
+    
+    def _fill_miss(self, cache_key: str, cache_ttl: int, compute: Callable[[], Any]) -> Any:
+        """
+        Fill a missing key with one recompute across all processes: the lock
+        holder computes, everyone else polls Redis for the value it writes
+        """
+        deadline = time.time() + SINGLE_FLIGHT_LOCK_TTL
+        while True:
+            token = self._try_lock(cache_key)
+            if token is not None:
+                try:
+                    return self._recompute(cache_key, cache_ttl, compute)
+                finally:
+                    self._release_lock(cache_key, token)
+            
+            time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+            entry = self._read_entry(cache_key)
+            if entry is not None:
+                registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='coalesced')
+                return entry[0]
+            if time.time() >= deadline:
+                logger.warning(f"Timed out waiting for recompute of {cache_key}, computing directly")
+                return compute()
+    
+    def _get_or_compute(self, cache_key: str, cache_ttl: int, compute: Callable[[], Any]) -> Any:
+        """
+        Serve a key from the cache with stampede protection
+        
+        Hits are served directly, except that one caller may refresh the value
+        early (XFetch) while the others keep serving it. On a miss, callers in
+        this process share one recompute, and processes share one through a
+        Redis lock, so a burst at expiry runs the wrapped function once.
+        
+        Args:
+            cache_key: Cache key
+            cache_ttl: TTL in seconds for a recomputed value
+            compute: Calls the wrapped function
+            
+        Returns:
+            The cached or freshly computed value
+        """
+        entry = self._read_entry(cache_key)
+        if entry is not None:
+            value, delta, expires_at = entry
+            if not should_recompute_early(delta, expires_at):
+                registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='hit')
+                logger.debug(f"Cache hit for key: {cache_key}")
+                return value
+            
+            token = self._try_lock(cache_key)
+            if token is None:
+                registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='hit')
+                return value
+            registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='early_recompute')
+            try:
+                return self._recompute(cache_key, cache_ttl, compute)
+            except Exception as e:
+                logger.warning(f"Early recompute of {cache_key} failed, serving cached value: {e}")
+                return value
+            finally:
+                self._release_lock(cache_key, token)
+        
+        with self._flights_lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[cache_key] = flight
+        
+        if not leader:
+            registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='coalesced')
+            if not flight.event.wait(SINGLE_FLIGHT_LOCK_TTL):
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        registry.inc('api_cache_requests_total', help='API cache lookups by outcome', result='miss')
+        try:
+            flight.result = self._fill_miss(cache_key, cache_ttl, compute)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(cache_key, None)
+            flight.event.set()
+    
     def safe_flush(self):
         """Safely flush Redis cache with error handling"""
         if self.redis is None:
@@ -181,29 +419,7 @@ class ApiCache:
                 # Generate cache key
                 cache_key = self._generate_cache_key(*args, **kwargs)
                 
-                # Try to get from cache if Redis is available
-                cached_result = None
-                if self.redis:
-                    try:
-                        cached_result = self.redis.get(cache_key)
-                        if cached_result is not None:
-                            logger.debug(f"Cache hit for key: {cache_key}")
-                            return cached_result
-                    except Exception as e:
-                        logger.debug(f"Redis get operation failed: {str(e)}")
-                
-                # Call the original function
-                result = func(*args, **kwargs)
-                
-                # Cache the result if Redis is available
-                if self.redis:
-                    try:
-                        self.redis.set(cache_key, result, expire=cache_ttl)
-                        logger.debug(f"Cached result with key: {cache_key}, TTL: {cache_ttl}s")
-                    except Exception as e:
-                        logger.debug(f"Redis set operation failed: {str(e)}")
-                
-                return result
+                return self._get_or_compute(cache_key, cache_ttl, lambda: func(*args, **kwargs))
             
             # Add a method to clear the cache for this function with error handling
             wrapper.clear_cache = self.safe_flush
@@ -257,36 +473,8 @@ class ApiCache:
                     model_value = kwargs[model_param]
                     cache_ttl = self._get_ttl_for_model(model_name=model_value)
                 
-                # Try to get from cache if Redis is available
-                cached_result = None
-                if self.redis:
-                    try:
-                        cached_result = self.redis.get(cache_key)
-                        if cached_result is not None:
-                            logger.debug(f"Cache hit for key: {cache_key}")
-                            return cached_result
-                    except Exception as e:
-                        logger.debug(f"Redis get operation failed: {str(e)}")
-                
-                # Start timing the API call
-                start_time = time.time()
-                
-                # Call the original function
-                result = func(*args, **kwargs)
-                
-                # Calculate API call duration
-                duration = time.time() - start_time
-                logger.debug(f"API call took {duration:.3f}s")
-                
-                # Cache the result if Redis is available
-                if self.redis:
-                    try:
-                        self.redis.set(cache_key, result, expire=cache_ttl)
-                        logger.debug(f"Cached API response with key: {cache_key}, TTL: {cache_ttl}s")
-                    except Exception as e:
-                        logger.debug(f"Redis set operation failed: {str(e)}")
-                
-                return result
+                # Serve from the cache; concurrent misses share one call
+                return self._get_or_compute(cache_key, cache_ttl, lambda: func(*args, **kwargs))
             
             # Add a method to clear the cache for this function with error handling
             wrapper.clear_cache = self.safe_flush
@@ -329,6 +517,26 @@ def cache_model_pricing(ttl: int = 3600):
         skip_cache_condition=lambda *args, **kwargs: kwargs.get('force_refresh', False)  # Allow forced refresh
     )
 
+def clear_model_caches() -> int:
+    """
+    Drop cached model and pricing responses so the next request reads the model table
+    
+    Returns:
+        int: Number of keys deleted
+    """
+    cache = get_api_cache()
+    if cache.redis is None:
+        return 0
+    
+    deleted = 0
+    for custom_key in MODEL_CACHE_ENTRIES:
+        # Same key cache_api_response derives from a key_extractor value
+        deleted += cache.redis.delete(hashlib.md5(custom_key.encode('utf-8')).hexdigest()) or 0
+    redis_client = get_redis_client()
+    if redis_client:
+        deleted += redis_client.delete(*MODEL_RESPONSE_KEYS) or 0
+    return deleted
+
 # Create a LocalProxy for the API cache for easy access in Flask
 api_cache = LocalProxy(get_api_cache)
 
@@ -33,6 +33,11 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from database import db, init_app
 from price_updater import fetch_and_store_openrouter_prices, model_prices_cache
 from ensure_app_context import with_app_context
+from model_catalog import get_model_catalog
+from openrouter_client import get_openrouter_session
+from metrics import registry, start_trace, init_metrics
+from stage_fanout import StageFanout
+from stream_replay import new_stream_id, parse_event_id, publish_stream, replay_stream, stream_owner
 
 # Check if we should enable advanced memory features
 ENABLE_MEMORY_SYSTEM = os.environ.get('ENABLE_MEMORY_SYSTEM', 'false').lower() == 'true'
@@ -353,6 +358,12 @@ try:
 except Exception as e:
     logger.error(f"Error registering User settings blueprint: {e}")
 
+# Register Prometheus-style metrics endpoint
+try:
+    init_metrics(app)
+except Exception as e:
+    logger.error(f"Error registering metrics endpoint: {e}")
+
 # Register admin blueprint
 try:
     # Define custom error handler function that will be passed to admin module
@@ -419,10 +430,11 @@ def is_admin():
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User 
     try:
-        # Use db.session.get() for primary key lookup if using SQLAlchemy 2.0+ style
-        return db.session.get(User, int(user_id))
+        # Cached principal (user flags, settings, preferences); the User row is only
+        # loaded when a request touches other attributes
+        from user_context import load_principal
+        return load_principal(user_id)
     except Exception as e:
         logger.error(f"Error loading user {user_id}: {e}")
         return None
@@ -574,6 +586,17 @@ def init_scheduler():
             max_instances=1
         )
         
+        # Apply chat usage charged through the Redis credit ledger to user balances
+        from credit_ledger import reconcile_usage_job, RECONCILE_INTERVAL
+        scheduler.add_job(
+            func=reconcile_usage_job,
+            trigger='interval',
+            seconds=RECONCILE_INTERVAL,
+            id='reconcile_credit_usage_job',
+            replace_existing=True,
+            max_instances=1
+        )
+        
         # ELO scores are now managed manually via admin interface - no automatic fetching needed
         
         # Add scheduler event listeners to better track job execution
@@ -676,7 +699,11 @@ try:
     
     if model_count > 0:
         logger.info(f"Found {model_count} OpenRouter models in database at startup")
-        
+
+        # Warm the in-process model catalog so the first chat request doesn't hit the model table
+        from model_catalog import refresh_model_catalog
+        refresh_model_catalog()
+
         # The scheduler will check if prices need to be refreshed after startup
         # This avoids blocking the application initialization
         logger.info("Scheduler will check if model data needs refresh in background")
@@ -861,7 +888,7 @@ def generate_summary(conversation_id, retry_attempt=0, max_retries=2):
         logger.info(f"Sending title generation request to OpenRouter with model: {model_id}")
         
         try:
-            response = requests.post(
+            response = get_openrouter_session().post(
                 'https://openrouter.ai/api/v1/chat/completions',
                 headers=headers,
                 json=payload,
@@ -1173,7 +1200,8 @@ def update_paypal_email_direct():
         logger.info(f"Database commit successful for user {current_user.id}")
         
         # Verify the update
-        db.session.refresh(current_user)
+        from user_context import orm_user
+        db.session.refresh(orm_user(current_user))
         final_email = current_user.paypal_email
         logger.info(f"Final verification - PayPal email is now: '{final_email}'")
         
@@ -2371,7 +2399,19 @@ def chat(): # Synchronous function
     # Declare global variables at the beginning of the function
     global document_processor
     
+    # Pre-stream stages (set once the request is parsed); see the finally below
+    fanout = None
+    
     try:
+        # A reconnect carries the id of the last event it received - resume that response
+        # from Redis instead of sending the message again
+        resume_from = parse_event_id(request.headers.get('Last-Event-ID'))
+        if resume_from:
+            return resume_chat_stream(*resume_from)
+        
+        # Per-stage latency tracing (published to /metrics when the request finishes)
+        trace = start_trace('chat')
+        
         # Enhanced request logging for diagnosing 400 errors
         logger.info(f"chat: Request Content-Type: {request.content_type}")
         logger.info(f"chat: Request headers: {dict(request.headers)}")
@@ -2481,6 +2521,44 @@ def chat(): # Synchronous function
         message_history = data.get('history', [])
         conversation_id = data.get('conversation_id', None)
         
+        trace.checkpoint('parse')
+        
+        # --- Start independent I/O stages concurrently ---
+        # These only depend on the user, so they run alongside credit checks,
+        # model validation and the conversation commits and are joined where used
+        fanout = StageFanout(trace)
+        if current_user and current_user.is_authenticated:
+            from user_settings import get_chat_settings_for_user
+            fanout.spawn('chat_settings', get_chat_settings_for_user, current_user.id,
+                         default={}, app_context=True)
+        
+        rag_user_id = None
+        has_rag_content = False
+        if ENABLE_RAG and user_message and len(user_message.strip()) > 0:
+            # Get user ID for retrieving documents
+            rag_user_id = str(current_user.id) if current_user and current_user.is_authenticated else get_user_identifier()
+            logger.info(f"RAG: Pre-checking for document availability for user_id: {rag_user_id}")
+            
+            # Check if Azure OpenAI credentials are available
+            azure_key = os.environ.get('AZURE_OPENAI_API_KEY')
+            azure_endpoint = os.environ.get('AZURE_OPENAI_ENDPOINT')
+            azure_deployment = os.environ.get('AZURE_OPENAI_DEPLOYMENT')
+            
+            if not (azure_key and azure_endpoint and azure_deployment):
+                logger.error("RAG: Azure OpenAI credentials are missing or incomplete.")
+                logger.error("RAG: Ensure AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT are set.")
+                rag_user_id = None
+            else:
+                try:
+                    # Import document processor on demand to avoid circular imports
+                    if 'document_processor' not in globals() or document_processor is None:
+                        document_processor = DocumentProcessor()
+                    fanout.spawn('user_has_documents', document_processor.user_has_documents,
+                                 rag_user_id, default=False)
+                except Exception as e:
+                    logger.error(f"Error checking for user documents: {e}")
+                    rag_user_id = None
+        
         # --- NEW CREDIT VALIDATION LOGIC ---
         # Import User model for credit validation
         from models import User
@@ -2503,6 +2581,20 @@ def chat(): # Synchronous function
         
         def check_user_can_use_paid_models_local(user_id):
             """Check if user has positive credits"""
+            # Redis credit ledger: balance net of in-flight reservations, no database query
+            from credit_ledger import get_available_credits
+            available_credits = get_available_credits(user_id)
+            if available_credits is not None:
+                logger.info(f"Credit validation: User {user_id} has {available_credits} available credits (ledger)")
+                return available_credits > 0
+            
+            # Balance snapshot from the cached user context (loaded with current_user)
+            from user_context import get_user_context
+            context = get_user_context(user_id)
+            if context is not None:
+                logger.info(f"Credit validation: User {user_id} has {context['balance']} credits (snapshot)")
+                return context['balance'] > 0
+            
             try:
                 user = User.query.get(user_id)
                 if not user:
@@ -2545,9 +2637,13 @@ def chat(): # Synchronous function
                 }), 402  # 402 Payment Required
 
         from models import Conversation, Message # Ensure models are imported
+        trace.checkpoint('credit_check')
 
         # --- Determine OpenRouter Model ID ---
         openrouter_model = OPENROUTER_MODELS.get(model_id, model_id) # Use .get fallback
+
+        # In-process model catalog answers capability lookups without DB queries
+        catalog = get_model_catalog()
         
         # --- Validate and ensure model is available in OpenRouter ---
         try:
@@ -2562,46 +2658,31 @@ def chat(): # Synchronous function
             
             # Global document_processor is already declared at the function start
             
-            # Only check for RAG content if RAG is enabled and there's a user message
-            if ENABLE_RAG and user_message and len(user_message.strip()) > 0:
-                # Get user ID for retrieving documents
-                rag_user_id = str(current_user.id) if current_user and current_user.is_authenticated else get_user_identifier()
-                logger.info(f"RAG: Pre-checking for document availability for user_id: {rag_user_id}")
-                
-                # Check if the user has any documents before attempting retrieval
-                try:
-                    # Import document processor on demand to avoid circular imports
-                    if 'document_processor' not in globals() or document_processor is None:
-                        document_processor = DocumentProcessor()
-                    
-                    # Check if Azure OpenAI credentials are available
-                    azure_key = os.environ.get('AZURE_OPENAI_API_KEY')
-                    azure_endpoint = os.environ.get('AZURE_OPENAI_ENDPOINT')
-                    azure_deployment = os.environ.get('AZURE_OPENAI_DEPLOYMENT')
-                    
-                    if not (azure_key and azure_endpoint and azure_deployment):
-                        logger.error("RAG: Azure OpenAI credentials are missing or incomplete.")
-                        # Skip RAG retrieval when credentials are missing
-                    else:
-                        # Do a preliminary check to see if the user has any documents
-                        has_documents = document_processor.user_has_documents(rag_user_id)
-                        if has_documents:
-                            has_rag_content = True
-                            logger.info("Detected RAG usage - user has documents - marking as requiring advanced model")
-                        else:
-                            logger.info("No documents found for user - not marking as RAG content")
-                except Exception as e:
-                    logger.error(f"Error checking for user documents: {e}")
-                    # If we can't determine, assume no RAG to avoid using expensive models unnecessarily
+            # Only check for RAG content if RAG is enabled and the document check was started
+            if ENABLE_RAG and rag_user_id:
+                # If we can't determine in time, assume no RAG to avoid using expensive models unnecessarily
+                has_documents = fanout.result('user_has_documents', default=False)
+                if has_documents:
+                    has_rag_content = True
+                    logger.info("Detected RAG usage - user has documents - marking as requiring advanced model")
+                else:
+                    logger.info("No documents found for user - not marking as RAG content")
+            
+            trace.checkpoint('rag_precheck')
             
-            # Get the list of available models
+            # Get the list of available models from the in-process catalog (no DB query)
             logger.info(f"🔍 CHAT: Getting available models for validation")
-            available_models = model_validator.get_available_models()
+            if catalog and catalog.available_model_ids:
+                available_models = catalog.available_model_ids
+                model_is_available = catalog.is_available(openrouter_model)
+            else:
+                # Catalog couldn't be loaded - fall back to the validator's own lookup
+                available_models = model_validator.get_available_models()
+                model_is_available = model_validator.is_model_available(openrouter_model, available_models)
             logger.info(f"🔍 CHAT: Received {len(available_models) if available_models else 0} available models")
-            
+
             # Check if the requested model is available
             logger.info(f"🔍 CHAT: Validating requested model: {openrouter_model}")
-            model_is_available = model_validator.is_model_available(openrouter_model, available_models)
             logger.info(f"🔍 CHAT: Model availability check result: {model_is_available}")
             logger.info(f"🔍 CHAT: Has RAG content: {has_rag_content}")
             logger.info(f"🔍 CHAT: Combined condition (not available OR has RAG): {not model_is_available or has_rag_content}")
@@ -2649,6 +2730,9 @@ def chat(): # Synchronous function
             logger.error(traceback.format_exc())
             # Continue with the original model (we tried our best)
 
+        trace.model = openrouter_model
+        trace.checkpoint('model_validation')
+
         # --- Get API Key ---
         api_key = os.environ.get('OPENROUTER_API_KEY')
         if not api_key:
@@ -2665,6 +2749,7 @@ def chat(): # Synchronous function
         # --- Get/Create Conversation & Save User Message ---
         # (Using the logic refined during async attempts)
         conversation = None
+        created_conversation = False
         if conversation_id:
             conversation = db.session.get(Conversation, conversation_id) 
             if not conversation:
@@ -2685,6 +2770,7 @@ def chat(): # Synchronous function
             try:
                 db.session.commit()
                 conversation_id = conversation.id 
+                created_conversation = True
                 logger.info(f"Created new conversation with ID: {conversation_id}, UUID: {conversation_uuid}")
             except Exception as e:
                  logger.exception("Error committing new conversation")
@@ -2694,6 +2780,7 @@ def chat(): # Synchronous function
         if not conversation or not conversation.id:
              logger.error("Failed to get or create a valid conversation object.")
              abort(500, description="Failed to establish conversation context.")
+        trace.checkpoint('conversation_commit')
 
         # Extract text content from multimodal message if needed
         message_text = user_message
@@ -2764,6 +2851,7 @@ def chat(): # Synchronous function
                 logger.exception(f"Error committing user message to database: {e}")
                 db.session.rollback()
                 abort(500, description="Database error saving user message")
+        trace.checkpoint('user_message_commit')
 
 
         # --- Prepare Message History ---
@@ -2780,22 +2868,19 @@ def chat(): # Synchronous function
              )
             messages.append({'role': 'system', 'content': system_message})
 
-        # Check if model supports multimodal input by querying the database
+        # Check if model supports multimodal input using the model catalog
         model_supports_multimodal = False
         
-        # Import OpenRouterModel class
-        from models import OpenRouterModel
-        
-        # Query the database for this specific model
-        db_model = OpenRouterModel.query.filter_by(model_id=openrouter_model).first()
+        # Look up this specific model (O(1), no database query)
+        catalog_multimodal = catalog.supports_multimodal(openrouter_model) if catalog else None
         
-        if db_model:
-            # Use the is_multimodal flag from the database
-            model_supports_multimodal = db_model.is_multimodal
-            logger.info(f"✅ Found model in database: {openrouter_model}, multimodal={model_supports_multimodal}")
+        if catalog_multimodal is not None:
+            # Use the is_multimodal flag from the catalog
+            model_supports_multimodal = catalog_multimodal
+            logger.info(f"✅ Found model in catalog: {openrouter_model}, multimodal={model_supports_multimodal}")
         else:
-            # Model not found in database - default to False for safety
-            logger.warning(f"No database entry found for model {openrouter_model}, assuming non-multimodal support")
+            # Model not found in catalog - default to False for safety
+            logger.warning(f"No catalog entry found for model {openrouter_model}, assuming non-multimodal support")
             # For critical anthropic/claude and vision models, use a basic heuristic as fallback
             if any(pattern in openrouter_model.lower() for pattern in ["claude-3", "claude-3.5", "claude-3.7", "gpt-4-vision", "gpt-4o", "gemini"]):
                 model_supports_multimodal = True
@@ -2806,22 +2891,44 @@ def chat(): # Synchronous function
                 logger.warning(f"⚠️ Image URL provided but model {openrouter_model} doesn't seem to support multimodal input")
                 logger.warning("⚠️ This may cause a 400 Bad Request error. Consider using a multimodal model instead.")
 
-        # Load conversation history from database
-        db_messages = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.created_at).all()
+        # Turns older than the recent window are sent as the rolling summary (see conversation_summary.py)
+        from conversation_summary import summary_system_message, needs_summary_update
+        if conversation.history_summary:
+            messages.append(summary_system_message(conversation.history_summary))
+
+        # Load conversation history from database - newest first, only what fits the model's context
+        from history_window import history_token_budget, load_history_window, count_tokens
+        user_chat_settings = fanout.result('chat_settings', default={}) or {}
+        history_budget = history_token_budget(
+            catalog.context_length(openrouter_model) if catalog else None,
+            completion_tokens=user_chat_settings.get('max_tokens'),
+            prompt_tokens=sum(count_tokens(m['content']) for m in messages) + (user_db_message.token_count or 0)
+        )
+        db_messages, history_tokens, history_truncated = load_history_window(
+            conversation.id, history_budget,
+            exclude_message_id=user_db_message.id,
+            include_images=model_supports_multimodal,
+            after_message_id=conversation.summary_message_id
+        )
+        # This turn adds two messages; resummarize once enough have aged out of the recent window
+        summary_due = history_truncated or needs_summary_update(len(db_messages) + 2, 0)
+        if history_truncated:
+            logger.info(f"History for conversation {conversation.id} truncated to {len(db_messages)} messages "
+                        f"({history_tokens}/{history_budget} tokens) for {openrouter_model}")
         for msg in db_messages:
-             if msg.id != user_db_message.id:
-                 # Check if the message has an image URL and model supports multimodal
-                 if msg.image_url and model_supports_multimodal:
-                     # Format previous messages with images in multimodal format
-                     multimodal_content = [
-                         {"type": "text", "text": msg.content},
-                         {"type": "image_url", "image_url": {"url": msg.image_url}}
-                     ]
-                     messages.append({'role': msg.role, 'content': multimodal_content})
-                     logger.info(f"Including previous message with image in history: {msg.id}")
-                 else:
-                     # Standard text-only message
-                     messages.append({'role': msg.role, 'content': msg.content})
+             # Check if the message has an image URL and model supports multimodal
+             if msg.image_url and model_supports_multimodal:
+                 # Format previous messages with images in multimodal format
+                 multimodal_content = [
+                     {"type": "text", "text": msg.content},
+                     {"type": "image_url", "image_url": {"url": msg.image_url}}
+                 ]
+                 messages.append({'role': msg.role, 'content': multimodal_content})
+                 logger.info(f"Including previous message with image in history: {msg.id}")
+             else:
+                 # Standard text-only message
+                 messages.append({'role': msg.role, 'content': msg.content})
+        trace.checkpoint('history_load')
 
         # Format the current user message - either standard text-only or multimodal
         # Following OpenRouter's unified multimodal format that works across all models:
@@ -2834,14 +2941,9 @@ def chat(): # Synchronous function
         # Check if model supports multimodal content or PDF documents
         # First try to look up the model in the database
         model_supports_documents = openrouter_model in DOCUMENT_MODELS
-        try:
-            # Check the database for more accurate information
-            from models import OpenRouterModel
-            db_model = OpenRouterModel.query.get(openrouter_model)
-            if db_model and db_model.supports_pdf:
-                model_supports_documents = True
-        except Exception as e:
-            logger.warning(f"Error checking database for PDF support: {e}")
+        # Check the model catalog for more accurate information
+        if catalog and catalog.supports_pdf(openrouter_model):
+            model_supports_documents = True
         
         # Include multimedia content if we have images or PDFs and the model supports them
         if (has_images and model_supports_multimodal) or (has_pdfs and model_supports_documents):
@@ -3015,7 +3117,10 @@ def chat(): # Synchronous function
         if has_pdfs and not model_supports_documents:
             logger.warning(f"⚠️ PDF document(s) provided but model {openrouter_model} doesn't support PDF handling. PDFs ignored.")
 
-        # --- Enrich with memory if needed and user has it enabled ---
+        trace.checkpoint('message_format')
+
+        # --- Start memory enrichment and document retrieval concurrently ---
+        memory_enabled = False
         if ENABLE_MEMORY_SYSTEM:
             memory_enabled = True
             if current_user and current_user.is_authenticated:
@@ -3023,64 +3128,21 @@ def chat(): # Synchronous function
                 logger.info(f"User {current_user.id} memory preference: {'enabled' if memory_enabled else 'disabled'}")
             
             if memory_enabled:
-                try:
-                    memory_user_id = str(current_user.id) if current_user and current_user.is_authenticated else f"anonymous_{conversation.id}"
-                    enriched_messages = enrich_prompt_with_memory(
-                        session_id=str(conversation.id), user_id=memory_user_id, 
-                        user_message=user_message, conversation_history=messages
-                    )
-                    if len(enriched_messages) > len(messages):
-                        logger.info(f"Added {len(enriched_messages) - len(messages)} context messages from memory system")
-                    messages = enriched_messages
-                except Exception as e:
-                    logger.error(f"Error enriching with memory: {e}")
+                memory_user_id = str(current_user.id) if current_user and current_user.is_authenticated else f"anonymous_{conversation.id}"
+                fanout.spawn('memory_enrichment', enrich_prompt_with_memory,
+                             session_id=str(conversation.id), user_id=memory_user_id,
+                             user_message=user_message, conversation_history=list(messages))
             else:
                 logger.info("Memory enrichment skipped - user has disabled memory across sessions")
-                 
-        # --- Incorporate document context from RAG system ---
-        if ENABLE_RAG:
-            try:
-                # We already did the pre-check for has_rag_content flag when selecting the model
-                # Now do the actual document retrieval if needed
-                
-                # Get user ID for retrieving documents
-                rag_user_id = str(current_user.id) if current_user and current_user.is_authenticated else get_user_identifier()
-                logger.info(f"RAG: Attempting retrieval for user_id: {rag_user_id}, Query: '{user_message[:50]}...'")
-                
-                # Global document_processor is already declared at the function start
-                
-                # Retrieve relevant document chunks with better error handling
+        
+        if ENABLE_RAG and has_rag_content:
+            def retrieve_document_chunks():
                 try:
-                    # Check for Azure credentials before attempting to retrieve chunks
-                    azure_key = os.environ.get('AZURE_OPENAI_API_KEY')
-                    azure_endpoint = os.environ.get('AZURE_OPENAI_ENDPOINT')
-                    azure_deployment = os.environ.get('AZURE_OPENAI_DEPLOYMENT')
-                    
-                    if not (azure_key and azure_endpoint and azure_deployment):
-                        logger.error("RAG: Azure OpenAI credentials are missing or incomplete.")
-                        logger.error("RAG: Ensure AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, and AZURE_OPENAI_DEPLOYMENT are set.")
-                        # Skip RAG retrieval when credentials are missing 
-                        relevant_chunks = []
-                    else:
-                        # Only attempt retrieval if we know the user has documents
-                        # This should match the check we did earlier when setting has_rag_content
-                        # Import document processor on demand to avoid circular imports
-                        if 'document_processor' not in globals() or document_processor is None:
-                            document_processor = DocumentProcessor()
-                            
-                        # Double-check if the user has documents (should be true if has_rag_content was set)
-                        if document_processor.user_has_documents(rag_user_id):
-                            # User has documents, proceed with retrieval
-                            relevant_chunks = document_processor.retrieve_relevant_chunks(
-                                query_text=user_message,
-                                user_id=rag_user_id,
-                                limit=5  # Retrieve top 5 most relevant chunks
-                            )
-                            logger.info(f"RAG: Found {len(relevant_chunks)} relevant chunks using Azure embeddings.")
-                        else:
-                            # User doesn't have documents, skip retrieval
-                            logger.info("RAG: User has no documents, skipping retrieval")
-                            relevant_chunks = []
+                    return document_processor.retrieve_relevant_chunks(
+                        query_text=user_message,
+                        user_id=rag_user_id,
+                        limit=5  # Retrieve top 5 most relevant chunks
+                    )
                 except Exception as retrieval_error:
                     logger.error(f"RAG: Error retrieving document chunks: {retrieval_error}")
                     
@@ -3093,8 +3155,28 @@ def chat(): # Synchronous function
                         logger.error("RAG: Azure OpenAI embedding service error. Check API key, endpoint, and deployment name.")
                     
                     # Continue without RAG context
-                    relevant_chunks = []
                     logger.info("RAG: Continuing without document context due to retrieval error.")
+                    return []
+            
+            logger.info(f"RAG: Attempting retrieval for user_id: {rag_user_id}, Query: '{user_message[:50]}...'")
+            fanout.spawn('rag_retrieval', retrieve_document_chunks, default=[])
+
+        # --- Enrich with memory if needed and user has it enabled ---
+        if memory_enabled:
+            enriched_messages = fanout.result('memory_enrichment')
+            if enriched_messages is not None:
+                if len(enriched_messages) > len(messages):
+                    logger.info(f"Added {len(enriched_messages) - len(messages)} context messages from memory system")
+                messages = enriched_messages
+        trace.checkpoint('memory_enrichment')
+                 
+        # --- Incorporate document context from RAG system ---
+        if ENABLE_RAG:
+            try:
+                # Retrieval was started above only if the pre-check found documents
+                relevant_chunks = fanout.result('rag_retrieval', default=[]) or []
+                if relevant_chunks:
+                    logger.info(f"RAG: Found {len(relevant_chunks)} relevant chunks using Azure embeddings.")
                 
                 if relevant_chunks and len(relevant_chunks) > 0:
                     
@@ -3157,24 +3239,35 @@ def chat(): # Synchronous function
                     
             except Exception as e:
                 logger.error(f"Error incorporating RAG context: {e}")
+        trace.checkpoint('rag_retrieval')
+
+        # The history was sized before memory and document context were added
+        from history_window import prompt_token_budget, trim_history
+        dropped = trim_history(messages, prompt_token_budget(
+            catalog.context_length(openrouter_model) if catalog else None,
+            completion_tokens=user_chat_settings.get('max_tokens')
+        ))
+        if dropped:
+            summary_due = True
+            logger.info(f"Dropped {dropped} more history messages for conversation {conversation.id} "
+                        f"to fit injected context for {openrouter_model}")
 
         # --- Prepare Payload ---
         # Before creating payload, ensure we have correct content format for each model type
         # OpenRouter expects different message content formats for multimodal vs non-multimodal models
         
-        # Check if model supports multimodal content using database
+        # Check if model supports multimodal content using the model catalog
         model_supports_multimodal = False
-        from models import OpenRouterModel
         
-        # Query the database for this specific model
-        db_model = OpenRouterModel.query.filter_by(model_id=openrouter_model).first()
+        # Look up this specific model (O(1), no database query)
+        catalog_multimodal = catalog.supports_multimodal(openrouter_model) if catalog else None
         
-        if db_model:
-            # Use the is_multimodal flag from the database
-            model_supports_multimodal = db_model.is_multimodal
+        if catalog_multimodal is not None:
+            # Use the is_multimodal flag from the catalog
+            model_supports_multimodal = catalog_multimodal
             logger.info(f"Model {openrouter_model} supports multimodal content: {model_supports_multimodal}")
         else:
-            # Model not found in database - use a basic heuristic as fallback
+            # Model not found in catalog - use a basic heuristic as fallback
             multimodal_indicators = ["claude-3", "claude-3.5", "claude-3.7", "gpt-4-vision", "gpt-4o", "gemini", "vision", "multimodal"]
             for indicator in multimodal_indicators:
                 if indicator.lower() in openrouter_model.lower():
@@ -3242,10 +3335,10 @@ def chat(): # Synchronous function
         if current_user and current_user.is_authenticated:
             try:
                 import json
-                from user_settings import get_chat_settings_for_user, validate_model_specific_parameters
+                from user_settings import validate_model_specific_parameters
                 
-                # Get the user's chat settings
-                user_settings = get_chat_settings_for_user(current_user.id)
+                # Get the user's chat settings (looked up concurrently since parsing)
+                user_settings = fanout.result('chat_settings', default={})
                 
                 # Validate and adjust parameters based on model constraints
                 if user_settings:
@@ -3272,14 +3365,9 @@ def chat(): # Synchronous function
         
         # Check if model supports PDF files (from database or hardcoded list)
         model_supports_pdf = openrouter_model in DOCUMENT_MODELS
-        try:
-            # Check the database for more accurate information
-            from models import OpenRouterModel
-            db_model = OpenRouterModel.query.get(openrouter_model)
-            if db_model and db_model.supports_pdf:
-                model_supports_pdf = True
-        except Exception as e:
-            logger.warning(f"Error checking database for PDF support: {e}")
+        # Check the model catalog for more accurate information
+        if catalog and catalog.supports_pdf(openrouter_model):
+            model_supports_pdf = True
             
         if has_pdf_content and model_supports_pdf:
             logger.info(f"PDF content detected for document-capable model {openrouter_model}, adding native PDF plugin config")
@@ -3338,15 +3426,14 @@ def chat(): # Synchronous function
             selected_model = payload.get('model', '')
             model_supports_multimodal = False
             
-            # Query the database for this specific model
-            from models import OpenRouterModel
-            db_model = OpenRouterModel.query.filter_by(model_id=selected_model).first()
+            # Look up this specific model in the catalog
+            catalog_multimodal = catalog.supports_multimodal(selected_model) if catalog else None
             
-            if db_model:
-                # Use the is_multimodal flag from the database
-                model_supports_multimodal = db_model.is_multimodal
+            if catalog_multimodal is not None:
+                # Use the is_multimodal flag from the catalog
+                model_supports_multimodal = catalog_multimodal
             else:
-                # Fall back to a basic heuristic if the model isn't in the database
+                # Fall back to a basic heuristic if the model isn't in the catalog
                 multimodal_indicators = ["claude-3", "claude-3.5", "claude-3.7", "gpt-4-vision", "gpt-4o", "gemini", "vision", "multimodal"]
                 for indicator in multimodal_indicators:
                     if indicator.lower() in selected_model.lower():
@@ -3376,6 +3463,41 @@ def chat(): # Synchronous function
         # --- END OF ADDED LOGGING ---
         
         logger.debug(f"Sending request to OpenRouter with model: {openrouter_model}. History length: {len(messages)}, include_reasoning: True")
+        trace.checkpoint('payload_build')
+
+        # Hold the estimated cost of this turn so concurrent chats can't spend the same credits
+        credit_reservation = None
+        if current_user.is_authenticated and not requested_model_is_free:
+            from credit_ledger import reserve_credits, estimate_turn_credits
+            from history_window import count_prompt_tokens, DEFAULT_COMPLETION_RESERVE
+            try:
+                estimated_credits = estimate_turn_credits(
+                    openrouter_model,
+                    count_prompt_tokens(payload['messages']),
+                    payload.get('max_tokens') or DEFAULT_COMPLETION_RESERVE
+                )
+            except Exception as e:
+                logger.error(f"Error estimating credits for {openrouter_model}: {e}")
+                estimated_credits = 1
+            credit_reservation = reserve_credits(current_user.id, estimated_credits)
+            if credit_reservation is not None and not credit_reservation.granted:
+                logger.info(f"User {current_user.id} has no credits left after in-flight reservations")
+                # The turn won't run; don't leave its message (or its new conversation) unanswered
+                try:
+                    db.session.delete(user_db_message)
+                    if created_conversation:
+                        db.session.delete(conversation)
+                    db.session.commit()
+                except Exception as e:
+                    logger.error(f"Error removing message {user_db_message.id} of a denied turn: {e}")
+                    db.session.rollback()
+                return jsonify({
+                    "error": "Insufficient credits",
+                    "message": "You need to purchase credits to use premium models. You've been redirected to a free model.",
+                    "suggested_model": DEFAULT_PRESET_MODELS.get('6', 'google/gemini-2.0-flash-exp:free'),
+                    "redirect_to_billing": True
+                }), 402  # 402 Payment Required
+            trace.checkpoint('credit_reserve')
 
         # --- Define the SYNC Generator using requests ---
         def generate():
@@ -3383,13 +3505,107 @@ def chat(): # Synchronous function
             import json
             
             assistant_response_content = [] 
+            assistant_reasoning_content = []
+            stream_started_at = None
             final_prompt_tokens = None
             final_completion_tokens = None
             final_model_id_used = None
             assistant_message_id = None 
             current_conv_id = conversation.id 
+            needs_title = conversation.title == "New Conversation"
             requested_model_id = model_id 
+            response = None
             
+            def save_assistant_reply(text, prompt_tokens, completion_tokens, truncated=False):
+                """
+                Write the assistant message and its usage row in one transaction
+
+                Args:
+                    text: Assistant response text
+                    prompt_tokens: Prompt tokens to bill
+                    completion_tokens: Completion tokens to bill
+                    truncated: The reply was cut short by a client disconnect
+
+                Returns:
+                    int: ID of the saved assistant message
+                """
+                from models import Message
+                from ensure_app_context import ensure_app_context
+                
+                # --- Price the turn for billing (before opening the write transaction) ---
+                credits_used = None
+                model_name = final_model_id_used or requested_model_id
+                bill_user_id = current_user.id if current_user and current_user.is_authenticated else None
+                if bill_user_id and prompt_tokens and completion_tokens:
+                    try:
+                        from billing import calculate_openrouter_credits
+
+                        credits_used = calculate_openrouter_credits(
+                            prompt_tokens=prompt_tokens,
+                            completion_tokens=completion_tokens,
+                            model_id=model_name
+                        )
+                    except Exception as billing_error:
+                        logger.error(f"Error calculating billing usage: {billing_error}")
+                        # Don't fail the whole request if billing calculation fails
+                trace.checkpoint('billing')
+
+                # Use our app context manager to avoid "outside application context" errors
+                with ensure_app_context():
+                    assistant_db_message = Message(
+                        conversation_id=current_conv_id, 
+                        role='assistant', 
+                        content=text,
+                        model=requested_model_id, 
+                        model_id_used=final_model_id_used, 
+                        prompt_tokens=prompt_tokens, 
+                        completion_tokens=completion_tokens,
+                        is_truncated=truncated,
+                        rating=None 
+                    )
+                    db.session.add(assistant_db_message)
+                    db.session.flush()  # Assigns the message ID for the usage row
+                    assistant_message_id = assistant_db_message.id 
+
+                    # --- Record usage for billing in the same transaction ---
+                    if credits_used is not None:
+                        try:
+                            from billing import record_usage
+
+                            # Savepoint: a billing failure must not lose the message
+                            with db.session.begin_nested():
+                                if not record_usage(
+                                    user_id=bill_user_id,
+                                    credits_used=credits_used,
+                                    usage_type="chat",
+                                    model_id=model_name,
+                                    message_id=assistant_message_id,
+                                    prompt_tokens=prompt_tokens,
+                                    completion_tokens=completion_tokens,
+                                    commit=False,
+                                    # The credit ledger holds the charge; reconciled into User.credits later
+                                    deduct=credit_reservation is None
+                                ):
+                                    raise RuntimeError("usage row not recorded")
+                        except Exception as billing_error:
+                            logger.error(f"Error recording billing usage: {billing_error}")
+                            credits_used = None
+
+                    if credits_used is not None and credit_reservation is not None:
+                        # Charge the ledger before the usage row becomes visible to a balance load
+                        credit_reservation.commit_charge(credits_used, db.session.commit)
+                    else:
+                        db.session.commit()
+                    logger.info(f"Saved {'truncated ' if truncated else ''}assistant message {assistant_message_id} with metadata.")
+                    if credits_used is not None:
+                        logger.info(f"Recorded usage: {credits_used} credits for message {assistant_message_id}")
+                        if credit_reservation is None:
+                            # Deducted from User.credits directly - drop the cached balances
+                            from billing import invalidate_cached_balance
+                            invalidate_cached_balance(bill_user_id)
+                trace.checkpoint('persistence')
+                return assistant_message_id
+
             # Credit validation is now handled at the beginning of the chat endpoint
             # No need to check credits here as it's already been validated
             
@@ -3431,7 +3647,9 @@ def chat(): # Synchronous function
                 # Now make the actual API request with better error handling
                 try:
                     logger.info(f"Making API request to OpenRouter with model {payload.get('model')}")
-                    response = requests.post(
+                    trace.checkpoint('stream_setup')
+                    # Shared keep-alive session: reuses pooled connections instead of a new TLS handshake per turn
+                    response = get_openrouter_session().post(
                         'https://openrouter.ai/api/v1/chat/completions',
                         headers=headers, 
                         json=payload,    
@@ -3440,6 +3658,8 @@ def chat(): # Synchronous function
                         timeout=300.0 
                     )
                 
+                    trace.checkpoint('upstream_headers')
+                
                     # Check status *after* making the request
                     if response.status_code != 200:
                         error_text = response.text 
@@ -3474,12 +3694,26 @@ def chat(): # Synchronous function
                     return
 
                 # Iterate over the stream using iter_lines
+                first_chunk_seen = False
                 for line in response.iter_lines():
+                    if not first_chunk_seen:
+                        first_chunk_seen = True
+                        stream_started_at = time.perf_counter()
+                        trace.checkpoint('upstream_ttfb')
+                        registry.observe('chat_time_to_first_token_seconds', time.perf_counter() - trace.started_at,
+                                         help='Time from request arrival to the first upstream chunk',
+                                         model=trace.model)
                     if line:
                         if line.strip() == b'': continue 
 
                         line_text = line.decode('utf-8')
 
+                        if line_text.startswith(':'):
+                            # Upstream keep-alive comment (e.g. while a model reasons). Forwarding one
+                            # writes to the client socket, so a disconnect is noticed during long pauses too.
+                            yield ": keepalive\n\n"
+                            continue
+
                         if line_text.startswith('data: '):
                             # Get raw data without the 'data: ' prefix
                             raw_data = line_text[6:].strip()
@@ -3545,6 +3779,7 @@ def chat(): # Synchronous function
                                     
                                     # Handle reasoning chunk
                                     if reasoning_chunk:
+                                        assistant_reasoning_content.append(reasoning_chunk)
                                         # Yield reasoning chunk to the client
                                         reasoning_payload = {'type': 'reasoning', 'reasoning': reasoning_chunk, 'conversation_id': current_conv_id}
                                         reasoning_json_str = json.dumps(reasoning_payload)
@@ -3586,6 +3821,7 @@ def chat(): # Synchronous function
                                     return # Stop generation on genuine parsing error
 
                 # --- Stream processing finished ---
+                trace.checkpoint('streaming')
                 logger.info(f"🔍 STREAM PROCESSING: Content accumulation debug")
                 logger.info(f"🔍 assistant_response_content length: {len(assistant_response_content)}")
                 logger.info(f"🔍 assistant_response_content sample: {assistant_response_content[:3] if assistant_response_content else 'Empty list'}")
@@ -3601,57 +3837,13 @@ def chat(): # Synchronous function
                 
                 if True:  # Always generate metadata - content streaming works independently
                     try:
-                        from models import Message
-                        from ensure_app_context import ensure_app_context
-                        
-                        # Use our app context manager to avoid "outside application context" errors
-                        with ensure_app_context():
-                            assistant_db_message = Message(
-                                conversation_id=current_conv_id, 
-                                role='assistant', 
-                                content=full_response_text,
-                                model=requested_model_id, 
-                                model_id_used=final_model_id_used, 
-                                prompt_tokens=final_prompt_tokens, 
-                                completion_tokens=final_completion_tokens,
-                                rating=None 
-                            )
-                            db.session.add(assistant_db_message)
-                            db.session.commit()
-                            assistant_message_id = assistant_db_message.id 
-                            logger.info(f"Saved assistant message {assistant_message_id} with metadata.")
+                        from chat_jobs import enqueue_chat_job, save_assistant_memory_job, generate_title_job, update_summary_job
                         
-                        # --- Record usage for billing ---
-                        if current_user and current_user.is_authenticated and final_prompt_tokens and final_completion_tokens:
-                            try:
-                                from billing import record_usage, calculate_openrouter_credits
-                                
-                                # Get the model ID that was actually used
-                                model_name = final_model_id_used or requested_model_id
-                                
-                                # Calculate credits used
-                                credits_used = calculate_openrouter_credits(
-                                    prompt_tokens=final_prompt_tokens,
-                                    completion_tokens=final_completion_tokens,
-                                    model_id=model_name
-                                )
-                                
-                                # Record usage
-                                record_usage(
-                                    user_id=current_user.id,
-                                    credits_used=credits_used,
-                                    usage_type="chat",
-                                    model_id=model_name,
-                                    message_id=assistant_message_id,
-                                    prompt_tokens=final_prompt_tokens,
-                                    completion_tokens=final_completion_tokens
-                                )
-                                
-                                logger.info(f"Recorded usage: {credits_used} credits for message {assistant_message_id}")
-                            except Exception as billing_error:
-                                logger.error(f"Error recording billing usage: {billing_error}")
-                                # Don't fail the whole request if billing recording fails
+                        assistant_message_id = save_assistant_reply(
+                            full_response_text, final_prompt_tokens, final_completion_tokens
+                        )
 
+                        # --- Hand memory and title work to the job queue ---
                         # Save to memory system if enabled and user hasn't disabled it
                         if ENABLE_MEMORY_SYSTEM:
                              memory_enabled = True
@@ -3661,42 +3853,31 @@ def chat(): # Synchronous function
                              if memory_enabled:
                                  try:
                                      memory_user_id = str(current_user.id) if current_user and current_user.is_authenticated else f"anonymous_{current_conv_id}"
-                                     save_message_with_memory(
-                                         session_id=str(current_conv_id), user_id=memory_user_id, 
-                                         role='assistant', content=full_response_text
+                                     enqueue_chat_job(
+                                         save_assistant_memory_job,
+                                         session_id=str(current_conv_id), user_id=memory_user_id,
+                                         content=full_response_text
                                      )
                                  except Exception as e:
-                                     logger.error(f"Error saving assistant message to memory: {e}")
+                                     logger.error(f"Error queueing assistant message for memory: {e}")
                              else:
                                  logger.info("Message not saved to memory - user has disabled memory across sessions")
                         
-                        # Check if this is the first assistant message and generate a title
-                        try:
-                            # Count assistant messages in this conversation
-                            assistant_count = Message.query.filter_by(
-                                conversation_id=current_conv_id, 
-                                role='assistant'
-                            ).count()
-                            
-                            # If this is the first assistant message, trigger title generation
-                            if assistant_count == 1:
-                                logger.info(f"First assistant message detected for conversation {current_conv_id}. Triggering title generation.")
-                                # Call the generate_summary function - non-blocking under gevent
-                                # Ensure we've patched gevent beforehand to make this properly async
-                                print(f"[CHAT] About to generate title for conversation {current_conv_id}")
-                                logger.info(f"DEBUG: /chat - ABOUT TO CALL generate_summary for conversation {current_conv_id}")
-                                try:
-                                    generate_summary(current_conv_id)
-                                    print(f"[CHAT] Title generation for conversation {current_conv_id} initiated successfully")
-                                    logger.info(f"DEBUG: /chat - RETURNED FROM generate_summary CALL for conversation {current_conv_id}")
-                                except Exception as e:
-                                    import traceback
-                                    print(f"[CHAT] Error initiating title generation: {e}")
-                                    logger.error(f"DEBUG: /chat - ERROR DURING generate_summary CALL: {e}")
-                                    traceback.print_exc()
-                        except Exception as e:
-                            logger.error(f"Error checking message count or triggering title generation: {e}")
-                            # Don't raise the exception - we want to continue even if this fails
+                        # Generate a title after the first assistant message (the job checks the count)
+                        if needs_title:
+                            try:
+                                enqueue_chat_job(generate_title_job, current_conv_id)
+                            except Exception as e:
+                                logger.error(f"Error queueing title generation: {e}")
+                                # Don't raise the exception - we want to continue even if this fails
+                        
+                        # Fold turns that aged out of the recent window into the rolling summary
+                        if summary_due:
+                            try:
+                                enqueue_chat_job(update_summary_job, current_conv_id)
+                            except Exception as e:
+                                logger.error(f"Error queueing history summary update: {e}")
+                        trace.checkpoint('post_processing')
 
                         # Yield the final metadata event
                         logger.info(f"==> Preparing to yield METADATA for message {assistant_message_id}")
@@ -3767,6 +3948,37 @@ def chat(): # Synchronous function
                 yield f"data: {json.dumps({'type': 'done', 'done': True, 'conversation_id': current_conv_id})}\n\n\n"
                 logger.info("==> SUCCESSFULLY yielded DONE event. Stream generation complete.")
 
+            except GeneratorExit:
+                # The client went away: writing to its socket failed and the server closed this generator.
+                # Stop the upstream stream now instead of reading (and paying for) the rest of the reply.
+                if response is not None and stream_started_at is not None and assistant_message_id is None:
+                    streamed_seconds = time.perf_counter() - stream_started_at
+                    response.close()
+                    response = None
+                    
+                    # Estimate the upstream time avoided from this model's typical stream duration
+                    typical = registry.get_summary('chat_stage_seconds', stage='streaming', model=trace.model)
+                    saved_seconds = max((typical['p50'] if typical else 0.0) - streamed_seconds, 0.0)
+                    registry.inc('chat_client_disconnects_total', help='Chat streams cancelled because the client disconnected',
+                                 model=trace.model)
+                    registry.inc('chat_upstream_seconds_saved_total', saved_seconds,
+                                 help='Estimated upstream streaming seconds avoided by cancelling on client disconnect',
+                                 model=trace.model)
+                    logger.info(f"Client disconnected from conversation {current_conv_id} after {streamed_seconds:.1f}s of streaming, upstream closed")
+                    
+                    # Keep what the user already saw and bill only the tokens received so far
+                    partial_text = ''.join(assistant_response_content)
+                    if partial_text or assistant_reasoning_content:
+                        try:
+                            from history_window import count_tokens, count_prompt_tokens
+                            received_tokens = final_completion_tokens or count_tokens(partial_text + ''.join(assistant_reasoning_content))
+                            prompt_tokens = final_prompt_tokens or count_prompt_tokens(payload['messages'])
+                            save_assistant_reply(partial_text, prompt_tokens, received_tokens, truncated=True)
+                        except Exception as e:
+                            logger.error(f"Error saving truncated reply for conversation {current_conv_id}: {e}")
+                            db.session.rollback()
+                trace.finish(status='client_disconnect')
+                raise
             except requests.exceptions.RequestException as e: # Catch requests errors
                  logger.exception(f"Requests error during stream: {e}")
                  yield f"data: {json.dumps({'type': 'error', 'error': f'Connection error: {e}'})}\n\n"
@@ -3774,17 +3986,57 @@ def chat(): # Synchronous function
                 # Catch any other unexpected errors during generation
                 logger.exception("Error during sync stream generation processing")
                 yield f"data: {json.dumps({'type': 'error', 'error': f'Stream Processing Error: {str(e)}'})}\n\n"
+            finally:
+                # Return the pooled connection (or discard it if the stream wasn't fully read)
+                if response is not None:
+                    response.close()
+                # Nothing was billed (error or no usage) - give the held credits back
+                if credit_reservation is not None:
+                    credit_reservation.release()
+                trace.finish()
 
         # --- Return the Response object wrapping the sync generator with context ---
+        # Events are also recorded in a Redis Stream so a dropped client can resume (see stream_replay.py)
+        stream_id = new_stream_id()
+        stream_user = str(current_user.id) if current_user.is_authenticated else None
         # Use stream_with_context for sync generators in Flask
-        return Response(stream_with_context(generate()), content_type='text/event-stream') 
+        return Response(stream_with_context(publish_stream(stream_id, generate(), owner=stream_user)),
+                        content_type='text/event-stream',
+                        headers={'X-Stream-Id': stream_id})
 
     except Exception as e:
         # Catch errors during initial setup before generation starts
         logger.exception("Error in chat endpoint setup")
         abort(500, description=f"Chat endpoint setup error: {str(e)}") 
+    finally:
+        # Early returns (402, 400, ...) and errors can leave stages unjoined; stop them
+        # so they don't hold DB connections after the response. The stream itself
+        # reads no stage results, so this never cuts short work it needs.
+        if fanout is not None:
+            fanout.cancel_all()
 # === END OF SYNC chat() ENDPOINT ===
 
+def resume_chat_stream(stream_id, last_seq=0):
+    """
+    Replay a chat response after the client's last received event, then follow it live
+    
+    Args:
+        stream_id: Stream ID from the X-Stream-Id header or an event id
+        last_seq: Sequence number of the last event the client received
+    """
+    owner = stream_owner(stream_id)
+    if owner is None:
+        return jsonify({'error': 'Stream not found or expired'}), 404
+    if owner and (not current_user.is_authenticated or str(current_user.id) != owner):
+        return jsonify({'error': 'Not allowed to resume this stream'}), 403
+    
+    logger.info(f"Resuming chat stream {stream_id} after event {last_seq}")
+    return Response(
+        replay_stream(stream_id, last_seq),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Stream-Id': stream_id}
+    )
+
 @app.route('/chat/stream', methods=['GET'])
 def chat_stream_safari_fallback():
     """
@@ -3793,10 +4045,18 @@ def chat_stream_safari_fallback():
     This route provides a fallback for iOS Safari browsers which have issues
     with fetch() streaming. It uses Server-Sent Events (EventSource) instead.
     
-    The client stores the payload in sessionStorage and passes a temp_id
-    parameter to this endpoint to retrieve it.
+    With a stream_id parameter (or a Last-Event-ID header, which EventSource sends
+    when it reconnects) it resumes an in-flight /chat response. Otherwise the client
+    stores the payload in sessionStorage and passes a temp_id parameter to this
+    endpoint to retrieve it.
     """
     try:
+        resume_from = parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+        if not resume_from and request.args.get('stream_id'):
+            resume_from = parse_event_id(f"{request.args.get('stream_id')}:0")
+        if resume_from:
+            return resume_chat_stream(*resume_from)
+        
         temp_id = request.args.get('temp_id')
         if not temp_id:
             return "Missing temp_id parameter", 400
@@ -4034,15 +4294,7 @@ def update_pricing_cache_background():
                 redis_client = get_redis_client('cache')
                 
                 if redis_client:
-                    import json
-                    response_json = json.dumps(response_data)
-                    
-                    # Store as fresh cache (5 minutes)
-                    redis_client.setex('cache:pricing_data_fresh', 300, response_json)
-                    
-                    # Store as stale cache (24 hours) for fallback
-                    redis_client.setex('cache:pricing_data_stale', 86400, response_json)
-                    
+                    _store_pricing_cache(redis_client, response_data)
                     logger.info("Background cache update completed successfully")
             except Exception as cache_error:
                 logger.debug(f"Background cache update failed: {cache_error}")
@@ -4050,37 +4302,87 @@ def update_pricing_cache_background():
     except Exception as e:
         logger.debug(f"Background pricing update failed: {e}")
 
+# Pricing response cache: stored once with the time it was written. Reads
+# younger than PRICING_CACHE_FRESH_SECONDS are fresh; older ones are served
+# stale while a background refresh runs, until the key expires.
+PRICING_CACHE_KEY = 'cache:pricing_data'
+PRICING_CACHE_FRESH_SECONDS = 300
+PRICING_CACHE_STALE_SECONDS = 86400
+
+def _store_pricing_cache(redis_client, response_data):
+    """Store the pricing response (encoded and compressed by cache_codec)"""
+    from cache_codec import encode_value
+    payload = encode_value({'stored_at': time.time(), 'data': response_data})
+    redis_client.setex(PRICING_CACHE_KEY, PRICING_CACHE_STALE_SECONDS, payload)
+
+def _load_pricing_cache(redis_client):
+    """
+    Read the cached pricing response
+    
+    Returns:
+        tuple: (response data or None, whether it is still fresh)
+    """
+    from cache_codec import decode_value
+    cached = decode_value(redis_client.get(PRICING_CACHE_KEY))
+    if not isinstance(cached, dict) or 'data' not in cached:
+        return None, False
+    age = time.time() - float(cached.get('stored_at') or 0)
+    return cached['data'], age < PRICING_CACHE_FRESH_SECONDS
+
+def _refresh_pricing_cache_once():
+    """
+    Run update_pricing_cache_background in an app context, then release the
+    single-flight lock taken by get_model_prices so the next stale read can refresh
+    """
+    try:
+        with app.app_context():
+            update_pricing_cache_background()
+    finally:
+        try:
+            from api_cache import get_redis_client
+            redis_client = get_redis_client('cache')
+            if redis_client:
+                redis_client.delete('cache:pricing_data_refresh_lock')
+        except Exception as e:
+            logger.debug(f"Could not release pricing refresh lock: {e}")
+
 @app.route('/api/get_model_prices', methods=['GET'])
 def get_model_prices():
     """ 
     Get the current model prices from the database with hybrid Redis + database caching for instant loading
     """
     try:
+        # STEP 0: Serve the precompressed payload built from the model catalog
+        try:
+            from model_payloads import build_prices_data, get_prepared_payload, serve_payload
+            prepared = get_prepared_payload('prices', build_prices_data,
+                                            since=request.args.get('since', type=int))
+            if prepared is not None:
+                return serve_payload(prepared, 'get_model_prices')
+        except Exception as e:
+            logger.warning(f"Prepared pricing payload unavailable, falling back to cache/database: {e}")
+
         # STEP 1: Try to get cached pricing data first for instant loading
         try:
             from api_cache import get_redis_client
             redis_client = get_redis_client('cache')
             
             if redis_client:
-                # Check for both fresh and stale cache entries
-                fresh_cached_data = redis_client.get('cache:pricing_data_fresh')
-                stale_cached_data = redis_client.get('cache:pricing_data_stale')
+                cached_response, is_fresh = _load_pricing_cache(redis_client)
                 
-                if fresh_cached_data:
-                    import json
+                if cached_response is not None and is_fresh:
                     logger.info("Serving fresh pricing data from Redis cache")
-                    return jsonify(json.loads(fresh_cached_data))
-                elif stale_cached_data:
-                    import json
-                    cached_response = json.loads(stale_cached_data)
+                    return jsonify(cached_response)
+                elif cached_response is not None:
                     logger.info("Serving stale pricing data from Redis cache while updating in background")
                     
-                    # Trigger background update (non-blocking)
+                    # Trigger background update (non-blocking), once across the cluster
                     try:
-                        import threading
-                        update_thread = threading.Thread(target=update_pricing_cache_background)
-                        update_thread.daemon = True
-                        update_thread.start()
+                        if redis_client.set('cache:pricing_data_refresh_lock', '1', nx=True, ex=60):
+                            import threading
+                            update_thread = threading.Thread(target=_refresh_pricing_cache_once)
+                            update_thread.daemon = True
+                            update_thread.start()
                     except Exception as bg_error:
                         logger.debug(f"Could not start background update: {bg_error}")
                     
@@ -4098,6 +4400,7 @@ def get_model_prices():
             # Convert database models to the expected format with robust handling
             prices = {}
             models_with_missing_data = []
+            persisted_cost_bands = []
             
             for db_model in db_models:
                 try:
@@ -4124,6 +4427,7 @@ def get_model_prices():
                         try:
                             db_model.cost_band = cost_band
                             db.session.commit()
+                            persisted_cost_bands.append(model_id)
                             logger.info(f"Generated and persisted cost band '{cost_band}' for model {model_id}")
                         except Exception as persist_error:
                             logger.error(f"Failed to persist cost band for {model_id}: {persist_error}")
@@ -4200,6 +4504,11 @@ def get_model_prices():
                 except Exception as cache_error:
                     logger.warning(f"Failed to update Redis cache after cost band generation: {cache_error}")
             
+            # Clients holding the catalog version need a delta with the new cost bands
+            if persisted_cost_bands:
+                from catalog_changelog import UPDATED, publish_catalog_changes
+                publish_catalog_changes({model_id: UPDATED for model_id in persisted_cost_bands})
+            
             # Use the timestamp of the most recently updated model
             latest_model = OpenRouterModel.query.order_by(OpenRouterModel.last_fetched_at.desc()).first()
             last_updated = latest_model.last_fetched_at.isoformat() if latest_model else None
@@ -4219,16 +4528,8 @@ def get_model_prices():
                 redis_client = get_redis_client('cache')
                 
                 if redis_client:
-                    import json
-                    response_json = json.dumps(response_data)
-                    
-                    # Store as fresh cache (5 minutes)
-                    redis_client.setex('cache:pricing_data_fresh', 300, response_json)
-                    
-                    # Store as stale cache (24 hours) for fallback
-                    redis_client.setex('cache:pricing_data_stale', 86400, response_json)
-                    
-                    logger.info("Cached pricing data in Redis with dual-layer strategy")
+                    _store_pricing_cache(redis_client, response_data)
+                    logger.info("Cached pricing data in Redis")
             except Exception as e:
                 logger.debug(f"Could not cache pricing data: {e}")
             
@@ -4395,9 +4696,18 @@ def refresh_model_prices():
 @app.route('/api/model-pricing', methods=['GET'])
 def get_model_pricing():
     """ 
-    Legacy endpoint - redirects to the primary model pricing endpoint
+    Legacy endpoint - serves the same payload as the primary model pricing endpoint
     This ensures any unknown dependencies continue to work
     """
+    try:
+        from model_payloads import build_prices_data, get_prepared_payload, serve_payload
+        prepared = get_prepared_payload('prices', build_prices_data,
+                                        since=request.args.get('since', type=int))
+        if prepared is not None:
+            return serve_payload(prepared, 'model_pricing')
+    except Exception as e:
+        logger.warning(f"Prepared pricing payload unavailable for legacy endpoint: {e}")
+
     logger.info("Legacy /api/model-pricing endpoint called, redirecting to /api/get_model_prices")
     return redirect(url_for('get_model_prices'))
 
@@ -4408,6 +4718,17 @@ def get_models():
     This is an updated implementation that uses the database as the primary source
     """
     try:
+        # Serve the precompressed payload built from the model catalog
+        try:
+            from model_payloads import build_models_data, get_prepared_payload, serve_payload
+            prepared = get_prepared_payload(
+                'models', lambda catalog, model_ids=None: build_models_data(catalog, DOCUMENT_MODELS, model_ids),
+                since=request.args.get('since', type=int))
+            if prepared is not None:
+                return serve_payload(prepared, 'models')
+        except Exception as e:
+            logger.warning(f"Prepared models payload unavailable, falling back to database: {e}")
+
         from models import OpenRouterModel
         
         # Query only active models from the database
@@ -4433,10 +4754,7 @@ def get_models():
                     'supports_pdf': bool(db_model.supports_pdf or db_model.model_id in DOCUMENT_MODELS),
                     'is_free': db_model.input_price_usd_million == 0 and db_model.output_price_usd_million == 0,
                     'is_perplexity': 'perplexity/' in db_model.model_id.lower(),
-                    'is_reasoning': any(keyword in db_model.model_id.lower() or 
-                                       (db_model.name and keyword in db_model.name.lower()) or 
-                                       (db_model.description and keyword in db_model.description.lower())
-                                       for keyword in ['reasoning', 'opus', 'o1', 'o3'])
+                    'is_reasoning': bool(db_model.supports_reasoning)
                 }
                 processed_models.append(model_data)
                 
@@ -4540,6 +4858,9 @@ def save_preference():
             db.session.add(preference)
 
         db.session.commit()
+        if current_user and current_user.is_authenticated:
+            from user_context import invalidate_user_context
+            invalidate_user_context(current_user.id)
         return jsonify({"success": True, "message": "Preference saved successfully"})
     except Exception as e:
         logger.exception("Error saving preference")
@@ -4554,8 +4875,16 @@ def get_preferences():
         user_identifier = get_user_identifier()
         from models import UserPreference 
 
-        preferences = UserPreference.query.filter_by(user_identifier=user_identifier).all()
-        result = {str(p.preset_id): p.model_id for p in preferences}
+        # Signed-in users' preferences come with the cached user context
+        context = None
+        if current_user and current_user.is_authenticated:
+            from user_context import get_user_context
+            context = get_user_context(current_user.id)
+        if context is not None:
+            result = dict(context['preferences'])
+        else:
+            preferences = UserPreference.query.filter_by(user_identifier=user_identifier).all()
+            result = {str(p.preset_id): p.model_id for p in preferences}
 
         for preset_id_str, default_model in DEFAULT_PRESET_MODELS.items():
             if preset_id_str not in result:
@@ -4758,6 +5087,9 @@ def reset_preferences():
             message = "All preferences reset to defaults"
         
         db.session.commit()
+        if current_user and current_user.is_authenticated:
+            from user_context import invalidate_user_context
+            invalidate_user_context(current_user.id)
         return jsonify({"success": True, "message": message})
     except Exception as e:
         logger.exception("Error resetting preferences")
@@ -4796,7 +5128,8 @@ def get_conversation_messages(conversation_id):
                 "created_at": msg.created_at.isoformat(),
                 "rating": msg.rating,
                 "model": msg.model,
-                "image_url": msg.image_url  # Include image URL for multimodal messages
+                "image_url": msg.image_url,  # Include image URL for multimodal messages
+                "is_truncated": bool(msg.is_truncated)  # Reply was cut short by a client disconnect
             }
             formatted_messages.append(formatted_message)
             
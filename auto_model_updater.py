@@ -1,51 +1,51 @@
 """
 Automatic Model Updater
-Runs in background to check for OpenRouter model changes and update all systems
+Clears model caches in this process whenever the model table changes
 """
 
-import threading
-import time
 import logging
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 class AutoModelUpdater:
-    def __init__(self, check_interval_minutes=5):
-        self.check_interval = check_interval_minutes * 60  # Convert to seconds
+    """
+    Reacts to model table changes published on the invalidation bus.
+
+    The price updater publishes a model_catalog event after committing changed
+    rows, so this no longer polls OpenRouter on a timer in every worker.
+    """
+
+    def __init__(self):
         self.running = False
-        self.thread = None
         self.last_update = None
         
     def start_monitoring(self):
-        """Start the background monitoring thread"""
+        """Subscribe to model change events in this process"""
         if self.running:
             logger.info("Model monitoring already running")
             return
             
+        from invalidation_bus import MODEL_CATALOG_TOPIC, ensure_listener, subscribe
+        
         self.running = True
-        self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.thread.start()
-        logger.info(f"Started automatic model monitoring (checking every {self.check_interval/60} minutes)")
+        subscribe(MODEL_CATALOG_TOPIC, self._on_models_changed)
+        ensure_listener()
+        logger.info("Started automatic model monitoring (invalidation bus)")
         
     def stop_monitoring(self):
-        """Stop the background monitoring"""
+        """Stop reacting to model change events"""
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
         logger.info("Stopped automatic model monitoring")
         
-    def _monitor_loop(self):
-        """Main monitoring loop that runs in background"""
-        while self.running:
-            try:
-                self._check_and_update()
-                time.sleep(self.check_interval)
-            except Exception as e:
-                logger.error(f"Error in model monitoring loop: {e}")
-                time.sleep(60)  # Wait 1 minute before retrying
-                
+    def _on_models_changed(self, event):
+        """invalidation_bus handler for model_catalog events"""
+        if not self.running:
+            return
+        logger.info(f"🔄 Model catalog v{event.get('version')} published, clearing caches")
+        self.last_update = datetime.utcnow()
+        self._clear_caches()
+        
     def _check_and_update(self):
         """Check for changes and update if needed"""
         try:
@@ -54,13 +54,8 @@ class AutoModelUpdater:
             changed, message = check_and_update_if_changed()
             
             if changed:
-                logger.info(f"🔄 Automatic model update triggered: {message}")
-                self.last_update = datetime.utcnow()
-                
-                # Clear any cached data to ensure fresh data is served
-                self._clear_caches()
-                
-                logger.info("✅ Automatic model update completed successfully")
+                # The update publishes a model_catalog event; caches are cleared by the handler
+                logger.info(f"🔄 Model update completed: {message}")
             else:
                 logger.debug(f"No model changes detected: {message}")
                 
@@ -73,10 +68,8 @@ class AutoModelUpdater:
             # Clear Redis caches if available
             try:
                 from api_cache import clear_model_caches
-                clear_model_caches()
-                logger.info("Cleared model caches after update")
-            except ImportError:
-                logger.debug("Redis caching not available, skipping cache clear")
+                deleted = clear_model_caches()
+                logger.info(f"Cleared {deleted} model cache keys after update")
             except Exception as e:
                 logger.warning(f"Error clearing caches: {e}")
                 
@@ -0,0 +1,218 @@
+"""
+Background Pool Module
+
+A fixed set of worker threads fed from a bounded queue, for fire-and-forget
+work that must not hold up the response (e.g. memory writes after a chat turn).
+
+When the queue is full, submit() waits up to put_timeout for room, which slows
+producers instead of letting a backlog grow without bound. After that the task
+overflows: it is handed to the spill callable when one is configured (for
+example to enqueue it on the RQ job queue) and dropped otherwise. shutdown()
+stops accepting work and lets the workers drain the queue within a deadline;
+whatever is still queued then is spilled or dropped the same way.
+
+Workers start on the first submit in each process, so pools created at import
+time under gunicorn's preload_app are started in the workers, not the master.
+Under gevent the threads are greenlets.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Placed on the queue once per worker by shutdown()
+_STOP = object()
+
+# Pools in this process by name
+_pools: Dict[str, 'BoundedWorkerPool'] = {}
+_pools_lock = threading.Lock()
+
+
+class BoundedWorkerPool:
+    """
+    Bounded queue drained by a fixed number of worker threads
+
+    Usage:
+        pool = BoundedWorkerPool('memory', workers=2, max_queue=200)
+        pool.submit(save_message, session_id, content)
+    """
+
+    def __init__(self, name: str, workers: int = 2, max_queue: int = 100,
+                 put_timeout: float = 0.05,
+                 spill: Optional[Callable[[Callable, Tuple, Dict], bool]] = None):
+        """
+        Initialize the pool (no threads are started until the first submit)
+
+        Args:
+            name: Pool name, used in thread names and metric labels
+            workers: Number of worker threads
+            max_queue: Most tasks waiting for a worker
+            put_timeout: Seconds submit() waits for room in a full queue
+            spill: Called as spill(func, args, kwargs) for tasks that don't fit;
+                returns True if it took the task. Without it they are dropped.
+        """
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self.spill = spill
+        self.busy = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+        with _pools_lock:
+            _pools[name] = self
+
+    def _ensure_started(self):
+        """Start the workers once per process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads don't survive a fork; start over with an empty queue
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._threads = []
+            self.busy = 0
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+            logger.info(f"Started {self.workers} '{self.name}' workers (queue size {self.max_queue})")
+
+    def _count(self, outcome: str):
+        registry.inc('background_pool_tasks_total', help='Background pool tasks by outcome',
+                     pool=self.name, outcome=outcome)
+
+    def _overflow(self, func: Callable, args: Tuple, kwargs: Dict, reason: str) -> bool:
+        """Spill a task that can't be queued, or drop it"""
+        if self.spill is not None:
+            try:
+                if self.spill(func, args, kwargs):
+                    self._count('spilled')
+                    return True
+            except Exception as e:
+                logger.error(f"Pool '{self.name}' could not spill {func.__name__}: {e}")
+        logger.warning(f"Pool '{self.name}' dropped {func.__name__} ({reason})")
+        self._count('dropped')
+        return False
+
+    def submit(self, func: Callable, *args, **kwargs) -> bool:
+        """
+        Queue func(*args, **kwargs) for a worker
+
+        Args:
+            func: Function to run
+            *args: Positional arguments
+            **kwargs: Keyword arguments
+
+        Returns:
+            bool: True if the task was queued or spilled, False if it was dropped
+        """
+        if self._closed:
+            return self._overflow(func, args, kwargs, 'shutting down')
+
+        self._ensure_started()
+        try:
+            self._queue.put((func, args, kwargs, time.monotonic()), timeout=self.put_timeout)
+        except queue.Full:
+            return self._overflow(func, args, kwargs, 'queue full')
+        self._count('queued')
+        return True
+
+    def _work(self):
+        """Worker loop: run tasks until the stop marker"""
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            func, args, kwargs, queued_at = task
+            registry.observe('background_pool_wait_seconds', time.monotonic() - queued_at,
+                             help='Time tasks waited for a worker', pool=self.name)
+            with self._lock:
+                self.busy += 1
+            try:
+                func(*args, **kwargs)
+                self._count('completed')
+            except Exception as e:
+                logger.error(f"Pool '{self.name}' task {func.__name__} failed: {e}")
+                self._count('failed')
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+    def depth(self) -> int:
+        """Tasks waiting for a worker"""
+        return self._queue.qsize()
+
+    def shutdown(self, timeout: float = 10.0) -> int:
+        """
+        Stop accepting tasks and let the workers finish the queued ones
+
+        Args:
+            timeout: Seconds to wait for the queue to drain
+
+        Returns:
+            int: Tasks still queued at the deadline (spilled or dropped)
+        """
+        self._closed = True
+        if self._pid != os.getpid():
+            return 0
+
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+
+        # Anything the workers didn't reach in time
+        leftover = 0
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if task is not _STOP:
+                func, args, kwargs, _ = task
+                self._overflow(func, args, kwargs, 'shutdown deadline')
+                leftover += 1
+
+        logger.info(f"Pool '{self.name}' shut down, {leftover} tasks left undone by workers")
+        return leftover
+
+
+def shutdown_all(timeout: float = 10.0):
+    """Drain every pool in this process, sharing one deadline"""
+    deadline = time.monotonic() + timeout
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.shutdown(max(deadline - time.monotonic(), 0))
+
+
+def _pool_collector():
+    """Export queue depth, capacity and busy workers per pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        labels = {'pool': pool.name}
+        yield ('background_pool_queue_depth', 'gauge', 'Tasks waiting for a worker', labels, pool.depth())
+        yield ('background_pool_queue_capacity', 'gauge', 'Most tasks that can wait for a worker',
+               labels, pool.max_queue)
+        yield ('background_pool_busy_workers', 'gauge', 'Workers running a task', labels, pool.busy)
+
+
+registry.register_collector(_pool_collector)
@@ -0,0 +1,112 @@
+"""
+Benchmark for Redis Cache Codecs
+
+Encodes and decodes the two largest cached values, the pricing response and
+the /models list, with every codec installed here (json, orjson, msgpack),
+uncompressed and compressed (zstd when installed, else zlib). Reports the
+stored size and the encode/decode time per value, so REDIS_CACHE_CODEC and
+REDIS_CACHE_COMPRESS_MIN_BYTES can be chosen from measurements.
+
+The payloads are built by model_payloads from a synthetic catalog of
+MODEL_COUNT models with varied names and descriptions, about the size of the
+OpenRouter catalog.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+from datetime import datetime, timedelta
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+MODEL_COUNT = int(os.environ.get('BENCHMARK_MODELS', '350'))
+ITERATIONS = int(os.environ.get('BENCHMARK_ITERATIONS', '200'))
+
+_WORDS = ('reasoning', 'multilingual', 'context', 'vision', 'instruction', 'tuned', 'fast',
+          'efficient', 'coding', 'agentic', 'tool', 'use', 'long', 'documents', 'chat',
+          'mixture', 'experts', 'open', 'weights', 'frontier', 'model', 'latency', 'quality')
+
+
+def build_catalog():
+    """Synthetic catalog shaped like the production model table"""
+    from model_catalog import ModelCatalog
+
+    rng = random.Random(42)
+    providers = ('openai', 'anthropic', 'google', 'meta-llama', 'mistralai', 'deepseek', 'qwen', 'x-ai')
+    entries = []
+    for i in range(MODEL_COUNT):
+        provider = rng.choice(providers)
+        price = round(rng.uniform(0, 20), 3) if i % 7 else 0.0
+        entries.append({
+            'model_id': f"{provider}/model-{i}",
+            'name': f"{provider.title()} Model {i}",
+            'description': ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(30, 90))),
+            'context_length': rng.choice((8192, 32768, 128000, 200000, 1000000)),
+            'input_price_usd_million': price,
+            'output_price_usd_million': price * 4,
+            'is_multimodal': rng.random() < 0.3,
+            'is_free': price == 0,
+            'supports_reasoning': rng.random() < 0.2,
+            'supports_pdf': rng.random() < 0.2,
+            'cost_band': rng.choice(('', '$', '$$', '$$$', '$$$$')),
+            'elo_score': rng.randint(1000, 1400) if rng.random() < 0.5 else None,
+            'model_is_active': True,
+            'updated_at': datetime(2025, 5, 1) + timedelta(minutes=i),
+        })
+    return ModelCatalog(entries, version=1, change_version=1)
+
+
+def measure(label, payload, codec, compress_min_bytes):
+    """Log stored size and mean encode/decode time for one codec setting"""
+    from cache_codec import decode_value, encode_value
+
+    encoded = encode_value(payload, codec, compress_min_bytes)
+    assert decode_value(encoded) == decode_value(encode_value(payload, codec, 0))
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        encode_value(payload, codec, compress_min_bytes)
+    encode_us = (time.perf_counter() - started) / ITERATIONS * 1e6
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        decode_value(encoded)
+    decode_us = (time.perf_counter() - started) / ITERATIONS * 1e6
+
+    compression = 'raw' if not compress_min_bytes else 'compressed'
+    logger.info(f"{label:8} | {codec.name:8} | {compression:10} | {len(encoded):9,} bytes | "
+                f"encode {encode_us:8.1f} us | decode {decode_us:8.1f} us")
+
+
+def main():
+    """Compare every installed codec on the pricing and model-list payloads"""
+    import json
+    from cache_codec import CODECS, ZSTD_AVAILABLE, COMPRESS_MIN_BYTES
+    from model_payloads import build_models_data, build_prices_data
+
+    catalog = build_catalog()
+    payloads = {
+        # As cached by app._store_pricing_cache
+        'pricing': {'stored_at': time.time(), 'data': build_prices_data(catalog)},
+        'models': build_models_data(catalog),
+    }
+    logger.info(f"{MODEL_COUNT} models, {ITERATIONS} iterations, compression: "
+                f"{'zstd' if ZSTD_AVAILABLE else 'zlib (zstandard not installed)'}")
+
+    for label, payload in payloads.items():
+        logger.info(f"{label}: json.dumps() is {len(json.dumps(payload, default=str)):,} bytes before this change")
+        for codec in CODECS.values():
+            for compress_min_bytes in (0, COMPRESS_MIN_BYTES):
+                measure(label, payload, codec, compress_min_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark for API Cache Stampede Protection
+
+Fires a burst of 500 concurrent requests at a cached pricing key the moment
+it expires and counts how many times the expensive loader runs, first with the
+old get-compute-set decorator logic and then with ApiCache's single-flight
+path. The requests are spread over WORKERS ApiCache instances sharing Redis,
+standing in for gunicorn workers; with Redis unavailable a single instance is
+used and only the in-process coalescing is exercised.
+
+Expected result: the old logic recomputes once per request that missed, the
+new one recomputes exactly once.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+BURST_SIZE = int(os.environ.get('BENCHMARK_BURST', '500'))
+WORKERS = 4
+LOAD_SECONDS = 0.2
+TTL = 2
+
+
+def legacy_get_or_compute(cache, cache_key, cache_ttl, compute):
+    """The decorator body before single-flight: every miss computes"""
+    cached = cache.redis.get(cache_key) if cache.redis else None
+    if cached is not None:
+        return cached
+    result = compute()
+    if cache.redis:
+        cache.redis.set(cache_key, result, expire=cache_ttl)
+    return result
+
+
+def run_burst(label, caches, get_or_compute):
+    """Expire the key, release BURST_SIZE requests at once and report recomputes and latency"""
+    loads = []
+    loads_lock = threading.Lock()
+
+    def load_pricing():
+        with loads_lock:
+            loads.append(1)
+        time.sleep(LOAD_SECONDS)
+        return {'prices': {f'model-{i}': i for i in range(200)}}
+
+    cache_key = f"benchmark_pricing_{label.replace(' ', '_')}"
+    if caches[0].redis:
+        caches[0].redis.delete(cache_key)
+
+    barrier = threading.Barrier(BURST_SIZE)
+    latencies = []
+
+    def request(cache):
+        barrier.wait()
+        started = time.perf_counter()
+        get_or_compute(cache, cache_key, TTL, load_pricing)
+        latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=request, args=(caches[i % len(caches)],)) for i in range(BURST_SIZE)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    logger.info(f"{label:14} | {len(loads):4} recomputes | burst {elapsed * 1000:7.1f} ms | "
+                f"p50 {p50:6.1f} ms | p99 {p99:6.1f} ms")
+    return len(loads)
+
+
+def main():
+    """Run the burst with the old and the new decorator logic"""
+    from api_cache import ApiCache
+
+    caches = [ApiCache(namespace='benchmark_stampede:') for _ in range(WORKERS)]
+    if not caches[0].redis or not caches[0].redis.redis_client:
+        logger.warning("Redis unavailable: only in-process coalescing is measured, using one worker")
+        caches = caches[:1]
+
+    run_burst('legacy', caches, legacy_get_or_compute)
+    recomputes = run_burst('single-flight', caches,
+                           lambda cache, key, ttl, compute: cache._get_or_compute(key, ttl, compute))
+    if recomputes != 1:
+        logger.error(f"Expected exactly one recompute, got {recomputes}")
+
+
+if __name__ == "__main__":
+    main()
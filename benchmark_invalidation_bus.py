@@ -0,0 +1,65 @@
+"""
+Benchmark for Invalidation Bus Propagation
+
+Starts the invalidation bus listener in this process, publishes a series of
+events on a benchmark topic and reports the publish-to-handler delay (p50, p95,
+p99) from the cache_invalidation_delay_seconds summary. Run it on a worker host
+against the production Redis to see how quickly a committed model update
+reaches every worker, compared with the 300 s polling interval it replaces.
+
+Requires Redis (see redis_config for the REDIS_BUS_* / REDIS_* variables).
+"""
+
+import os
+import sys
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+EVENT_COUNT = int(os.environ.get('BENCHMARK_EVENTS', '200'))
+EVENT_INTERVAL = 0.01
+TOPIC = 'benchmark'
+
+
+def main():
+    """Publish EVENT_COUNT events and log the propagation delay quantiles"""
+    import invalidation_bus
+    from metrics import registry
+
+    received = []
+    invalidation_bus.subscribe(TOPIC, received.append)
+    invalidation_bus.ensure_listener()
+
+    deadline = time.time() + 10
+    while not invalidation_bus.is_listening():
+        if time.time() > deadline:
+            logger.error("Listener did not connect to Redis, aborting")
+            return
+        time.sleep(0.1)
+
+    for i in range(EVENT_COUNT):
+        invalidation_bus.publish(TOPIC, version=i)
+        time.sleep(EVENT_INTERVAL)
+
+    deadline = time.time() + 5
+    while len(received) < EVENT_COUNT and time.time() < deadline:
+        time.sleep(0.05)
+
+    summary = registry.get_summary('cache_invalidation_delay_seconds', topic=TOPIC)
+    if not summary:
+        logger.error("No events received")
+        return
+    logger.info(f"Received {len(received)}/{EVENT_COUNT} events")
+    logger.info(f"Propagation delay: p50 {summary['p50'] * 1000:.2f} ms | "
+                f"p95 {summary['p95'] * 1000:.2f} ms | p99 {summary['p99'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark for Storing OpenRouter Model Prices
+
+Compares the old per-model ORM loop with store_model_rows() (one bulk
+INSERT ... ON CONFLICT for changed rows) on a 1,000-model fixture, for a first
+load, an unchanged refresh and a refresh where 5% of the prices moved.
+
+Runs against an in-memory SQLite database by default. Set BENCHMARK_DATABASE_URL
+to a scratch Postgres database to benchmark there - the openrouter_model table
+in that database is dropped and recreated.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+MODEL_COUNT = 1000
+CHANGED_FRACTION = 0.05
+
+
+def build_fixture(count=MODEL_COUNT, seed=1):
+    """
+    Build an API response and the processed price entries for `count` models
+
+    Returns:
+        tuple: (api_models by ID, prices by ID)
+    """
+    rng = random.Random(seed)
+    api_models = {}
+    prices = {}
+    for i in range(count):
+        model_id = f"vendor{i % 40}/model-{i}" + (':free' if i % 10 == 0 else '')
+        input_price = 0.0 if i % 10 == 0 else rng.choice([0.1, 0.5, 1.0, 3.0, 15.0])
+        output_price = input_price * 4
+        api_models[model_id] = {
+            'id': model_id,
+            'name': f"Model {i}",
+            'description': f"Benchmark model {i} " * 20,
+            'context_length': rng.choice([8192, 32768, 128000, 200000]),
+            'supported_parameters': ['temperature', 'reasoning'] if i % 3 == 0 else ['temperature'],
+        }
+        prices[model_id] = {
+            'input_price': input_price * 2,
+            'output_price': output_price * 2,
+            'raw_input_price': input_price,
+            'raw_output_price': output_price,
+            'context_length': api_models[model_id]['context_length'],
+            'is_multimodal': i % 4 == 0,
+            'supports_pdf': i % 8 == 0,
+            'model_name': f"Model {i}",
+            'cost_band': '$$' if input_price else '',
+        }
+    return api_models, prices
+
+
+def change_prices(prices, fraction=CHANGED_FRACTION, seed=2):
+    """Return a copy of the price entries with a fraction of the prices changed"""
+    rng = random.Random(seed)
+    changed = {model_id: dict(entry) for model_id, entry in prices.items()}
+    for model_id in rng.sample(sorted(changed), int(len(changed) * fraction)):
+        changed[model_id]['input_price'] += 0.5
+        changed[model_id]['output_price'] += 1.0
+    return changed
+
+
+def legacy_store(prices, models_data):
+    """The per-model loop fetch_and_store_openrouter_prices used before bulk upserts"""
+    from database import db
+    from models import OpenRouterModel
+
+    OpenRouterModel.query.update({OpenRouterModel.model_is_active: False})
+    for model_id, model_data in prices.items():
+        db_model = db.session.get(OpenRouterModel, model_id)
+        original_model = next((m for m in models_data['data'] if m.get('id') == model_id), {})
+        if db_model is None:
+            db_model = OpenRouterModel(model_id=model_id, created_at=datetime.utcnow())
+            db.session.add(db_model)
+        db_model.name = model_data['model_name']
+        db_model.description = original_model.get('description', '')
+        db_model.context_length = model_data['context_length']
+        db_model.input_price_usd_million = model_data['input_price']
+        db_model.output_price_usd_million = model_data['output_price']
+        db_model.is_multimodal = model_data['is_multimodal']
+        db_model.supports_pdf = model_data['supports_pdf']
+        db_model.cost_band = model_data['cost_band']
+        db_model.is_free = model_data['input_price'] < 0.01 or ':free' in model_id.lower()
+        original_model = next((m for m in models_data['data'] if m.get('id') == model_id), {})
+        supported_parameters = original_model.get('supported_parameters', [])
+        db_model.supports_reasoning = 'reasoning' in supported_parameters or 'include_reasoning' in supported_parameters
+        db_model.model_is_active = True
+        db_model.last_fetched_at = datetime.utcnow()
+        db_model.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def main():
+    """Run the benchmark and log time and statement counts per scenario"""
+    from flask import Flask
+    from sqlalchemy import event
+    from database import db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite://')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    from models import OpenRouterModel
+    from price_updater import store_model_rows
+
+    api_models, prices = build_fixture()
+    models_data = {'data': list(api_models.values())}
+    changed_prices = change_prices(prices)
+
+    with app.app_context():
+        table = OpenRouterModel.__table__
+        statements = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements[0] += 1
+
+        for label, store in (('legacy loop', lambda p: legacy_store(p, models_data)),
+                             ('bulk upsert', lambda p: store_model_rows(p, api_models))):
+            table.drop(db.engine, checkfirst=True)
+            table.create(db.engine)
+            for scenario, scenario_prices in (('first load', prices),
+                                              ('unchanged refresh', prices),
+                                              (f'{int(CHANGED_FRACTION * 100)}% changed', changed_prices)):
+                statements[0] = 0
+                started = time.perf_counter()
+                store(scenario_prices)
+                elapsed = time.perf_counter() - started
+                logger.info(f"{label:12} | {scenario:18} | {elapsed * 1000:8.1f} ms | {statements[0]:5} statements")
+
+        table.drop(db.engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    main()
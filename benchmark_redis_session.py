@@ -0,0 +1,148 @@
+"""
+Benchmark for Redis Session Commands per Page Load
+
+Replays a page load (the HTML page, its static assets, the service worker, a
+health check and two API calls, all carrying the session cookie) against a
+small Flask app, first with the previous eager session interface and then
+with the lazy one in redis_session. Redis commands are counted on the server
+from INFO commandstats, so run it against an otherwise idle Redis.
+
+Requires Redis (see redis_config for the REDIS_SESSION_* / REDIS_* variables).
+"""
+
+import os
+import sys
+import json
+import uuid
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+PAGE_LOADS = int(os.environ.get('BENCHMARK_PAGE_LOADS', '50'))
+
+# Requests in one page load and whether the view reads the session
+PAGE_LOAD = (
+    ('/', True),
+    ('/static/css/style.css', False),
+    ('/static/js/script.js', False),
+    ('/static/js/modelSelection.js', False),
+    ('/static/js/apiService.js', False),
+    ('/static/img/logo.png', False),
+    ('/service-worker.js', False),
+    ('/health', False),
+    ('/api/get_model_prices', True),
+    ('/api/conversations', True),
+)
+
+
+def make_legacy_interface():
+    """The session interface before lazy loading: GET on open, full SET on save"""
+    from flask.sessions import SessionInterface, SessionMixin
+    from werkzeug.datastructures import CallbackDict
+    from redis_cache import RedisCache
+
+    class LegacySession(CallbackDict, SessionMixin):
+        def __init__(self, initial=None, sid=None, new=False):
+            def on_update(self):
+                self.modified = True
+            CallbackDict.__init__(self, initial or {}, on_update)
+            self.sid = sid
+            self.new = new
+            self.modified = False
+            self.permanent = True
+
+    class LegacyInterface(SessionInterface):
+        def __init__(self):
+            self.redis = RedisCache(namespace='benchmark_session:', expire_time=3600)
+
+        def open_session(self, app, request):
+            sid = request.cookies.get('session')
+            if not sid:
+                return LegacySession(sid=str(uuid.uuid4()), new=True)
+            data = self.redis.get(sid)
+            if data is not None:
+                return LegacySession(json.loads(data), sid=sid)
+            return LegacySession(sid=sid, new=True)
+
+        def save_session(self, app, session, response):
+            if not session or not session.modified:
+                return
+            self.redis.set(session.sid, json.dumps(dict(session)), expire=3600)
+            response.set_cookie('session', session.sid)
+
+    return LegacyInterface()
+
+
+def make_app(session_interface):
+    """App answering every PAGE_LOAD path, reading the session where a real view does"""
+    from flask import Flask, session
+
+    app = Flask(__name__)
+    app.session_interface = session_interface
+
+    @app.route('/login')
+    def login():
+        session['user_identifier'] = f"temp_{uuid.uuid4().hex}"
+        session['_user_id'] = '42'
+        return 'ok'
+
+    def view(path, reads_session):
+        def handler(**kwargs):
+            if reads_session:
+                return session.get('_user_id', 'anonymous')
+            return 'ok'
+        handler.__name__ = f"view_{abs(hash(path))}"
+        return handler
+
+    for path, reads_session in PAGE_LOAD:
+        app.add_url_rule(path, view_func=view(path, reads_session))
+    return app
+
+
+def count_commands(client):
+    """Total commands processed by the server so far"""
+    stats = client.info('commandstats')
+    return sum(entry['calls'] for name, entry in stats.items() if name != 'cmdstat_info')
+
+
+def run(label, session_interface, client):
+    """Log Redis commands per page load for one session interface"""
+    app = make_app(session_interface)
+    http = app.test_client()
+    http.get('/login')
+
+    before = count_commands(client)
+    for _ in range(PAGE_LOADS):
+        for path, _ in PAGE_LOAD:
+            http.get(path)
+    # The INFO call itself is counted once
+    commands = count_commands(client) - before - 1
+    logger.info(f"{label:7} | {commands / PAGE_LOADS:5.1f} Redis commands per page load "
+                f"({len(PAGE_LOAD)} requests)")
+    return commands / PAGE_LOADS
+
+
+def main():
+    """Compare the eager and lazy session interfaces"""
+    from redis_config import create_redis_client
+    from redis_session import RedisSessionInterface
+
+    client = create_redis_client('session')
+    if client is None:
+        logger.error("Redis unavailable, aborting")
+        return
+
+    eager = run('eager', make_legacy_interface(), client)
+    lazy = run('lazy', RedisSessionInterface(prefix='benchmark_session:', expire=3600), client)
+    if eager:
+        logger.info(f"Lazy sessions send {(1 - lazy / eager) * 100:.0f}% fewer Redis commands")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,8 @@ from reportlab.lib.units import inch, cm
 from database import db
 from models import User, Transaction, Usage, Package, PaymentStatus
 from models import CustomerReferral, Commission, CommissionStatus
+from credit_ledger import invalidate_balance
+from user_context import invalidate_user_context
 # AffiliateStatus is no longer needed since affiliate functionality is handled by User model
 from stripe_config import initialize_stripe, create_checkout_session, verify_webhook_signature, retrieve_session
 
@@ -405,6 +407,9 @@ def stripe_webhook():
             # Save changes
             db.session.commit()
             
+            # Reload the balance used for chat credit checks
+            invalidate_cached_balance(user.id)
+            
             logger.info(f"Payment for {transaction.credits} credits processed successfully for user {user.id}")
             
         # Return a success response
@@ -531,6 +536,7 @@ def update_memory_preference():
         # Update the user's preference
         current_user.enable_memory = enable_memory
         db.session.commit()
+        invalidate_user_context(current_user.id)
         
         logger.info(f"Updated memory preference for user {current_user.id} to {enable_memory}")
         
@@ -561,6 +567,7 @@ def update_fallback_preference():
         # Update the user's preference
         current_user.enable_model_fallback = enable_model_fallback
         db.session.commit()
+        invalidate_user_context(current_user.id)
         
         logger.info(f"Updated model fallback preference for user {current_user.id} to {enable_model_fallback}")
         
@@ -591,6 +598,7 @@ def update_identity_prompt_preference():
         # Update the user's preference
         current_user.enable_identity_prompt = enable_identity_prompt
         db.session.commit()
+        invalidate_user_context(current_user.id)
         
         logger.info(f"Updated identity prompt preference for user {current_user.id} to {enable_identity_prompt}")
         
@@ -1031,7 +1039,18 @@ def calculate_embedding_credits(token_count):
     
     return credits
 
-def record_usage(user_id, credits_used, usage_type, model_id=None, message_id=None, prompt_tokens=None, completion_tokens=None):
+def invalidate_cached_balance(user_id):
+    """
+    Drop the balances cached for a user after User.credits was changed directly
+    (the credit ledger's mirror and the user context snapshot). Call after committing.
+    
+    Args:
+        user_id (int): User ID
+    """
+    invalidate_balance(user_id)
+    invalidate_user_context(user_id)
+
+def record_usage(user_id, credits_used, usage_type, model_id=None, message_id=None, prompt_tokens=None, completion_tokens=None, commit=True, deduct=True):
     """
     Record usage for credit tracking.
     
@@ -1043,6 +1062,12 @@ def record_usage(user_id, credits_used, usage_type, model_id=None, message_id=No
         message_id (int, optional): Message ID
         prompt_tokens (int, optional): Prompt tokens
         completion_tokens (int, optional): Completion tokens
+        commit (bool, optional): Commit the session. Pass False to add the usage
+            row and credit deduction to the caller's transaction instead; the
+            caller must then call invalidate_cached_balance after committing.
+        deduct (bool, optional): Deduct the credits from the user now. Pass False when
+            the credit ledger holds the charge; the row is applied to User.credits
+            later by credit_ledger.reconcile_usage().
     """
     try:
         # Create usage record
@@ -1053,23 +1078,29 @@ def record_usage(user_id, credits_used, usage_type, model_id=None, message_id=No
             model_id=model_id,
             message_id=message_id,
             prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens
+            completion_tokens=completion_tokens,
+            reconciled=deduct
         )
         
         db.session.add(usage)
         
         # Deduct credits from user account
-        user = User.query.get(user_id)
-        if user:
-            user.deduct_credits(credits_used)
+        if deduct:
+            user = User.query.get(user_id)
+            if user:
+                user.deduct_credits(credits_used)
         
-        db.session.commit()
+        if commit:
+            db.session.commit()
+            if deduct:
+                invalidate_cached_balance(user_id)
         
         return True
     
     except Exception as e:
         logger.error(f"Error recording usage: {e}")
-        db.session.rollback()
+        if commit:
+            db.session.rollback()
         return False
 
 def check_sufficient_credits(user_id, estimated_credits):
@@ -0,0 +1,303 @@
+"""
+Cache Codec Module
+
+Binary encoding for values stored in Redis by RedisCache and the pricing cache.
+
+Every encoded value starts with a two byte header: a marker byte that never
+occurs in UTF-8 text, followed by a tag naming the codec and the compression
+used. Readers dispatch on the tag, so workers configured with different codecs
+(for example during a deploy that changes REDIS_CACHE_CODEC) read each other's
+values, and values written before this module existed (plain JSON text) are
+still decoded as before.
+
+Codecs: orjson and msgpack when installed, stdlib json otherwise. Types JSON
+can't represent (datetime, date, Decimal, set, bytes) are stored as small
+tagged objects and restored on read; anything else raises TypeError instead
+of being cached as its str(). Tuples come back as lists, as with json. Bodies
+above COMPRESS_MIN_BYTES are compressed with zstd (zlib when zstandard isn't
+installed) when that makes them smaller.
+"""
+
+import os
+import json
+import zlib
+import base64
+import logging
+import datetime
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+# Optional fast codecs and compression
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# First byte of every encoded value (0xFE is never valid in UTF-8 text)
+MARKER = 0xFE
+
+# Compression flags, OR'ed into the tag byte with the codec ID
+COMPRESS_ZLIB = 0x40
+COMPRESS_ZSTD = 0x80
+_CODEC_MASK = 0x3F
+
+# Bodies at least this large are compressed
+COMPRESS_MIN_BYTES = int(os.environ.get('REDIS_CACHE_COMPRESS_MIN_BYTES', '1024'))
+
+# zstd level (3 is zstd's default and decompresses at the same speed as level 1)
+ZSTD_LEVEL = int(os.environ.get('REDIS_CACHE_ZSTD_LEVEL', '3'))
+
+# zlib fallback level; higher levels cost several ms per payload for little gain
+ZLIB_LEVEL = 1
+
+# Key of the objects standing in for non-JSON types
+TYPE_KEY = '__cache_type__'
+_TYPE_KEY_BYTES = TYPE_KEY.encode()
+
+
+class CodecError(ValueError):
+    """Raised when an encoded value can't be decoded in this process"""
+
+
+def _encode_extension(value: Any) -> Dict[str, Any]:
+    """Represent a non-JSON value as a tagged object (the codecs' default hook)"""
+    if isinstance(value, datetime.datetime):
+        return {TYPE_KEY: 'datetime', 'v': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {TYPE_KEY: 'date', 'v': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {TYPE_KEY: 'decimal', 'v': str(value)}
+    if isinstance(value, (set, frozenset)):
+        return {TYPE_KEY: 'set', 'v': list(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {TYPE_KEY: 'bytes', 'v': base64.b64encode(bytes(value)).decode('ascii')}
+    raise TypeError(f"Type {type(value).__name__} is not cacheable")
+
+
+def _decode_extension(obj: Dict[str, Any]) -> Any:
+    """Restore a tagged object written by _encode_extension (the codecs' object hook)"""
+    kind = obj.get(TYPE_KEY)
+    if kind is None or len(obj) != 2:
+        return obj
+    value = obj['v']
+    if kind == 'datetime':
+        return datetime.datetime.fromisoformat(value)
+    if kind == 'date':
+        return datetime.date.fromisoformat(value)
+    if kind == 'decimal':
+        return Decimal(value)
+    if kind == 'set':
+        return set(value)
+    if kind == 'bytes':
+        return base64.b64decode(value)
+    return obj
+
+
+def _restore(value: Any) -> Any:
+    """Apply _decode_extension bottom-up (for codecs without an object hook)"""
+    if isinstance(value, list):
+        return [_restore(item) for item in value]
+    if isinstance(value, dict):
+        return _decode_extension({key: _restore(item) for key, item in value.items()})
+    return value
+
+
+class JsonCodec:
+    """Standard library json; always available"""
+
+    codec_id = 1
+    name = 'json'
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':'), default=_encode_extension).encode('utf-8')
+
+    def loads(self, data: bytes) -> Any:
+        if _TYPE_KEY_BYTES in data:
+            return json.loads(data, object_hook=_decode_extension)
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """orjson: several times faster than json for the large model payloads"""
+
+    codec_id = 2
+    name = 'orjson'
+
+    def dumps(self, value: Any) -> bytes:
+        # Let the default hook see datetimes so they round-trip as datetimes
+        return orjson.dumps(value, default=_encode_extension,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> Any:
+        value = orjson.loads(data)
+        # Tagged types are rare, so only walk the value when the key occurs
+        if _TYPE_KEY_BYTES in data:
+            return _restore(value)
+        return value
+
+
+class MsgpackCodec:
+    """msgpack: smallest uncompressed encoding, native bytes"""
+
+    codec_id = 3
+    name = 'msgpack'
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_encode_extension, use_bin_type=True, datetime=False)
+
+    def loads(self, data: bytes) -> Any:
+        if _TYPE_KEY_BYTES in data:
+            return msgpack.unpackb(data, raw=False, strict_map_key=False, object_hook=_decode_extension)
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+# Codecs usable in this process, by ID
+CODECS: Dict[int, Any] = {JsonCodec.codec_id: JsonCodec()}
+if ORJSON_AVAILABLE:
+    CODECS[OrjsonCodec.codec_id] = OrjsonCodec()
+if MSGPACK_AVAILABLE:
+    CODECS[MsgpackCodec.codec_id] = MsgpackCodec()
+
+_CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
+
+
+def get_codec(name: Optional[str] = None):
+    """
+    Get a codec by name, or the configured default
+
+    Args:
+        name: 'orjson', 'msgpack' or 'json'; None for REDIS_CACHE_CODEC, else
+            the fastest installed codec
+
+    Returns:
+        The codec (falls back to json if the named one isn't installed)
+    """
+    name = name or os.environ.get('REDIS_CACHE_CODEC')
+    if name:
+        codec = _CODECS_BY_NAME.get(name)
+        if codec is None:
+            logger.warning(f"Cache codec '{name}' not available, using json")
+            return CODECS[JsonCodec.codec_id]
+        return codec
+    for preferred in ('orjson', 'msgpack'):
+        if preferred in _CODECS_BY_NAME:
+            return _CODECS_BY_NAME[preferred]
+    return CODECS[JsonCodec.codec_id]
+
+
+DEFAULT_CODEC = get_codec()
+
+# zstd contexts are not thread-safe, so each thread gets its own pair
+_zstd_local = threading.local()
+
+
+def _zstd():
+    if not hasattr(_zstd_local, 'compressor'):
+        _zstd_local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return _zstd_local
+
+
+def encode_value(value: Any, codec=None, compress_min_bytes: int = COMPRESS_MIN_BYTES) -> bytes:
+    """
+    Encode a value for Redis
+
+    Plain ints are stored as decimal text so INCR keeps working on them.
+
+    Args:
+        value: Value to store
+        codec: Codec to use (default: DEFAULT_CODEC)
+        compress_min_bytes: Compress bodies at least this large (0 disables)
+
+    Returns:
+        bytes: Header and body
+
+    Raises:
+        TypeError: If the value contains a type no codec can represent
+    """
+    if type(value) is int:
+        return str(value).encode('ascii')
+
+    codec = codec or DEFAULT_CODEC
+    body = codec.dumps(value)
+    tag = codec.codec_id
+
+    if compress_min_bytes and len(body) >= compress_min_bytes:
+        if ZSTD_AVAILABLE:
+            compressed, flag = _zstd().compressor.compress(body), COMPRESS_ZSTD
+        else:
+            compressed, flag = zlib.compress(body, ZLIB_LEVEL), COMPRESS_ZLIB
+        if len(compressed) < len(body):
+            body, tag = compressed, tag | flag
+
+    return bytes((MARKER, tag)) + body
+
+
+def is_encoded(data: Any) -> bool:
+    """Check whether a raw Redis value was written by encode_value"""
+    return isinstance(data, (bytes, bytearray)) and len(data) >= 2 and data[0] == MARKER
+
+
+def decode_value(data: Any) -> Any:
+    """
+    Decode a raw Redis value
+
+    Values written before the codec layer (JSON text or plain strings) are
+    returned the way RedisCache always returned them.
+
+    Args:
+        data: Raw value from Redis (bytes or str), or None
+
+    Returns:
+        Any: Decoded value, or None for None
+
+    Raises:
+        CodecError: If the value uses a codec or compression not installed here
+    """
+    if data is None:
+        return None
+    if not is_encoded(data):
+        return _decode_legacy(data)
+
+    tag = data[1]
+    codec = CODECS.get(tag & _CODEC_MASK)
+    if codec is None:
+        raise CodecError(f"Cache codec {tag & _CODEC_MASK} not installed")
+
+    body = bytes(data[2:])
+    if tag & COMPRESS_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise CodecError("zstandard not installed")
+        body = _zstd().decompressor.decompress(body)
+    elif tag & COMPRESS_ZLIB:
+        body = zlib.decompress(body)
+    return codec.loads(body)
+
+
+def _decode_legacy(data: Any) -> Any:
+    """JSON text, or the raw string when it isn't JSON"""
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            data = bytes(data).decode('utf-8')
+        except UnicodeDecodeError:
+            return data
+    try:
+        return json.loads(data)
+    except (json.JSONDecodeError, TypeError):
+        return data
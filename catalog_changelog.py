@@ -0,0 +1,177 @@
+"""
+Catalog Changelog Module
+
+This module keeps the cluster-wide model catalog version and a change log of
+added, removed, repriced and updated models in Redis, so clients can ask the
+model endpoints for what changed since the version they already hold.
+
+Every writer of the model table (the price updater, the admin ELO editor, the
+cost band backfill in /api/get_model_prices) calls publish_catalog_changes()
+after committing, which records the changed model IDs, increments
+catalog:version and tells every worker its catalog is stale. Workers read the
+version before loading the model table, so a catalog is never labelled with a
+version newer than its contents.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Redis namespace (REDIS_CATALOG_* variables override the default connection)
+CHANGELOG_REDIS_NAMESPACE = 'catalog'
+
+VERSION_KEY = 'catalog:version'
+CHANGES_KEY = 'catalog:changes'
+
+# Number of versions kept in the change log; older clients get a full payload
+CHANGELOG_MAX_VERSIONS = int(os.environ.get('CATALOG_CHANGELOG_MAX_VERSIONS', '200'))
+
+# Retry connecting to Redis at most this often after a failure
+CLIENT_RETRY_INTERVAL = 30.0
+
+# Change kinds recorded per model
+ADDED = 'added'
+REMOVED = 'removed'
+REPRICED = 'repriced'
+UPDATED = 'updated'
+
+# Increments the version and appends "<version>:<changes json>" in one step
+_RECORD_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], version, version .. ':' .. ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[2]) + 1))
+return version
+"""
+
+_client = None
+_client_failed_at = None
+_record_script = None
+
+
+def get_changelog_client():
+    """
+    Get the Redis client used for the catalog change log
+
+    Returns:
+        Redis client, or None if Redis is unavailable
+    """
+    global _client, _client_failed_at, _record_script
+
+    if _client is not None:
+        return _client
+    if _client_failed_at is not None and time.monotonic() - _client_failed_at < CLIENT_RETRY_INTERVAL:
+        return None
+
+    from redis_config import create_redis_client
+
+    _client = create_redis_client(CHANGELOG_REDIS_NAMESPACE)
+    if _client is None:
+        _client_failed_at = time.monotonic()
+        logger.warning("Redis unavailable, model endpoints will only serve full payloads")
+    else:
+        _record_script = _client.register_script(_RECORD_SCRIPT)
+    return _client
+
+
+def record_catalog_changes(changes: Dict[str, str]) -> Optional[int]:
+    """
+    Append a set of model changes to the change log
+
+    Args:
+        changes: model_id -> ADDED, REMOVED, REPRICED or UPDATED
+
+    Returns:
+        int: The new catalog version, or None if nothing was recorded
+    """
+    if not changes:
+        return None
+    client = get_changelog_client()
+    if client is None:
+        return None
+    try:
+        version = int(_record_script(keys=[VERSION_KEY, CHANGES_KEY],
+                                     args=[json.dumps(changes, sort_keys=True), CHANGELOG_MAX_VERSIONS]))
+        logger.info(f"Recorded catalog v{version} ({len(changes)} model changes)")
+        return version
+    except Exception as e:
+        logger.error(f"Error recording catalog changes: {e}")
+        return None
+
+
+def publish_catalog_changes(changes: Dict[str, str]) -> Optional[int]:
+    """
+    Record committed model changes and publish the catalog invalidation
+
+    Args:
+        changes: model_id -> ADDED, REMOVED, REPRICED or UPDATED
+
+    Returns:
+        int: The new catalog version, or None if nothing was recorded
+    """
+    if not changes:
+        return None
+    from invalidation_bus import MODEL_CATALOG_TOPIC, publish
+
+    version = record_catalog_changes(changes)
+    publish(MODEL_CATALOG_TOPIC, version=version, changed=len(changes))
+    return version
+
+
+def current_catalog_version() -> Optional[int]:
+    """
+    Get the cluster-wide catalog version
+
+    Returns:
+        int (0 before the first recorded change), or None if Redis is unavailable
+    """
+    client = get_changelog_client()
+    if client is None:
+        return None
+    try:
+        return int(client.get(VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"Error reading catalog version: {e}")
+        return None
+
+
+def changes_since(since: int, until: int) -> Optional[Dict[str, str]]:
+    """
+    Merge the change log entries after `since` up to and including `until`
+
+    Args:
+        since: Version the client holds
+        until: Version of the catalog the delta is built from
+
+    Returns:
+        dict: model_id -> change kind, or None if the log no longer covers
+        `since` (or Redis is unavailable) and a full payload is needed
+    """
+    if since < 0 or since > until:
+        return None
+    if since == until:
+        return {}
+    client = get_changelog_client()
+    if client is None:
+        return None
+    try:
+        entries = client.zrangebyscore(CHANGES_KEY, since + 1, until, withscores=True)
+    except Exception as e:
+        logger.warning(f"Error reading catalog change log: {e}")
+        return None
+
+    # Versions are consecutive, so anything missing was trimmed from the log
+    if len(entries) != until - since:
+        return None
+
+    merged = {}
+    for member, _ in entries:
+        _, _, payload = member.partition(':')
+        for model_id, kind in json.loads(payload).items():
+            # A model added within the range is still new to the client
+            if merged.get(model_id) != ADDED or kind == REMOVED:
+                merged[model_id] = kind
+    return merged
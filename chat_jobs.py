@@ -0,0 +1,149 @@
+"""
+Chat Jobs Module
+
+Write-behind work that runs after a chat response has been streamed.
+
+Saving the assistant reply to the memory system, generating the conversation
+title and updating the rolling history summary don't affect the response the
+user sees, so /chat enqueues them on the RQ 'default' queue (see jobs.py)
+instead of running them inside the streaming worker. Jobs are persisted in
+Redis and survive a web worker restart. When the queue is unavailable the job
+runs on a bounded worker pool of the web process (see background_pool): memory
+writes on the memory system's pool, other jobs on CHAT_JOB_FALLBACK_WORKERS
+threads. Jobs that don't fit in the pool's queue are dropped.
+"""
+
+import os
+import logging
+from typing import Any, Callable
+
+from background_pool import BoundedWorkerPool
+from jobs import background_job
+
+logger = logging.getLogger(__name__)
+
+# Queue consumed by job_worker.py
+CHAT_JOB_QUEUE = 'default'
+
+# Threads running title and summary jobs in the web process while RQ is unavailable
+CHAT_JOB_FALLBACK_WORKERS = int(os.environ.get('CHAT_JOB_FALLBACK_WORKERS', '2'))
+
+# Those jobs that may wait for a thread before new ones are dropped
+CHAT_JOB_FALLBACK_QUEUE_SIZE = int(os.environ.get('CHAT_JOB_FALLBACK_QUEUE_SIZE', '100'))
+
+_fallback_pool = BoundedWorkerPool(
+    'chat_jobs',
+    workers=CHAT_JOB_FALLBACK_WORKERS,
+    max_queue=CHAT_JOB_FALLBACK_QUEUE_SIZE
+)
+
+
+@background_job(queue_name=CHAT_JOB_QUEUE, timeout=300, result_ttl=3600)
+def save_assistant_memory_job(session_id: str, user_id: str, content: str):
+    """
+    Save an assistant reply to the memory system
+
+    Args:
+        session_id: Conversation ID
+        user_id: Memory user ID
+        content: Assistant response text
+    """
+    from memory_integration import save_message_with_memory
+
+    # Call the undecorated function - we're already off the request path
+    save_message_with_memory.__wrapped__(
+        session_id=session_id, user_id=user_id, role='assistant', content=content
+    )
+    return {'session_id': session_id, 'saved': True}
+
+
+@background_job(queue_name=CHAT_JOB_QUEUE, timeout=300, result_ttl=3600)
+def save_memory_job(session_id: str, user_id: str, role: str, content: str):
+    """
+    Save a message the web worker's memory pool had no room for
+
+    Args:
+        session_id: Conversation ID
+        user_id: Memory user ID
+        role: "user" or "assistant"
+        content: Message text
+    """
+    from memory_integration import save_message_with_memory
+
+    save_message_with_memory.__wrapped__(
+        session_id=session_id, user_id=user_id, role=role, content=content
+    )
+    return {'session_id': session_id, 'saved': True}
+
+
+@background_job(queue_name=CHAT_JOB_QUEUE, timeout=300, result_ttl=3600)
+def generate_title_job(conversation_id: int):
+    """
+    Generate a conversation title after its first assistant reply
+
+    Args:
+        conversation_id: Conversation ID
+    """
+    from app import app, generate_summary
+    from models import Message
+
+    with app.app_context():
+        assistant_count = Message.query.filter_by(
+            conversation_id=conversation_id,
+            role='assistant'
+        ).count()
+
+        if assistant_count != 1:
+            return {'conversation_id': conversation_id, 'generated': False}
+
+        logger.info(f"First assistant message detected for conversation {conversation_id}. Generating title.")
+        generate_summary(conversation_id)
+        return {'conversation_id': conversation_id, 'generated': True}
+
+
+@background_job(queue_name=CHAT_JOB_QUEUE, timeout=300, result_ttl=3600)
+def update_summary_job(conversation_id: int):
+    """
+    Fold turns that aged out of the recent window into the conversation summary
+
+    Args:
+        conversation_id: Conversation ID
+    """
+    from app import app
+    from conversation_summary import update_conversation_summary
+
+    with app.app_context():
+        updated = update_conversation_summary(conversation_id)
+    return {'conversation_id': conversation_id, 'updated': updated}
+
+
+def _fallback_pool_for(job: Callable) -> BoundedWorkerPool:
+    """Pool running a job in the web process: memory writes share the memory system's"""
+    if job in (save_assistant_memory_job, save_memory_job):
+        from memory_integration import memory_pool
+        return memory_pool
+    return _fallback_pool
+
+
+def enqueue_chat_job(job: Callable, *args, **kwargs) -> Any:
+    """
+    Enqueue a chat job, falling back to a bounded worker pool if RQ is unavailable
+
+    Args:
+        job: A function decorated with @background_job
+        *args: Job arguments
+        **kwargs: Job keyword arguments
+
+    Returns:
+        The RQ job, or None if the job was handed to the local pool (or dropped) instead
+    """
+    try:
+        rq_job = job.async_run(*args, **kwargs)
+        if rq_job is not None:
+            logger.info(f"Enqueued {job.__name__} as job {rq_job.id}")
+            return rq_job
+    except Exception as e:
+        logger.warning(f"Could not enqueue {job.__name__}, running it in the web process: {e}")
+
+    _fallback_pool_for(job).submit(job, *args, **kwargs)
+    return None
@@ -14,6 +14,9 @@ from openai import OpenAI
 import tiktoken
 from dotenv import load_dotenv
 
+from embedding_cache import get_embedding_cache
+from micro_batcher import MicroBatcher
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,6 +24,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ChatMemoryManager")
 
+# Most texts sent in one embeddings request
+EMBEDDING_BATCH_MAX = int(os.environ.get("EMBEDDING_BATCH_MAX", "16"))
+
+# Milliseconds a single embedding request waits for concurrent ones to join it (0 disables)
+EMBEDDING_BATCH_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", "5"))
+
 class ChatMemoryManager:
     """
     A class to manage chatbot memory using MongoDB Atlas for storage and
@@ -88,6 +97,17 @@ class ChatMemoryManager:
                     azure_endpoint=self.azure_endpoint
                 )
                 logger.info(f"Azure OpenAI client initialized successfully for embeddings (deployment: {self.embedding_deployment})")
+                
+                # Embeddings are cached by content hash, shared with the other workers
+                self.embedding_cache = get_embedding_cache(self.embedding_deployment)
+                
+                # Concurrent cache misses from different requests share one embeddings call
+                self._embedding_batcher = MicroBatcher(
+                    self._request_embeddings,
+                    max_batch=EMBEDDING_BATCH_MAX,
+                    max_wait=EMBEDDING_BATCH_WAIT_MS / 1000,
+                    name='embeddings'
+                )
             else:
                 self.use_azure_embeddings = False
                 missing_params = []
@@ -98,9 +118,12 @@ class ChatMemoryManager:
             
             # Initialize OpenRouter client for chat completion
             if os.environ.get("OPENROUTER_API_KEY"):
+                # Share the process-wide keep-alive pool with the rest of the OpenRouter traffic
+                from openrouter_client import get_openrouter_http_client
                 self.openrouter_client = OpenAI(
                     api_key=os.environ.get("OPENROUTER_API_KEY"),
-                    base_url="https://openrouter.ai/api/v1"
+                    base_url="https://openrouter.ai/api/v1",
+                    http_client=get_openrouter_http_client()
                 )
                 logger.info("OpenRouter client initialized successfully for chat")
             else:
@@ -254,6 +277,9 @@ and has been replaced by the new indexes on the chat_messages collection.
         """
         Generate a vector embedding for text using Azure's text-embedding-3-large model.
         
+        Embeddings are cached by a hash of the model and text (see embedding_cache),
+        so text embedded before, by this or another worker, costs no API call.
+        
         Args:
             text (str): The text to generate an embedding for
             
@@ -272,39 +298,115 @@ and has been replaced by the new indexes on the chat_messages collection.
             error_msg = "Azure OpenAI is not properly configured for embedding generation."
             logger.error(error_msg)
             raise RuntimeError(error_msg)
+        
+        return self.embedding_cache.get_or_compute(text, self._embedding_batcher.submit)
+    
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts, requesting all uncached ones together.
+        
+        Args:
+            texts (List[str]): The texts to generate embeddings for
+            
+        Returns:
+            List[List[float]]: One 3072-dimension embedding per text, in order
+            
+        Raises:
+            RuntimeError: If Azure OpenAI is not configured or the API call fails
+        """
+        if not self.use_azure_embeddings:
+            error_msg = "Azure OpenAI is not properly configured for embedding generation."
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        embeddings = []
+        missing = []
+        for text in texts:
+            if not text or not text.strip():
+                embeddings.append([0.0] * 3072)
+                continue
+            embedding = self.embedding_cache.get(text)
+            if embedding is None and text not in missing:
+                missing.append(text)
+            embeddings.append(embedding)
+        
+        generated = {}
+        for start in range(0, len(missing), EMBEDDING_BATCH_MAX):
+            chunk = missing[start:start + EMBEDDING_BATCH_MAX]
+            for text, embedding in zip(chunk, self._request_embeddings(chunk)):
+                self.embedding_cache.put(text, embedding)
+                generated[text] = embedding
+        
+        return [embedding if embedding is not None else generated[text]
+                for text, embedding in zip(texts, embeddings)]
+    
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Request embeddings for a batch of texts from Azure OpenAI in one call, bypassing the cache.
+        
+        Args:
+            texts (List[str]): Non-empty texts to generate embeddings for
             
+        Returns:
+            List[List[float]]: One 3072-dimension embedding per text, in order
+            
+        Raises:
+            RuntimeError: If the API call fails
+        """
         try:
-            # Use Azure OpenAI for embeddings
-            logger.debug(f"Generating Azure embedding for text: '{text[:50]}...'")
+            # Use Azure OpenAI for embeddings; identical texts are requested once
+            unique_texts = list(dict.fromkeys(texts))
+            logger.debug(f"Generating Azure embeddings for {len(unique_texts)} texts, first: '{unique_texts[0][:50]}...'")
             
             response = self.azure_client.embeddings.create(
-                input=text,
+                input=unique_texts,
                 model=self.embedding_deployment
             )
             
             # Validate the response
-            if not response or not hasattr(response, 'data') or not response.data:
-                error_msg = "Azure OpenAI returned empty response"
+            if not response or not hasattr(response, 'data') or len(response.data) != len(unique_texts):
+                error_msg = "Azure OpenAI returned empty or incomplete response"
                 logger.error(error_msg)
                 raise RuntimeError(error_msg)
-                
-            # Extract the embedding from the response
-            embedding = response.data[0].embedding
             
-            # Validate the embedding
-            if not embedding or not isinstance(embedding, list) or len(embedding) == 0:
-                error_msg = "Azure OpenAI returned invalid embedding"
-                logger.error(error_msg)
-                raise RuntimeError(error_msg)
+            # Extract the embeddings from the response, matched to inputs by index
+            by_text = {}
+            for item in response.data:
+                embedding = item.embedding
+                
+                # Validate the embedding
+                if not embedding or not isinstance(embedding, list) or len(embedding) == 0:
+                    error_msg = "Azure OpenAI returned invalid embedding"
+                    logger.error(error_msg)
+                    raise RuntimeError(error_msg)
+                by_text[unique_texts[item.index]] = embedding
                 
-            logger.info(f"Successfully generated Azure embedding with {len(embedding)} dimensions for text: '{text[:30]}...'")
-            return embedding
+            logger.info(f"Successfully generated {len(by_text)} Azure embeddings with "
+                        f"{len(response.data[0].embedding)} dimensions in one request")
+            return [by_text[text] for text in texts]
                 
         except Exception as e:
             error_msg = f"Azure OpenAI embedding generation failed: {str(e)}"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
     
+    def embed_query(self, query_text: str) -> Optional[List[float]]:
+        """
+        Generate the embedding for a memory query once, to pass as query_embedding
+        to both retrieve_short_term_memory and retrieve_long_term_memory.
+        
+        Args:
+            query_text (str): The text to find similar messages and preferences for
+            
+        Returns:
+            Optional[List[float]]: The embedding, or None if it can't be generated
+        """
+        try:
+            return self._get_embedding(query_text)
+        except Exception as e:
+            logger.error(f"MEMORY: Failed to generate query embedding: {e}")
+            return None
+    
     def add_message(self, session_id: str, user_id: str, role: str, content: str) -> bool:
         """
         Add a message to a chat session and generate an embedding for it.
@@ -413,7 +515,8 @@ and has been replaced by the new indexes on the chat_messages collection.
         user_id: str, 
         query_text: str, 
         last_n: int = 10, 
-        vector_search_limit: int = 5
+        vector_search_limit: int = 5,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve the most recent messages and semantically similar messages from a chat session.
@@ -424,6 +527,7 @@ and has been replaced by the new indexes on the chat_messages collection.
             query_text (str): The text to find semantically similar messages for
             last_n (int): The number of most recent messages to retrieve
             vector_search_limit (int): The number of semantically similar messages to retrieve
+            query_embedding (List[float], optional): Embedding of query_text from embed_query
             
         Returns:
             List[Dict]: A list of message dictionaries
@@ -451,9 +555,10 @@ and has been replaced by the new indexes on the chat_messages collection.
             # If query text is provided, perform vector similarity search
             similar_messages = []
             if query_text:
-                # Generate embedding for the query text
-                logger.info(f"MEMORY: Generating embedding for query: '{query_text[:50]}...'")
-                query_embedding = self._get_embedding(query_text)
+                # Generate embedding for the query text unless the caller already did
+                if query_embedding is None:
+                    logger.info(f"MEMORY: Generating embedding for query: '{query_text[:50]}...'")
+                    query_embedding = self._get_embedding(query_text)
                 
                 if query_embedding:
                     logger.info(f"MEMORY: Generated query embedding with {len(query_embedding)} dimensions")
@@ -537,7 +642,8 @@ and has been replaced by the new indexes on the chat_messages collection.
         user_id: str, 
         query_text: str, 
         fact_filters: Dict = None, 
-        vector_search_limit: int = 5
+        vector_search_limit: int = 5,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict:
         """
         Retrieve user profile facts and semantically similar preferences using MongoDB Atlas Vector Search.
@@ -547,6 +653,7 @@ and has been replaced by the new indexes on the chat_messages collection.
             query_text (str): The text to find semantically similar preferences for
             fact_filters (Dict): Filters to apply to the facts object
             vector_search_limit (int): The number of semantically similar preferences to retrieve
+            query_embedding (List[float], optional): Embedding of query_text from embed_query
             
         Returns:
             Dict: A dictionary containing matching facts and similar preferences
@@ -583,9 +690,10 @@ and has been replaced by the new indexes on the chat_messages collection.
                 logger.info(f"MEMORY: No query text provided, returning only facts")
                 return result
                 
-            # Generate embedding for the query text
-            logger.info(f"MEMORY: Generating embedding for query text")
-            query_embedding = self._get_embedding(query_text)
+            # Generate embedding for the query text unless the caller already did
+            if query_embedding is None:
+                logger.info(f"MEMORY: Generating embedding for query text")
+                query_embedding = self._get_embedding(query_text)
             if not query_embedding:
                 logger.error("MEMORY: Failed to generate embedding for query text")
                 return result
@@ -799,12 +907,11 @@ and has been replaced by the new indexes on the chat_messages collection.
                 pref_count = len(info["preferences"])
                 logger.info(f"MEMORY: Processing {pref_count} preferences for embedding")
                 
+                # Generate embeddings for all preferences in one request
+                pref_embeddings = self._get_embeddings(info["preferences"])
+                
                 successful_prefs = 0
-                for pref in info["preferences"]:
-                    # Generate embedding for the preference
-                    logger.debug(f"MEMORY: Generating embedding for preference: '{pref[:30]}...'")
-                    pref_embedding = self._get_embedding(pref)
-                    
+                for pref, pref_embedding in zip(info["preferences"], pref_embeddings):
                     if pref_embedding:
                         # Log embedding details
                         embed_dims = len(pref_embedding)
@@ -0,0 +1,189 @@
+"""
+Conversation Summary Module
+
+Keeps a rolling summary of the older turns of long conversations so /chat can
+send the summary plus the recent turns instead of the whole transcript.
+
+The summary is stored on the Conversation together with the id of the newest
+message it covers. Messages outside the most recent SUMMARY_RECENT_MESSAGES
+are folded into it, and the summary is only recomputed once at least
+SUMMARY_MIN_NEW_MESSAGES more messages have aged out of that window.
+"""
+
+import os
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Most recent messages that are always sent verbatim and never summarized
+SUMMARY_RECENT_MESSAGES = int(os.environ.get('SUMMARY_RECENT_MESSAGES', '12'))
+
+# Messages that must age out of the recent window before the summary is recomputed
+SUMMARY_MIN_NEW_MESSAGES = int(os.environ.get('SUMMARY_MIN_NEW_MESSAGES', '6'))
+
+# Model used for summarization (free model, same family as title generation)
+SUMMARY_MODEL = os.environ.get('SUMMARY_MODEL', 'google/gemini-2.0-flash-exp:free')
+
+# Upper bound for the summary length
+SUMMARY_MAX_TOKENS = int(os.environ.get('SUMMARY_MAX_TOKENS', '500'))
+
+# Characters of each message included in the summarization prompt
+SUMMARY_MESSAGE_CHARS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the existing summary with the new messages. Keep facts, decisions, names, numbers, "
+    "code identifiers and open questions the assistant may need later; drop pleasantries and "
+    "repetition. Write in the third person, at most 300 words. Respond with ONLY the updated summary."
+)
+
+
+def summary_system_message(summary: str) -> dict:
+    """
+    Build the system message that carries the summary in a chat request
+
+    Args:
+        summary: Stored conversation summary
+
+    Returns:
+        dict: OpenRouter message
+    """
+    return {
+        'role': 'system',
+        'content': f"Summary of the earlier part of this conversation:\n{summary}"
+    }
+
+
+def needs_summary_update(message_count: int, summarized_count: int) -> bool:
+    """
+    Decide whether enough messages aged out of the recent window to resummarize
+
+    Args:
+        message_count: Messages in the conversation
+        summarized_count: Messages already covered by the stored summary
+
+    Returns:
+        bool: True if the summary should be recomputed
+    """
+    aged_out = message_count - SUMMARY_RECENT_MESSAGES
+    return aged_out - summarized_count >= SUMMARY_MIN_NEW_MESSAGES
+
+
+def _format_transcript(messages: List) -> str:
+    lines = []
+    for message in messages:
+        content = (message.content or '').strip()
+        if len(content) > SUMMARY_MESSAGE_CHARS:
+            content = content[:SUMMARY_MESSAGE_CHARS] + '...'
+        if not content and message.pdf_filename:
+            content = f"[attached PDF: {message.pdf_filename}]"
+        lines.append(f"{message.role.capitalize()}: {content}")
+    return '\n\n'.join(lines)
+
+
+def _request_summary(previous_summary: Optional[str], transcript: str) -> Optional[str]:
+    """Ask OpenRouter for an updated summary, trying free fallback models in turn"""
+    from openrouter_client import get_openrouter_session, OPENROUTER_BASE_URL
+    from app import FREE_MODEL_FALLBACKS
+
+    api_key = os.environ.get('OPENROUTER_API_KEY')
+    if not api_key:
+        logger.error("OPENROUTER_API_KEY not found while generating conversation summary")
+        return None
+
+    prompt = f"Existing summary:\n{previous_summary or '(none yet)'}\n\nNew messages:\n{transcript}\n\nUpdated summary:"
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'HTTP-Referer': 'https://gloriamundo.com'
+    }
+
+    for model_id in [SUMMARY_MODEL] + [m for m in FREE_MODEL_FALLBACKS if m != SUMMARY_MODEL]:
+        payload = {
+            'model': model_id,
+            'messages': [
+                {'role': 'system', 'content': SUMMARY_SYSTEM_PROMPT},
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': SUMMARY_MAX_TOKENS,
+            'temperature': 0.2
+        }
+        try:
+            response = get_openrouter_session().post(
+                f'{OPENROUTER_BASE_URL}/chat/completions',
+                headers=headers,
+                json=payload,
+                timeout=60.0
+            )
+            if response.status_code != 200:
+                logger.warning(f"Summary request with {model_id} failed: {response.status_code} - {response.text[:300]}")
+                continue
+
+            choices = response.json().get('choices') or []
+            summary = (choices[0].get('message', {}).get('content') or '').strip() if choices else ''
+            if summary:
+                return summary
+            logger.warning(f"Empty summary returned by {model_id}")
+        except Exception as e:
+            logger.warning(f"Summary request with {model_id} failed: {e}")
+
+    return None
+
+
+def update_conversation_summary(conversation_id: int) -> bool:
+    """
+    Fold messages that aged out of the recent window into the stored summary.
+    Must run inside an application context.
+
+    Args:
+        conversation_id: Conversation ID
+
+    Returns:
+        bool: True if the summary was updated
+    """
+    from database import db
+    from models import Conversation, Message
+    from history_window import count_tokens
+
+    conversation = db.session.get(Conversation, conversation_id)
+    if not conversation:
+        logger.warning(f"Conversation {conversation_id} not found when updating summary")
+        return False
+
+    base_query = Message.query.filter(Message.conversation_id == conversation_id)
+    message_count = base_query.count()
+    summarized_count = 0
+    if conversation.summary_message_id:
+        summarized_count = base_query.filter(Message.id <= conversation.summary_message_id).count()
+
+    if not needs_summary_update(message_count, summarized_count):
+        return False
+
+    # Everything older than the recent window that isn't summarized yet
+    new_messages = base_query\
+        .filter(Message.id > (conversation.summary_message_id or 0))\
+        .order_by(Message.id)\
+        .limit(message_count - SUMMARY_RECENT_MESSAGES - summarized_count)\
+        .all()
+    if not new_messages:
+        return False
+
+    summary = _request_summary(conversation.history_summary, _format_transcript(new_messages))
+    if not summary:
+        logger.error(f"Could not summarize conversation {conversation_id}, keeping previous summary")
+        return False
+
+    conversation.history_summary = summary
+    conversation.summary_message_id = new_messages[-1].id
+    conversation.summary_token_count = count_tokens(summary)
+    try:
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error saving summary for conversation {conversation_id}: {e}")
+        db.session.rollback()
+        return False
+
+    logger.info(f"Summarized {len(new_messages)} messages of conversation {conversation_id} "
+                f"(through message {conversation.summary_message_id}, {conversation.summary_token_count} tokens)")
+    return True
@@ -0,0 +1,402 @@
+"""
+Credit Ledger Module
+
+Redis-backed credit balance used on the chat path.
+
+Each user's spendable balance is mirrored in Redis as User.credits minus the
+chat usage that hasn't been reconciled into it yet. Before a paid model is
+called, the estimated cost of the turn is reserved atomically (a Lua script
+checks the balance net of all open reservations), so concurrent chats can't
+spend the same credits twice. After the reply the reservation is settled with
+the actual cost before the turn's Usage row is committed: a balance load that
+sees the committed row then finds the charged balance already mirrored, so
+the turn is never subtracted twice. If the commit fails the mirrored balance
+is dropped and reloaded from Postgres.
+
+Chat Usage rows are written with reconciled=False and no User read-modify-write.
+reconcile_usage() runs periodically and applies them to User.credits with a
+single UPDATE per user. Balance checks don't touch Postgres except to load a
+user's balance into Redis once every BALANCE_TTL seconds.
+
+When Redis is unavailable every function returns None and callers fall back
+to the database checks and immediate deduction.
+"""
+
+import os
+import time
+import uuid
+import logging
+from typing import Callable, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CREDIT_LEDGER_ENABLED = os.environ.get('CREDIT_LEDGER_ENABLED', 'true').lower() == 'true'
+
+# Redis namespace (REDIS_CREDITS_* variables override the default connection)
+LEDGER_REDIS_NAMESPACE = 'credits'
+
+LEDGER_KEY_PREFIX = 'credits:user:'
+
+# Seconds a mirrored balance is trusted before it is reloaded from Postgres
+BALANCE_TTL = int(os.environ.get('CREDIT_BALANCE_TTL', '3600'))
+
+# Seconds before an unsettled reservation is released (a worker died mid-stream)
+RESERVATION_TTL = int(os.environ.get('CREDIT_RESERVATION_TTL', '900'))
+
+# Seconds between reconcile runs, and usage rows applied per transaction
+RECONCILE_INTERVAL = int(os.environ.get('CREDIT_RECONCILE_INTERVAL', '60'))
+RECONCILE_BATCH_SIZE = 1000
+
+# Retry connecting to Redis at most this often after a failure
+CLIENT_RETRY_INTERVAL = 30.0
+
+# KEYS: balance, holds, hold expiry zset  ARGV: now
+# Drops expired holds, returns balance minus open holds (or false if not loaded)
+_AVAILABLE_SCRIPT = """
+local balance = redis.call('GET', KEYS[1])
+if not balance then return false end
+for _, rid in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])) do
+    redis.call('HDEL', KEYS[2], rid)
+    redis.call('ZREM', KEYS[3], rid)
+end
+local held = 0
+for _, amount in ipairs(redis.call('HVALS', KEYS[2])) do held = held + tonumber(amount) end
+return tonumber(balance) - held
+"""
+
+# KEYS: balance, holds, hold expiry zset  ARGV: now, reservation id, amount, expires at, key ttl
+# Returns {reserved, available}; reserved is 0 when nothing is available, -1 if not loaded
+_RESERVE_SCRIPT = """
+local balance = redis.call('GET', KEYS[1])
+if not balance then return {-1, 0} end
+for _, rid in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])) do
+    redis.call('HDEL', KEYS[2], rid)
+    redis.call('ZREM', KEYS[3], rid)
+end
+local held = 0
+for _, amount in ipairs(redis.call('HVALS', KEYS[2])) do held = held + tonumber(amount) end
+local available = tonumber(balance) - held
+if available <= 0 then return {0, available} end
+local reserved = math.min(tonumber(ARGV[3]), available)
+redis.call('HSET', KEYS[2], ARGV[2], reserved)
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('EXPIRE', KEYS[3], ARGV[5])
+return {reserved, available}
+"""
+
+# KEYS: balance, holds, hold expiry zset  ARGV: reservation id, actual cost
+_SETTLE_SCRIPT = """
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('DECRBY', KEYS[1], ARGV[2])
+end
+return false
+"""
+
+_client = None
+_client_failed_at = None
+_scripts = {}
+
+
+def get_ledger_client():
+    """
+    Get the Redis client used for the credit ledger
+
+    Returns:
+        Redis client, or None if the ledger is disabled or Redis is unavailable
+    """
+    global _client, _client_failed_at
+
+    if not CREDIT_LEDGER_ENABLED:
+        return None
+    if _client is not None:
+        return _client
+    if _client_failed_at is not None and time.monotonic() - _client_failed_at < CLIENT_RETRY_INTERVAL:
+        return None
+
+    from redis_config import create_redis_client
+
+    _client = create_redis_client(LEDGER_REDIS_NAMESPACE)
+    if _client is None:
+        _client_failed_at = time.monotonic()
+        logger.warning("Redis unavailable, credit checks will use the database")
+    else:
+        _scripts['available'] = _client.register_script(_AVAILABLE_SCRIPT)
+        _scripts['reserve'] = _client.register_script(_RESERVE_SCRIPT)
+        _scripts['settle'] = _client.register_script(_SETTLE_SCRIPT)
+    return _client
+
+
+def _keys(user_id) -> list:
+    prefix = f"{LEDGER_KEY_PREFIX}{user_id}"
+    return [f"{prefix}:balance", f"{prefix}:holds", f"{prefix}:holds_exp"]
+
+
+def _load_balance(client, user_id) -> bool:
+    """Mirror a user's balance into Redis: User.credits minus unreconciled usage"""
+    from sqlalchemy import func, select
+    from database import db
+    from models import User, Usage
+
+    # One statement, so both values come from the same snapshot: a reconcile_usage
+    # committing in between would otherwise count its usage twice or not at all
+    pending = select(func.coalesce(func.sum(Usage.credits_used), 0))\
+        .where(Usage.user_id == User.id, Usage.reconciled.is_(False))\
+        .scalar_subquery()
+    balance = db.session.query(User.credits - pending).filter(User.id == user_id).scalar()
+    if balance is None:
+        return False
+
+    # NX: a concurrent load or settlement may already have written it
+    client.set(_keys(user_id)[0], int(balance), ex=BALANCE_TTL, nx=True)
+    registry.inc('credit_ledger_loads_total', help='User balances loaded into the credit ledger from Postgres')
+    return True
+
+
+def _run(name: str, user_id, args: list):
+    """Run a ledger script, loading the user's balance first if it isn't mirrored yet"""
+    client = get_ledger_client()
+    if client is None:
+        return None
+
+    keys = _keys(user_id)
+    result = _scripts[name](keys=keys, args=args)
+    if result is False or result is None or (isinstance(result, list) and result[0] == -1):
+        if not _load_balance(client, user_id):
+            return None
+        result = _scripts[name](keys=keys, args=args)
+    return result
+
+
+def get_available_credits(user_id) -> Optional[int]:
+    """
+    Get a user's balance net of open reservations
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        int: Available credits, or None if the ledger is unavailable
+    """
+    try:
+        return _run('available', user_id, [time.time()])
+    except Exception as e:
+        logger.error(f"Credit ledger balance check failed for user {user_id}: {e}")
+        return None
+
+
+class CreditReservation:
+    """Credits held for one chat turn until it is settled or released"""
+
+    __slots__ = ('user_id', 'reservation_id', 'amount', 'available', 'done', 'charged')
+
+    def __init__(self, user_id, reservation_id: str, amount: int, available: int):
+        self.user_id = user_id
+        self.reservation_id = reservation_id
+        self.amount = amount
+        self.available = available
+        self.done = amount <= 0
+        self.charged = False
+
+    @property
+    def granted(self) -> bool:
+        """Whether any credits could be reserved"""
+        return self.amount > 0
+
+    def settle(self, actual_credits: int):
+        """
+        Replace the hold with the actual cost of the turn. Call before the
+        unreconciled Usage row is committed (see commit_charge).
+
+        Args:
+            actual_credits: Credits charged for the turn
+        """
+        if self.done:
+            return
+        self.done = True
+        try:
+            self.charged = _run_settle(self.user_id, self.reservation_id, actual_credits)
+            registry.inc('credit_reservations_total', help='Chat credit reservations by outcome', outcome='settled')
+            registry.observe('credit_reservation_overrun_credits', max(actual_credits - self.amount, 0),
+                             help='Credits charged beyond the reserved estimate')
+        except Exception as e:
+            # The hold expires on its own; the balance is reloaded within BALANCE_TTL
+            logger.error(f"Could not settle credit reservation {self.reservation_id}: {e}")
+
+    def commit_charge(self, actual_credits: int, commit: Callable[[], None]):
+        """
+        Settle the turn, then commit its unreconciled Usage row
+
+        Charging first means a balance load can never see the committed row
+        while the mirrored balance is still uncharged. If commit raises, the
+        charge is undone by dropping the mirrored balance and the exception
+        is re-raised.
+
+        Args:
+            actual_credits: Credits charged for the turn
+            commit: Commits the transaction holding the Usage row
+        """
+        self.settle(actual_credits)
+        try:
+            commit()
+        except Exception:
+            if self.charged:
+                # Postgres has no usage for this turn; reload the balance from there
+                invalidate_balance(self.user_id)
+                self.charged = False
+            raise
+
+    def release(self):
+        """Drop the hold without charging (the turn failed before it was billed)"""
+        if self.done:
+            return
+        self.done = True
+        try:
+            _run_settle(self.user_id, self.reservation_id, 0)
+            registry.inc('credit_reservations_total', help='Chat credit reservations by outcome', outcome='released')
+        except Exception as e:
+            logger.error(f"Could not release credit reservation {self.reservation_id}: {e}")
+
+
+def _run_settle(user_id, reservation_id: str, actual_credits: int) -> bool:
+    """Drop a hold and charge the mirrored balance; returns whether a balance was charged"""
+    client = get_ledger_client()
+    if client is None:
+        return False
+    # A settlement never loads the balance - an unloaded balance is read from Postgres later
+    result = _scripts['settle'](keys=_keys(user_id), args=[reservation_id, int(actual_credits)])
+    return result is not None and result is not False
+
+
+def reserve_credits(user_id, estimated_credits: int) -> Optional[CreditReservation]:
+    """
+    Atomically hold credits for a chat turn before calling a paid model
+
+    The hold is capped at the available balance, so a user with some credits
+    left can still start a turn whose estimate exceeds them.
+
+    Args:
+        user_id: User ID
+        estimated_credits: Estimated cost of the turn
+
+    Returns:
+        CreditReservation (check .granted), or None if the ledger is unavailable
+    """
+    reservation_id = uuid.uuid4().hex
+    now = time.time()
+    try:
+        result = _run('reserve', user_id, [
+            now, reservation_id, max(int(estimated_credits), 1), now + RESERVATION_TTL, RESERVATION_TTL
+        ])
+    except Exception as e:
+        logger.error(f"Credit reservation failed for user {user_id}: {e}")
+        return None
+    if result is None:
+        return None
+
+    reservation = CreditReservation(user_id, reservation_id, int(result[0]), int(result[1]))
+    registry.inc('credit_reservations_total', help='Chat credit reservations by outcome',
+                 outcome='reserved' if reservation.granted else 'insufficient')
+    return reservation
+
+
+def estimate_turn_credits(model_id: str, prompt_tokens: int, completion_tokens: int) -> int:
+    """
+    Estimate the cost of a chat turn for its reservation
+
+    Args:
+        model_id: OpenRouter model ID
+        prompt_tokens: Estimated prompt tokens
+        completion_tokens: Completion token limit for the turn
+
+    Returns:
+        int: Estimated credits
+    """
+    from billing import calculate_openrouter_credits
+    return calculate_openrouter_credits(prompt_tokens, completion_tokens, model_id)
+
+
+def invalidate_balance(user_id):
+    """
+    Drop a user's mirrored balance so it is reloaded from Postgres, e.g. after
+    credits were purchased
+
+    Args:
+        user_id: User ID
+    """
+    client = get_ledger_client()
+    if client is None:
+        return
+    try:
+        client.delete(_keys(user_id)[0])
+    except Exception as e:
+        logger.error(f"Could not invalidate credit balance for user {user_id}: {e}")
+
+
+def reconcile_usage(batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """
+    Apply unreconciled chat usage to User.credits. Must run inside an
+    application context. Safe to run from several workers at once.
+
+    The mirrored balances stay correct: they already exclude this usage, and
+    after reconciling it is excluded from User.credits instead.
+
+    Args:
+        batch_size: Usage rows applied per transaction
+
+    Returns:
+        int: Number of usage rows reconciled
+    """
+    from collections import defaultdict
+    from database import db
+    from models import User, Usage
+
+    reconciled = 0
+    while True:
+        try:
+            rows = db.session.query(Usage.id, Usage.user_id, Usage.credits_used)\
+                .filter(Usage.reconciled.is_(False))\
+                .order_by(Usage.id)\
+                .limit(batch_size)\
+                .with_for_update(skip_locked=True)\
+                .all()
+            if not rows:
+                db.session.rollback()
+                break
+
+            totals = defaultdict(int)
+            for _, user_id, credits_used in rows:
+                totals[user_id] += credits_used or 0
+
+            for user_id, total in totals.items():
+                # Single UPDATE - no read-modify-write race with purchases
+                User.query.filter(User.id == user_id).update(
+                    {User.credits: User.credits - total}, synchronize_session=False)
+            Usage.query.filter(Usage.id.in_([row[0] for row in rows])).update(
+                {Usage.reconciled: True}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error reconciling credit usage: {e}")
+            db.session.rollback()
+            break
+
+        reconciled += len(rows)
+        registry.inc('credit_usage_reconciled_total', len(rows), help='Usage rows applied to User.credits')
+        if len(rows) < batch_size:
+            break
+
+    if reconciled:
+        logger.info(f"Reconciled {reconciled} usage rows into user balances")
+    return reconciled
+
+
+def reconcile_usage_job():
+    """Scheduler entry point for reconcile_usage()"""
+    from ensure_app_context import ensure_app_context
+
+    with ensure_app_context():
+        return reconcile_usage()
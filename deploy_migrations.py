@@ -39,6 +39,10 @@ def run_deployment_migrations():
             'openrouter_model': False,
             'user_chat_settings': False,
             'affiliate': False,
+            'message_token_count': False,
+            'conversation_summary': False,
+            'message_truncated': False,
+            'usage_reconciled': False,
             'conversation_index': False,
             'message_index': False
         }
@@ -121,6 +125,62 @@ def run_deployment_migrations():
                 logger.error(f"✗ Affiliate migration error: {e}")
                 migration_results['affiliate'] = False
                 
+            # Add per-message token counts used for history budgeting
+            try:
+                from migrations_message_token_count import run_migration as run_token_count_migration
+                logger.info("Running Message token_count migration...")
+                success = run_token_count_migration()
+                migration_results['message_token_count'] = success
+                if success:
+                    logger.info("✓ Message token_count migration completed")
+                else:
+                    logger.error("✗ Message token_count migration failed")
+            except Exception as e:
+                logger.error(f"✗ Message token_count migration error: {e}")
+                migration_results['message_token_count'] = False
+                
+            # Add rolling history summary columns
+            try:
+                from migrations_conversation_summary import run_migration as run_summary_migration
+                logger.info("Running Conversation summary migration...")
+                success = run_summary_migration()
+                migration_results['conversation_summary'] = success
+                if success:
+                    logger.info("✓ Conversation summary migration completed")
+                else:
+                    logger.error("✗ Conversation summary migration failed")
+            except Exception as e:
+                logger.error(f"✗ Conversation summary migration error: {e}")
+                migration_results['conversation_summary'] = False
+                
+            # Add the truncated-reply flag set on client disconnects
+            try:
+                from migrations_message_truncated import run_migration as run_truncated_migration
+                logger.info("Running Message is_truncated migration...")
+                success = run_truncated_migration()
+                migration_results['message_truncated'] = success
+                if success:
+                    logger.info("✓ Message is_truncated migration completed")
+                else:
+                    logger.error("✗ Message is_truncated migration failed")
+            except Exception as e:
+                logger.error(f"✗ Message is_truncated migration error: {e}")
+                migration_results['message_truncated'] = False
+                
+            # Add the reconciled flag for usage charged through the credit ledger
+            try:
+                from migrations_usage_reconciled import run_migration as run_usage_reconciled_migration
+                logger.info("Running Usage reconciled migration...")
+                success = run_usage_reconciled_migration()
+                migration_results['usage_reconciled'] = success
+                if success:
+                    logger.info("✓ Usage reconciled migration completed")
+                else:
+                    logger.error("✗ Usage reconciled migration failed")
+            except Exception as e:
+                logger.error(f"✗ Usage reconciled migration error: {e}")
+                migration_results['usage_reconciled'] = False
+                
             # Mark index migrations as successful (these are typically handled by ORM)
             migration_results['conversation_index'] = True
             migration_results['message_index'] = True
@@ -43,6 +43,7 @@ def reset_test_accounts():
                 test_accounts = ['andy@sentigral.com', 'andysurytees924@gmail.com']
                 
                 # Reset balances for test accounts
+                reset_user_ids = []
                 for email in test_accounts:
                     # Find user by email
                     select_stmt = select(users_table).where(users_table.c.email == email)
@@ -55,6 +56,7 @@ def reset_test_accounts():
                         # Update user balance
                         update_stmt = update(users_table).where(users_table.c.id == user_id).values(credits=1000)
                         connection.execute(update_stmt)
+                        reset_user_ids.append(user_id)
                         
                         logger.info(f"Reset {email} balance from {old_balance} to 1000 credits")
                 
@@ -68,6 +70,11 @@ def reset_test_accounts():
                 
                 result = connection.execute(delete_stmt)
                 logger.info(f"Deleted {result.rowcount} test transactions")
+        
+        # Drop the mirrored balances so chat credit checks reload the reset values
+        from credit_ledger import invalidate_balance
+        for user_id in reset_user_ids:
+            invalidate_balance(user_id)
                 
         logger.info("Successfully reset test accounts and transactions")
         return True
@@ -0,0 +1,187 @@
+"""
+Embedding Cache Module
+
+Content-addressed cache for text embeddings used by the memory system.
+
+An embedding depends only on the model and the exact text, so entries are
+keyed by a SHA-256 of both and never need invalidating. Lookups go to an
+in-process LRU first (NearCache), then Redis, shared by every worker. Vectors
+are stored as packed float32: the OpenAI client decodes embeddings from
+float32, so this is lossless and a 3072-dimension vector takes 12 KB instead
+of the ~60 KB of its JSON text.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from metrics import registry
+from redis_cache import NearCache, _MISSING
+
+logger = logging.getLogger(__name__)
+
+# Seconds an embedding is kept in Redis
+EMBEDDING_CACHE_TTL = int(os.environ.get('EMBEDDING_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Seconds an embedding is kept in process memory
+EMBEDDING_LOCAL_TTL = float(os.environ.get('EMBEDDING_LOCAL_CACHE_TTL', '3600'))
+
+# In-process entries per model (12 KB each at 3072 dimensions)
+EMBEDDING_LOCAL_MAX_ENTRIES = int(os.environ.get('EMBEDDING_LOCAL_CACHE_MAX_ENTRIES', '512'))
+
+# Redis key prefix
+EMBEDDING_KEY_PREFIX = 'embedding'
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache for one embedding model
+
+    get() returns a fresh list each time, so callers may modify it.
+    """
+
+    def __init__(self, model: str, ttl: int = EMBEDDING_CACHE_TTL,
+                 local_ttl: float = EMBEDDING_LOCAL_TTL,
+                 local_max_entries: int = EMBEDDING_LOCAL_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Args:
+            model: Embedding model or deployment name (part of every key)
+            ttl: Seconds an entry is kept in Redis
+            local_ttl: Seconds an entry is kept in process memory
+            local_max_entries: In-process size bound (LRU eviction)
+        """
+        self.model = model
+        self.ttl = ttl
+        self.local = NearCache(f"embeddings:{model}", ttl=local_ttl, max_entries=local_max_entries)
+        self.redis_client = None
+        self._redis_checked = False
+
+    def _get_redis(self):
+        """Redis client for the shared tier, or None while Redis is unavailable"""
+        if not self._redis_checked:
+            self._redis_checked = True
+            try:
+                from redis_config import create_redis_client
+                self.redis_client = create_redis_client('cache', decode_responses=False)
+            except Exception as e:
+                logger.warning(f"Embedding cache running without Redis: {e}")
+        return self.redis_client
+
+    def key(self, text: str) -> str:
+        """Redis key for a text's embedding under this model"""
+        digest = hashlib.sha256(f"{self.model}\0{text}".encode('utf-8')).hexdigest()
+        return f"{EMBEDDING_KEY_PREFIX}:{self.model}:{digest}"
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up an embedding
+
+        Args:
+            text: Exact text that was embedded
+
+        Returns:
+            List[float]: The embedding, or None on a miss
+        """
+        key = self.key(text)
+        vector = self.local.get(key)
+        if vector is not _MISSING:
+            return vector.tolist()
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                data = client.get(key)
+            except Exception as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+                data = None
+            if data:
+                vector = array('f')
+                vector.frombytes(data)
+                self.local.l2_hits += 1
+                self.local.put(key, vector)
+                return vector.tolist()
+
+        self.local.misses += 1
+        return None
+
+    def put(self, text: str, embedding: List[float]):
+        """
+        Store an embedding in both tiers
+
+        Args:
+            text: Exact text that was embedded
+            embedding: Its embedding vector
+        """
+        key = self.key(text)
+        vector = array('f', embedding)
+        self.local.put(key, vector)
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.set(key, vector.tobytes(), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """
+        Get an embedding, computing and caching it on a miss
+
+        Args:
+            text: Text to embed
+            compute: Called with text on a miss; its exceptions propagate
+
+        Returns:
+            List[float]: The embedding
+        """
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, embedding)
+        return embedding
+
+
+# Caches in this process by model
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    """
+    Get the process-wide cache for an embedding model
+
+    Args:
+        model: Embedding model or deployment name
+
+    Returns:
+        EmbeddingCache: Shared instance for the model
+    """
+    with _caches_lock:
+        cache = _caches.get(model)
+        if cache is None:
+            cache = _caches[model] = EmbeddingCache(model)
+        return cache
+
+
+def _embedding_cache_collector():
+    """Export embedding lookups by tier and the share served without an API call"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        local = cache.local
+        for tier, value in (('l1', local.hits), ('l2', local.l2_hits), ('miss', local.misses)):
+            yield ('embedding_cache_lookups_total', 'counter', 'Embedding lookups by the tier that answered',
+                   {'model': cache.model, 'tier': tier}, value)
+        lookups = local.hits + local.l2_hits + local.misses
+        yield ('embedding_cache_hit_ratio', 'gauge', 'Share of embedding lookups served without an API call',
+               {'model': cache.model}, (local.hits + local.l2_hits) / lookups if lookups else 0.0)
+        yield ('embedding_cache_l1_entries', 'gauge', 'Embeddings held in process memory',
+               {'model': cache.model}, len(local))
+
+
+registry.register_collector(_embedding_cache_collector)
@@ -17,6 +17,7 @@ def clear_all_model_caches():
                 cache_patterns = [
                     'cache:models:*',
                     'cache:pricing_table_data',
+                    'cache:pricing_data',
                     'model_cache*',
                     'openrouter_models*',
                     'models_cache*'
@@ -43,4 +43,11 @@ limit_request_fields = 100
 def timeout_worker(worker):
     """Timeout hook to handle worker timeouts more gracefully"""
     worker.log.critical("WORKER TIMEOUT (pid: %s)", worker.pid)
-    worker.alive = False
\ No newline at end of file
+    worker.alive = False
+
+
+def worker_exit(server, worker):
+    """Let queued background work (memory writes) finish before the worker exits"""
+    import sys
+    if 'background_pool' in sys.modules:
+        sys.modules['background_pool'].shutdown_all(timeout=graceful_timeout / 2)
@@ -0,0 +1,241 @@
+"""
+History Window Module
+
+Selects the conversation history sent with a chat request so the prompt fits
+the target model's context window.
+
+Every Message stores a tiktoken count of its content (computed once at insert
+time). History is filled newest-first against a token budget derived from the
+model's context length; only the ids and counts are scanned, and the full rows
+are fetched just for the messages that fit. Memory and document context
+arrive after the history is loaded, so trim_history() drops the oldest turns
+again if the injected context pushed the prompt past the model's window.
+"""
+
+import os
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Encoding used for counting - close enough for budgeting across providers
+TOKEN_ENCODING = os.environ.get('HISTORY_TOKEN_ENCODING', 'cl100k_base')
+
+# Per-message overhead for role and separators in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Rough cost of an image part in history (low-detail image)
+IMAGE_TOKENS = 85
+
+# Context length used when the model isn't in the catalog
+DEFAULT_CONTEXT_LENGTH = int(os.environ.get('HISTORY_DEFAULT_CONTEXT_LENGTH', '8192'))
+
+# Tokens kept free for the completion when the user hasn't set max_tokens
+DEFAULT_COMPLETION_RESERVE = int(os.environ.get('HISTORY_COMPLETION_RESERVE', '4096'))
+
+# Most recent messages considered at all (only ids and counts are scanned)
+HISTORY_SCAN_LIMIT = int(os.environ.get('HISTORY_SCAN_LIMIT', '500'))
+
+# Optional hard cap on history tokens regardless of context length (0 = no cap)
+HISTORY_MAX_TOKENS = int(os.environ.get('HISTORY_MAX_TOKENS', '0'))
+
+# Share of the context window kept as headroom for tokenizer differences
+SAFETY_MARGIN = 0.05
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once per process, or None if unavailable"""
+    global _encoding, _encoding_failed
+
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                # e.g. tiktoken missing or the encoding file can't be downloaded
+                logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+                _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """
+    Count the tokens in a piece of text
+
+    Args:
+        text: Text to count
+
+    Returns:
+        int: Token count (estimated at ~4 characters per token without tiktoken)
+    """
+    if not text:
+        return 0
+
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_prompt_tokens(messages: List[dict]) -> int:
+    """
+    Estimate the prompt tokens of an OpenRouter messages list
+
+    Args:
+        messages: Chat messages with string or multimodal list content
+
+    Returns:
+        int: Estimated prompt tokens
+    """
+    total = 0
+    for message in messages:
+        content = message.get('content')
+        total += MESSAGE_OVERHEAD_TOKENS
+        if isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    total += count_tokens(part.get('text'))
+                elif part.get('type') == 'image_url':
+                    total += IMAGE_TOKENS
+        else:
+            total += count_tokens(content)
+    return total
+
+
+def message_token_count_default(context) -> int:
+    """
+    SQLAlchemy column default for Message.token_count
+
+    Args:
+        context: SQLAlchemy execution context for the insert
+
+    Returns:
+        int: Token count of the inserted message content
+    """
+    return count_tokens(context.get_current_parameters().get('content'))
+
+
+def prompt_token_budget(context_length: Optional[int], completion_tokens: Optional[int] = None) -> int:
+    """
+    Work out how many prompt tokens fit in the model's context window
+
+    Args:
+        context_length: Model context length (None if unknown)
+        completion_tokens: Tokens to keep free for the reply (user's max_tokens)
+
+    Returns:
+        int: Prompt budget in tokens (never negative)
+    """
+    context_length = context_length or DEFAULT_CONTEXT_LENGTH
+    reserve = completion_tokens or min(DEFAULT_COMPLETION_RESERVE, context_length // 4)
+    return max(int(context_length * (1 - SAFETY_MARGIN)) - reserve, 0)
+
+
+def history_token_budget(context_length: Optional[int], completion_tokens: Optional[int] = None,
+                         prompt_tokens: int = 0) -> int:
+    """
+    Work out how many tokens of history fit in the model's context window
+
+    Args:
+        context_length: Model context length (None if unknown)
+        completion_tokens: Tokens to keep free for the reply (user's max_tokens)
+        prompt_tokens: Tokens already used by the system prompt and current message
+
+    Returns:
+        int: History budget in tokens (never negative)
+    """
+    budget = prompt_token_budget(context_length, completion_tokens) - prompt_tokens
+    if HISTORY_MAX_TOKENS > 0:
+        budget = min(budget, HISTORY_MAX_TOKENS)
+    return max(budget, 0)
+
+
+def load_history_window(conversation_id: int, budget: int, exclude_message_id: Optional[int] = None,
+                        include_images: bool = False,
+                        after_message_id: Optional[int] = None) -> Tuple[List, int, bool]:
+    """
+    Load the most recent messages of a conversation that fit in a token budget
+
+    Args:
+        conversation_id: Conversation ID
+        budget: History budget in tokens
+        exclude_message_id: Message to leave out (the current user message)
+        include_images: Count image parts (the model will receive them)
+        after_message_id: Only consider newer messages (older ones are covered by a summary)
+
+    Returns:
+        Tuple of (messages oldest-first, tokens used, whether older messages were left out)
+    """
+    from sqlalchemy import func
+    from database import db
+    from models import Message
+
+    query = db.session.query(
+        Message.id, Message.token_count, func.length(Message.content), Message.image_url
+    ).filter(Message.conversation_id == conversation_id)
+    if exclude_message_id is not None:
+        query = query.filter(Message.id != exclude_message_id)
+    if after_message_id is not None:
+        query = query.filter(Message.id > after_message_id)
+
+    rows = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(HISTORY_SCAN_LIMIT).all()
+
+    selected_ids = []
+    used = 0
+    truncated = len(rows) >= HISTORY_SCAN_LIMIT
+    for message_id, token_count, content_length, image_url in rows:
+        if token_count is None:
+            # Rows written before token counts were stored
+            token_count = ((content_length or 0) + 3) // 4
+        cost = token_count + MESSAGE_OVERHEAD_TOKENS
+        if include_images and image_url:
+            cost += IMAGE_TOKENS
+
+        if used + cost > budget:
+            # Keep the window contiguous - stop at the first message that doesn't fit
+            truncated = True
+            break
+        selected_ids.append(message_id)
+        used += cost
+
+    if not selected_ids:
+        return [], 0, truncated
+
+    messages = Message.query.filter(Message.id.in_(selected_ids)).order_by(
+        Message.created_at, Message.id).all()
+    return messages, used, truncated
+
+
+def trim_history(messages: List[dict], budget: int) -> int:
+    """
+    Drop the oldest history turns until the whole prompt fits a token budget
+
+    System messages (instructions, summary, memory and document context) and
+    the last message (the current user turn) are kept.
+
+    Args:
+        messages: Chat messages, modified in place
+        budget: Prompt budget in tokens
+
+    Returns:
+        int: Number of messages dropped
+    """
+    total = count_prompt_tokens(messages)
+    dropped = 0
+    index = 0
+    while total > budget and index < len(messages) - 1:
+        if messages[index].get('role') == 'system':
+            index += 1
+            continue
+        total -= count_prompt_tokens([messages.pop(index)])
+        dropped += 1
+    return dropped
@@ -0,0 +1,198 @@
+"""
+Invalidation Bus Module
+
+Cluster-wide cache invalidation over Redis pub/sub.
+
+A writer publishes a versioned event after it commits (for example the price
+updater after storing models). Every worker process runs one listener thread
+that receives the event and calls the handlers registered for its topic, which
+drop or rebuild only the caches that depend on that data. This replaces each
+worker polling the database or OpenRouter on a timer.
+
+Events carry the publish time, so the listener records how long the event took
+to reach each worker (cache_invalidation_delay_seconds).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Redis namespace (REDIS_BUS_* variables override the default connection)
+BUS_REDIS_NAMESPACE = 'bus'
+
+BUS_CHANNEL = 'cache:invalidate'
+
+# Seconds the listener blocks waiting for a message before checking its state
+LISTEN_POLL_TIMEOUT = 1.0
+
+# Seconds between reconnect attempts after the subscription fails
+RECONNECT_INTERVAL = float(os.environ.get('INVALIDATION_BUS_RECONNECT_INTERVAL', '5'))
+
+# Topic published when the model table changed
+MODEL_CATALOG_TOPIC = 'model_catalog'
+
+# Retry creating the publishing client at most this often after a failure
+PUBLISH_RETRY_INTERVAL = 30.0
+
+_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+_handlers_lock = threading.Lock()
+
+# Listener state. gunicorn preloads the app before forking, so the owning PID
+# is tracked and each worker starts its own listener.
+_listener_pid = None
+_listener_connected = False
+_listener_lock = threading.Lock()
+
+# Publishing client, rebuilt in each worker for the same reason
+_publisher = None
+_publisher_pid = None
+_publisher_failed_at = None
+
+
+def subscribe(topic: str, handler: Callable[[Dict[str, Any]], None]):
+    """
+    Register a handler for a topic in this process
+
+    Args:
+        topic: Event topic
+        handler: Called with the event dict (topic, version, published_at, ...)
+    """
+    with _handlers_lock:
+        handlers = _handlers.setdefault(topic, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def _get_publish_client():
+    """Get this process's Redis client for publishing, or None if Redis is unavailable"""
+    global _publisher, _publisher_pid, _publisher_failed_at
+
+    pid = os.getpid()
+    if _publisher is not None and _publisher_pid == pid:
+        return _publisher
+    if _publisher_failed_at is not None and time.monotonic() - _publisher_failed_at < PUBLISH_RETRY_INTERVAL:
+        return None
+
+    from redis_config import create_redis_client
+
+    _publisher = create_redis_client(BUS_REDIS_NAMESPACE)
+    _publisher_pid = pid
+    _publisher_failed_at = time.monotonic() if _publisher is None else None
+    return _publisher
+
+
+def publish(topic: str, version: Optional[int] = None, **data) -> bool:
+    """
+    Publish an invalidation event. Call only after the change is committed.
+
+    Args:
+        topic: Event topic
+        version: Version of the data after the change, if the writer has one
+        **data: Extra JSON-serializable fields for the handlers
+
+    Returns:
+        bool: True if the event was handed to Redis
+    """
+    event = dict(data, topic=topic, version=version, published_at=time.time(), origin=os.getpid())
+    try:
+        client = _get_publish_client()
+        if client is None:
+            logger.warning(f"Redis unavailable, {topic} invalidation not published")
+            return False
+        receivers = client.publish(BUS_CHANNEL, json.dumps(event))
+        registry.inc('cache_invalidation_published_total', help='Invalidation events published', topic=topic)
+        logger.debug(f"Published {topic} invalidation v{version} to {receivers} subscribers")
+        return True
+    except Exception as e:
+        logger.error(f"Error publishing {topic} invalidation: {e}")
+        return False
+
+
+def dispatch(message_data: str):
+    """
+    Run the handlers for one received message
+
+    Args:
+        message_data: JSON event as published
+    """
+    try:
+        event = json.loads(message_data)
+        topic = event['topic']
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring malformed invalidation message: {e}")
+        return
+
+    delay = max(0.0, time.time() - float(event.get('published_at') or time.time()))
+    registry.observe('cache_invalidation_delay_seconds', delay,
+                     help='Time from publish to a worker receiving an invalidation event', topic=topic)
+
+    with _handlers_lock:
+        handlers = list(_handlers.get(topic, ()))
+    for handler in handlers:
+        try:
+            handler(event)
+        except Exception as e:
+            logger.error(f"Invalidation handler {getattr(handler, '__name__', handler)} failed for {topic}: {e}")
+    registry.inc('cache_invalidation_received_total', help='Invalidation events handled', topic=topic)
+    logger.debug(f"Handled {topic} invalidation v{event.get('version')} after {delay * 1000:.1f} ms")
+
+
+def _listen_loop(pid: int):
+    """Subscribe and dispatch messages until the process exits, reconnecting on errors"""
+    global _listener_connected
+
+    from redis_config import create_redis_client
+
+    while _listener_pid == pid:
+        pubsub = None
+        try:
+            client = create_redis_client(BUS_REDIS_NAMESPACE)
+            if client is None:
+                time.sleep(RECONNECT_INTERVAL)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(BUS_CHANNEL)
+            _listener_connected = True
+            logger.info(f"Invalidation bus listener subscribed (pid {pid})")
+
+            while _listener_pid == pid:
+                message = pubsub.get_message(timeout=LISTEN_POLL_TIMEOUT)
+                if message and message.get('type') == 'message':
+                    dispatch(message['data'])
+        except Exception as e:
+            logger.warning(f"Invalidation bus listener error, reconnecting in {RECONNECT_INTERVAL}s: {e}")
+            time.sleep(RECONNECT_INTERVAL)
+        finally:
+            _listener_connected = False
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def ensure_listener():
+    """Start this process's listener thread if it is not running yet (cheap to call often)"""
+    global _listener_pid
+
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        threading.Thread(target=_listen_loop, args=(pid,), name='invalidation-bus', daemon=True).start()
+
+
+def is_listening() -> bool:
+    """Check whether this process currently receives invalidation events"""
+    return _listener_connected and _listener_pid == os.getpid()
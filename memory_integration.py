@@ -3,18 +3,35 @@ Integration module for connecting the ChatMemoryManager with the Flask chat appl
 This module provides functions to enhance the chatbot with long-term memory capabilities.
 """
 
+import os
+import atexit
 import logging
-import asyncio
 import time
 from typing import List, Dict, Any, Optional
 from functools import wraps
 
+from background_pool import BoundedWorkerPool
 from chat_memory_manager import ChatMemoryManager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("MemoryIntegration")
 
+# Threads writing messages and profile updates to the memory system
+MEMORY_WORKERS = int(os.environ.get("MEMORY_WORKERS", "2"))
+
+# Memory writes that may wait for a worker before new ones overflow
+MEMORY_QUEUE_SIZE = int(os.environ.get("MEMORY_QUEUE_SIZE", "200"))
+
+# Seconds a request waits for room in a full queue before its write overflows
+MEMORY_QUEUE_PUT_TIMEOUT = float(os.environ.get("MEMORY_QUEUE_PUT_TIMEOUT", "0.05"))
+
+# What happens to writes that overflow: 'spill' to the RQ job queue, or 'drop'
+MEMORY_QUEUE_OVERFLOW = os.environ.get("MEMORY_QUEUE_OVERFLOW", "spill")
+
+# Seconds a stopping worker process waits for queued writes to finish
+MEMORY_SHUTDOWN_TIMEOUT = float(os.environ.get("MEMORY_SHUTDOWN_TIMEOUT", "10"))
+
 # Create a global instance of ChatMemoryManager
 # Note: This will be initialized when first accessed
 _memory_manager = None
@@ -38,13 +55,40 @@ def get_memory_manager():
     
     return _memory_manager
 
+def _spill_to_job_queue(func, args, kwargs) -> bool:
+    """Hand a memory write that doesn't fit in the pool to the RQ job queue"""
+    if MEMORY_QUEUE_OVERFLOW != 'spill' or func is not save_message_with_memory.__wrapped__:
+        return False
+    from chat_jobs import save_memory_job
+    return save_memory_job.async_run(*args, **kwargs) is not None
+
+# Bounded pool running memory writes off the request path (started on first use in each worker)
+memory_pool = BoundedWorkerPool(
+    'memory',
+    workers=MEMORY_WORKERS,
+    max_queue=MEMORY_QUEUE_SIZE,
+    put_timeout=MEMORY_QUEUE_PUT_TIMEOUT,
+    spill=_spill_to_job_queue
+)
+
+def shutdown_memory_workers(timeout: float = MEMORY_SHUTDOWN_TIMEOUT):
+    """
+    Stop accepting memory writes and finish the queued ones.
+    Writes still queued after timeout seconds are spilled or dropped.
+    
+    Args:
+        timeout (float): Seconds to wait for the queue to drain
+    """
+    memory_pool.shutdown(timeout)
+
+atexit.register(shutdown_memory_workers)
+
 def async_task(f):
-    """Decorator to run a function asynchronously in the background"""
+    """Decorator to run a function in the background memory worker pool"""
     @wraps(f)
     def wrapper(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_in_executor(None, lambda: f(*args, **kwargs))
+        # False when the pool was full and the write was dropped
+        return memory_pool.submit(f, *args, **kwargs)
     return wrapper
 
 @async_task
@@ -151,14 +195,25 @@ def enrich_prompt_with_memory(
             except Exception as rewrite_error:
                 logger.error(f"MEMORY_INTEGRATION: Error rewriting query: {rewrite_error}")
         
+        # Embed the query once for both retrievals
+        query_embedding = memory_manager.embed_query(search_query)
+        if query_embedding is None:
+            # Retrying in each retrieval would fail the same way; use recent messages and facts only
+            logger.warning(f"MEMORY_INTEGRATION: Query embedding unavailable, skipping semantic search")
+            search_query = ""
+        
         # Retrieve relevant memory
         logger.info(f"MEMORY_INTEGRATION: Retrieving short-term memory")
-        short_term = memory_manager.retrieve_short_term_memory(session_id, user_id, search_query)
+        short_term = memory_manager.retrieve_short_term_memory(
+            session_id, user_id, search_query, query_embedding=query_embedding
+        )
         short_term_count = len(short_term) if short_term else 0
         logger.info(f"MEMORY_INTEGRATION: Found {short_term_count} relevant short-term memories")
         
         logger.info(f"MEMORY_INTEGRATION: Retrieving long-term memory")
-        long_term = memory_manager.retrieve_long_term_memory(user_id, search_query)
+        long_term = memory_manager.retrieve_long_term_memory(
+            user_id, search_query, query_embedding=query_embedding
+        )
         
         # Check what we got from long-term memory
         facts_count = len(long_term.get('matching_facts', {}))
@@ -0,0 +1,361 @@
+"""
+Metrics Module
+
+Lightweight in-process metrics with a Prometheus text exposition endpoint.
+
+This module provides:
+1. Counters, gauges and sliding-window summaries (p50/p95/p99) with labels
+2. StageTrace, a per-request stage timer for multi-step pipelines like /chat
+3. A /metrics blueprint serving everything in Prometheus text format, to
+   holders of METRICS_TOKEN or, when it is unset, to local scrapers only
+
+Metrics are kept per worker process. Every series carries a `worker` label
+(the PID) so scrapes from different gunicorn workers don't collide.
+"""
+
+import os
+import hmac
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Blueprint, Flask, Response, g, request
+
+logger = logging.getLogger(__name__)
+
+# Quantiles reported for every summary
+SUMMARY_QUANTILES = (0.5, 0.95, 0.99)
+
+# Number of most recent observations kept per summary series
+SUMMARY_WINDOW = int(os.environ.get('METRICS_SUMMARY_WINDOW', '1024'))
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key)
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class _Summary:
+    """Sliding-window summary: exact quantiles over the last SUMMARY_WINDOW samples"""
+
+    __slots__ = ('samples', 'count', 'total')
+
+    def __init__(self):
+        self.samples = deque(maxlen=SUMMARY_WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self) -> Dict[float, float]:
+        if not self.samples:
+            return {q: 0.0 for q in SUMMARY_QUANTILES}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in SUMMARY_QUANTILES}
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, _Summary]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+
+    def inc(self, name: str, value: float = 1.0, help: str = '', **labels):
+        """
+        Increment a counter
+
+        Args:
+            name: Metric name
+            value: Amount to add
+            help: Help text (recorded on first use)
+            **labels: Label values
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+            if help:
+                self._help.setdefault(name, help)
+
+    def set_gauge(self, name: str, value: float, help: str = '', **labels):
+        """Set a gauge to an absolute value"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+            if help:
+                self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = '', **labels):
+        """Record an observation in a summary"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = _Summary()
+            summary.observe(value)
+            if help:
+                self._help.setdefault(name, help)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]):
+        """
+        Register a callable evaluated at scrape time.
+
+        The collector returns (name, type, help, labels, value) tuples, where
+        type is 'counter' or 'gauge'. Use it to export stats owned by other modules.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get_summary(self, name: str, **labels) -> Optional[Dict[str, float]]:
+        """Get count, sum and quantiles for one summary series (mainly for tests)"""
+        with self._lock:
+            summary = self._summaries.get(name, {}).get(_label_key(labels))
+            if summary is None:
+                return None
+            result = {'count': summary.count, 'sum': summary.total}
+            result.update({f'p{int(q * 100)}': v for q, v in summary.quantiles().items()})
+            return result
+
+    def reset(self):
+        """Drop all recorded values (collectors are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+    def render(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        worker = {'worker': str(os.getpid())}
+        lines = []
+
+        def header(name, metric_type, help_text=''):
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+        with self._lock:
+            for name in sorted(self._counters):
+                header(name, 'counter', self._help.get(name, ''))
+                for key, value in self._counters[name].items():
+                    lines.append(f'{name}{_format_labels(key, worker)} {value}')
+
+            for name in sorted(self._gauges):
+                header(name, 'gauge', self._help.get(name, ''))
+                for key, value in self._gauges[name].items():
+                    lines.append(f'{name}{_format_labels(key, worker)} {value}')
+
+            for name in sorted(self._summaries):
+                header(name, 'summary', self._help.get(name, ''))
+                for key, summary in self._summaries[name].items():
+                    for q, value in summary.quantiles().items():
+                        lines.append(f'{name}{_format_labels(key, dict(worker, quantile=str(q)))} {value}')
+                    lines.append(f'{name}_sum{_format_labels(key, worker)} {summary.total}')
+                    lines.append(f'{name}_count{_format_labels(key, worker)} {summary.count}')
+
+            collectors = list(self._collectors)
+
+        # Collectors run outside the lock - they may call back into other modules
+        collected: Dict[str, List[Tuple[str, str, Dict[str, Any], float]]] = {}
+        for collector in collectors:
+            try:
+                for name, metric_type, help_text, labels, value in collector():
+                    collected.setdefault(name, []).append((metric_type, help_text, labels, value))
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+        for name in sorted(collected):
+            metric_type, help_text = collected[name][0][0], collected[name][0][1]
+            header(name, metric_type, help_text)
+            for _, _, labels, value in collected[name]:
+                lines.append(f'{name}{_format_labels(_label_key(labels), worker)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry
+registry = MetricsRegistry()
+
+
+class StageTrace:
+    """
+    Per-request stage timer.
+
+    Stages are recorded either with checkpoint(), which attributes the time
+    since the previous checkpoint to the named stage, or with the span()
+    context manager. On finish() every stage duration is observed into the
+    `<pipeline>_stage_seconds` summary labelled by stage and model.
+    """
+
+    def __init__(self, pipeline: str = 'chat', model: Optional[str] = None):
+        self.pipeline = pipeline
+        self.model = model
+        self.stages: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+        self._last_checkpoint = self.started_at
+        self._finished = False
+
+    def checkpoint(self, stage: str) -> float:
+        """
+        Close the current stage
+
+        Args:
+            stage: Name of the stage that just ended
+
+        Returns:
+            float: Stage duration in seconds
+        """
+        now = time.perf_counter()
+        duration = now - self._last_checkpoint
+        self._last_checkpoint = now
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration
+        return duration
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block as the named stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.stages[stage] = self.stages.get(stage, 0.0) + (now - start)
+            self._last_checkpoint = now
+
+    def finish(self, status: str = 'ok'):
+        """
+        Publish stage and total durations to the registry. Safe to call more than once.
+
+        Args:
+            status: Outcome label for the total request duration
+        """
+        if self._finished:
+            return
+        self._finished = True
+
+        model = self.model or 'unknown'
+        for stage, duration in self.stages.items():
+            registry.observe(f'{self.pipeline}_stage_seconds', duration,
+                             help=f'Duration of each {self.pipeline} pipeline stage',
+                             stage=stage, model=model)
+        registry.observe(f'{self.pipeline}_request_seconds', time.perf_counter() - self.started_at,
+                         help=f'Total {self.pipeline} request duration including streaming',
+                         model=model, status=status)
+        registry.inc(f'{self.pipeline}_requests_total', help=f'Total {self.pipeline} requests',
+                     model=model, status=status)
+
+
+def start_trace(pipeline: str = 'chat') -> StageTrace:
+    """
+    Start a stage trace for the current request and store it on flask.g
+
+    Args:
+        pipeline: Pipeline name used as the metric prefix
+
+    Returns:
+        StageTrace: The new trace
+    """
+    trace = StageTrace(pipeline)
+    g.stage_trace = trace
+    return trace
+
+
+def _openrouter_connection_collector():
+    """Export OpenRouter connection pool statistics"""
+    from openrouter_client import get_connection_stats
+
+    for transport, stats in get_connection_stats().items():
+        labels = {'transport': transport}
+        yield ('openrouter_http_requests_total', 'counter',
+               'Requests sent to OpenRouter', labels, stats['requests'])
+        yield ('openrouter_http_connections_opened_total', 'counter',
+               'New TCP+TLS connections opened to OpenRouter', labels, stats['connections_opened'])
+        yield ('openrouter_http_connections_reused_total', 'counter',
+               'Requests served over an already-open connection', labels, stats['connections_reused'])
+        yield ('openrouter_http_handshake_seconds_total', 'counter',
+               'Total time spent in TCP connect and TLS handshake', labels, stats['handshake_seconds_total'])
+        yield ('openrouter_http_handshake_seconds_max', 'gauge',
+               'Slowest TCP connect and TLS handshake observed', labels, stats['handshake_seconds_max'])
+
+
+registry.register_collector(_openrouter_connection_collector)
+
+# Create blueprint
+metrics_bp = Blueprint('metrics', __name__)
+
+
+# Peers allowed to scrape /metrics without a token when METRICS_TOKEN is unset
+_LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _scrape_allowed() -> bool:
+    """
+    Check access to /metrics
+
+    With METRICS_TOKEN set, the request must carry it as a bearer token.
+    Without it, only direct (unproxied) requests from this host are served.
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    # A local reverse proxy would make every public request look local
+    return request.remote_addr in _LOOPBACK_ADDRESSES and 'X-Forwarded-For' not in request.headers
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Serve all metrics in Prometheus text format"""
+    if not _scrape_allowed():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8',
+                    headers={'Cache-Control': 'no-store'})
+
+
+def init_metrics(app: Flask):
+    """
+    Register the metrics blueprint and finish any open stage trace at request teardown
+
+    Args:
+        app: Flask application
+    """
+    app.register_blueprint(metrics_bp)
+
+    @app.teardown_request
+    def _finish_stage_trace(exc):
+        trace = g.pop('stage_trace', None)
+        if trace is not None:
+            trace.finish(status='error' if exc is not None else 'ok')
+
+    logger.info("Metrics endpoint registered at /metrics")
@@ -0,0 +1,121 @@
+"""
+Micro Batcher Module
+
+Coalesces concurrent single-item calls into one batch call.
+
+Callers in different requests (threads or greenlets) call submit(item) and
+block for their own result. The first caller of a batch waits up to max_wait
+seconds for others to join, or until max_batch items are collected, then runs
+the batch function on its own thread and hands each caller its result. There
+is no background thread, so nothing needs starting after a fork, and a single
+caller pays at most max_wait of extra latency.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    """Items collected for one batch call and the outcome shared by their callers"""
+
+    __slots__ = ('items', 'full', 'done', 'results', 'error')
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Optional[List[Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatcher:
+    """
+    Run concurrent submit() calls as batches of batch_fn
+
+    batch_fn takes a list of items and returns a list of results in the same
+    order. If it raises, every caller in that batch gets the exception.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: int = 16,
+                 max_wait: float = 0.005, name: str = 'batch'):
+        """
+        Initialize the batcher
+
+        Args:
+            batch_fn: Function computing results for a list of items
+            max_batch: Most items per batch call
+            max_wait: Seconds the first caller waits for others to join (0 disables batching)
+            name: Label for the batch metrics
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self._lock = threading.Lock()
+        self._pending: Optional[_Batch] = None
+
+    def submit(self, item: Any) -> Any:
+        """
+        Get the result for one item, batched with concurrent callers
+
+        Args:
+            item: Input for batch_fn
+
+        Returns:
+            Any: This item's result
+
+        Raises:
+            Exception: Whatever batch_fn raised for the batch
+        """
+        if self.max_wait <= 0 or self.max_batch <= 1:
+            return self.batch_fn([item])[0]
+
+        with self._lock:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch:
+                # Close the batch; later callers start a new one
+                self._pending = None
+                batch.full.set()
+
+        if leader:
+            started = time.monotonic()
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._pending is batch:
+                    self._pending = None
+            registry.observe('micro_batch_wait_seconds', time.monotonic() - started,
+                             help='Time the first caller waited for a batch to fill', batcher=self.name)
+            self._run(batch)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _run(self, batch: _Batch):
+        """Call batch_fn for a closed batch and wake its callers"""
+        items = batch.items
+        registry.observe('micro_batch_size', len(items), help='Items per batch call', batcher=self.name)
+        try:
+            results = self.batch_fn(list(items))
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: batch function returned {len(results)} results "
+                                   f"for {len(items)} items")
+            batch.results = results
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+            batch.error = e
+        finally:
+            batch.done.set()
@@ -0,0 +1,48 @@
+"""
+Database migration to add the rolling history summary columns to the Conversation table.
+"""
+import logging
+from sqlalchemy import text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = {
+    'history_summary': 'TEXT',
+    'summary_message_id': 'INTEGER',
+    'summary_token_count': 'INTEGER',
+}
+
+
+def run_migration():
+    """Add the conversation summary columns that don't exist yet."""
+    logger.info("Starting Conversation summary migration...")
+
+    try:
+        from app import db
+        from sqlalchemy import inspect
+
+        columns = [column['name'] for column in inspect(db.engine).get_columns('conversation')]
+        missing = {name: sql_type for name, sql_type in SUMMARY_COLUMNS.items() if name not in columns}
+        if not missing:
+            logger.info("Conversation summary columns already exist, skipping migration")
+            return True
+
+        with db.engine.connect() as conn:
+            for name, sql_type in missing.items():
+                conn.execute(text(f'ALTER TABLE conversation ADD COLUMN {name} {sql_type}'))
+            conn.commit()
+        logger.info(f"Migration successful: Added {', '.join(missing)} to Conversation table")
+        return True
+
+    except Exception as e:
+        logger.error(f"Conversation summary migration error: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        run_migration()
@@ -0,0 +1,85 @@
+"""
+Database migration to add the token_count column to the Message table.
+
+New messages get their count at insert time (see history_window.py). Existing
+rows are backfilled in batches; rows left NULL are estimated from their length
+when history is selected, so the backfill can run after deployment.
+"""
+import logging
+from sqlalchemy import text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def run_migration():
+    """Add the message.token_count column if it doesn't exist yet."""
+    logger.info("Starting Message token_count migration...")
+
+    try:
+        from app import db
+        from sqlalchemy import inspect
+
+        columns = [column['name'] for column in inspect(db.engine).get_columns('message')]
+        if 'token_count' in columns:
+            logger.info("Column token_count already exists in Message table, skipping migration")
+            return True
+
+        with db.engine.connect() as conn:
+            conn.execute(text('ALTER TABLE message ADD COLUMN token_count INTEGER'))
+            conn.commit()
+        logger.info("Migration successful: Added token_count column to Message table")
+        return True
+
+    except Exception as e:
+        logger.error(f"Message token_count migration error: {e}")
+        return False
+
+
+def backfill_token_counts(batch_size=BACKFILL_BATCH_SIZE, max_batches=None):
+    """
+    Compute token counts for messages stored before the column existed.
+
+    Args:
+        batch_size (int): Rows updated per transaction
+        max_batches (int, optional): Stop after this many batches
+
+    Returns:
+        int: Number of messages updated
+    """
+    from app import db
+    from models import Message
+    from history_window import count_tokens
+
+    updated = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.session.query(Message.id, Message.content)\
+            .filter(Message.token_count.is_(None))\
+            .order_by(Message.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            break
+
+        db.session.bulk_update_mappings(Message, [
+            {'id': message_id, 'token_count': count_tokens(content)} for message_id, content in rows
+        ])
+        db.session.commit()
+
+        updated += len(rows)
+        batches += 1
+        logger.info(f"Backfilled token counts for {updated} messages")
+
+    return updated
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        if run_migration():
+            backfill_token_counts()
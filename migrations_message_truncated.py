@@ -0,0 +1,41 @@
+"""
+Database migration to add the is_truncated flag to the Message table.
+Marks assistant replies that were cut short because the client disconnected.
+"""
+import logging
+from sqlalchemy import text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add the message.is_truncated column if it doesn't exist yet."""
+    logger.info("Starting Message is_truncated migration...")
+
+    try:
+        from app import db
+        from sqlalchemy import inspect
+
+        columns = [column['name'] for column in inspect(db.engine).get_columns('message')]
+        if 'is_truncated' in columns:
+            logger.info("Column is_truncated already exists in Message table, skipping migration")
+            return True
+
+        with db.engine.connect() as conn:
+            conn.execute(text('ALTER TABLE message ADD COLUMN is_truncated BOOLEAN NOT NULL DEFAULT FALSE'))
+            conn.commit()
+        logger.info("Migration successful: Added is_truncated column to Message table")
+        return True
+
+    except Exception as e:
+        logger.error(f"Message is_truncated migration error: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        run_migration()
@@ -0,0 +1,45 @@
+"""
+Database migration to add the reconciled flag to the Usage table.
+Chat usage charged through the Redis credit ledger is written with
+reconciled=FALSE and applied to User.credits later (see credit_ledger.py).
+Existing rows were deducted when they were written.
+"""
+import logging
+from sqlalchemy import text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_migration():
+    """Add the usage.reconciled column if it doesn't exist yet."""
+    logger.info("Starting Usage reconciled migration...")
+
+    try:
+        from app import db
+        from sqlalchemy import inspect
+
+        columns = [column['name'] for column in inspect(db.engine).get_columns('usage')]
+        if 'reconciled' in columns:
+            logger.info("Column reconciled already exists in Usage table, skipping migration")
+            return True
+
+        with db.engine.connect() as conn:
+            conn.execute(text('ALTER TABLE usage ADD COLUMN reconciled BOOLEAN NOT NULL DEFAULT TRUE'))
+            # Reconcile scans only the pending rows
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_usage_unreconciled ON usage (user_id) WHERE reconciled = FALSE'))
+            conn.commit()
+        logger.info("Migration successful: Added reconciled column to Usage table")
+        return True
+
+    except Exception as e:
+        logger.error(f"Usage reconciled migration error: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        run_migration()
@@ -0,0 +1,346 @@
+"""
+Model Catalog Module
+
+This module keeps an immutable, versioned in-process snapshot of the OpenRouter
+model table so the /chat hot path can answer availability, capability, context
+length and pricing questions without touching the database.
+
+The snapshot is rebuilt from the database after the price updater commits and
+swapped in atomically. Readers always see either the old or the new catalog,
+never a partially built one.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from invalidation_bus import MODEL_CATALOG_TOPIC, ensure_listener, is_listening, subscribe
+
+logger = logging.getLogger(__name__)
+
+# How long a catalog may be served before a background reload is triggered.
+# Workers that did not run the price update themselves rely on this to converge
+# when they are not receiving invalidation_bus events.
+CATALOG_MAX_AGE = int(os.environ.get('MODEL_CATALOG_MAX_AGE', '300'))
+
+# Safety-net reload interval while the invalidation bus is connected
+CATALOG_MAX_AGE_SUBSCRIBED = int(os.environ.get('MODEL_CATALOG_MAX_AGE_SUBSCRIBED', '3600'))
+
+# Fields copied from OpenRouterModel rows into each catalog entry
+_ENTRY_FIELDS = (
+    'model_id',
+    'name',
+    'description',
+    'context_length',
+    'input_price_usd_million',
+    'output_price_usd_million',
+    'is_multimodal',
+    'is_free',
+    'supports_reasoning',
+    'supports_pdf',
+    'cost_band',
+    'elo_score',
+    'model_is_active',
+    'updated_at',
+)
+
+
+class ModelCatalog:
+    """
+    Immutable snapshot of the model table with O(1) lookups.
+
+    Entries are read-only mappings keyed by model ID. A catalog is never
+    modified after construction; refreshes build a new instance.
+    """
+
+    __slots__ = ('_entries', '_available', 'available_model_ids',
+                 'version', 'change_version', 'fingerprint', 'loaded_at')
+
+    def __init__(self, entries: Iterable[Dict[str, Any]], version: int = 0,
+                 loaded_at: Optional[float] = None, change_version: Optional[int] = None):
+        """
+        Build a catalog from plain entry dicts
+
+        Args:
+            entries: Iterable of dicts containing the fields in _ENTRY_FIELDS
+            version: Catalog version (increases whenever the content changes)
+            loaded_at: Unix timestamp the entries were read from the database
+            change_version: Cluster-wide version from catalog_changelog, read
+                before the entries (None if Redis is unavailable)
+        """
+        frozen = {}
+        for entry in entries:
+            model_id = entry.get('model_id')
+            if not model_id:
+                continue
+            frozen[model_id] = MappingProxyType(
+                {field: entry.get(field) for field in _ENTRY_FIELDS}
+            )
+
+        self._entries = MappingProxyType(frozen)
+        self.available_model_ids: Tuple[str, ...] = tuple(
+            model_id for model_id, entry in frozen.items() if entry['model_is_active']
+        )
+        self._available = frozenset(self.available_model_ids)
+        self.version = version
+        self.change_version = change_version
+        self.fingerprint = compute_fingerprint(frozen.values())
+        self.loaded_at = loaded_at if loaded_at is not None else time.time()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, model_id: str) -> bool:
+        return model_id in self._entries
+
+    def get(self, model_id: str) -> Optional[Mapping[str, Any]]:
+        """
+        Get the read-only entry for a model
+
+        Args:
+            model_id: OpenRouter model ID
+
+        Returns:
+            Mapping of model fields, or None if the model is unknown
+        """
+        return self._entries.get(model_id)
+
+    def entries(self) -> Iterable[Mapping[str, Any]]:
+        """Iterate over all catalog entries"""
+        return self._entries.values()
+
+    def is_available(self, model_id: str) -> bool:
+        """Check whether a model is known and currently active"""
+        return model_id in self._available
+
+    def supports_multimodal(self, model_id: str) -> Optional[bool]:
+        """
+        Check multimodal (image input) support
+
+        Returns:
+            bool if the model is in the catalog, None if it is unknown
+        """
+        entry = self._entries.get(model_id)
+        return bool(entry['is_multimodal']) if entry is not None else None
+
+    def supports_pdf(self, model_id: str) -> Optional[bool]:
+        """
+        Check native PDF support
+
+        Returns:
+            bool if the model is in the catalog, None if it is unknown
+        """
+        entry = self._entries.get(model_id)
+        return bool(entry['supports_pdf']) if entry is not None else None
+
+    def supports_reasoning(self, model_id: str) -> Optional[bool]:
+        """
+        Check reasoning parameter support
+
+        Returns:
+            bool if the model is in the catalog, None if it is unknown
+        """
+        entry = self._entries.get(model_id)
+        return bool(entry['supports_reasoning']) if entry is not None else None
+
+    def context_length(self, model_id: str) -> Optional[int]:
+        """Get the model's context length, or None if unknown"""
+        entry = self._entries.get(model_id)
+        return entry['context_length'] if entry is not None else None
+
+    def pricing(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get pricing for a model in the format used by price_updater.get_model_cost
+
+        Returns:
+            dict with prompt_cost_per_million, completion_cost_per_million and
+            cost_band, or None if the model is unknown
+        """
+        entry = self._entries.get(model_id)
+        if entry is None:
+            return None
+        return {
+            'prompt_cost_per_million': entry['input_price_usd_million'],
+            'completion_cost_per_million': entry['output_price_usd_million'],
+            'cost_band': entry['cost_band'] or '',
+            'source': 'catalog'
+        }
+
+    def best_model(self, multimodal: bool = False, reasoning: bool = False) -> Optional[str]:
+        """
+        Pick the most capable active model matching the requested capabilities.
+        Higher output price is treated as more capable, matching model_validator.
+
+        Args:
+            multimodal: Only consider multimodal models
+            reasoning: Only consider reasoning models
+
+        Returns:
+            Model ID, or None if no active model matches
+        """
+        best_id = None
+        best_price = None
+        for model_id in self.available_model_ids:
+            entry = self._entries[model_id]
+            if multimodal and not entry['is_multimodal']:
+                continue
+            if reasoning and not entry['supports_reasoning']:
+                continue
+            price = entry['output_price_usd_million'] or 0
+            if best_price is None or price > best_price:
+                best_id = model_id
+                best_price = price
+        return best_id
+
+
+def compute_fingerprint(entries: Iterable[Mapping[str, Any]]) -> str:
+    """
+    Compute a stable content hash for a set of catalog entries
+
+    Args:
+        entries: Catalog entries
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    rows = sorted((dict(entry) for entry in entries), key=lambda e: e['model_id'])
+    payload = json.dumps(rows, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Current catalog and bookkeeping. Readers only ever load _catalog once, so a
+# plain reference assignment is the atomic swap.
+_catalog: Optional[ModelCatalog] = None
+_catalog_checked_at = 0.0
+_catalog_lock = threading.Lock()
+_refresh_in_progress = False
+
+
+def _load_entries() -> List[Dict[str, Any]]:
+    """
+    Read all model rows from the database as plain dicts
+
+    Returns:
+        list: Entry dicts for ModelCatalog
+    """
+    from app import app
+    from models import OpenRouterModel
+
+    with app.app_context():
+        rows = OpenRouterModel.query.all()
+        return [{field: getattr(row, field) for field in _ENTRY_FIELDS} for row in rows]
+
+
+def swap_model_catalog(entries: Iterable[Dict[str, Any]],
+                       change_version: Optional[int] = None) -> ModelCatalog:
+    """
+    Install a new catalog built from the given entries.
+
+    The version only increases when the content or the cluster-wide change
+    version changed; an identical snapshot keeps the existing catalog object
+    and just marks it as fresh.
+
+    Args:
+        entries: Entry dicts for the new catalog
+        change_version: Cluster-wide catalog version read before the entries
+
+    Returns:
+        ModelCatalog: The catalog now in use
+    """
+    global _catalog, _catalog_checked_at
+
+    with _catalog_lock:
+        current = _catalog
+        next_version = current.version + 1 if current is not None else 1
+        candidate = ModelCatalog(entries, version=next_version, change_version=change_version)
+
+        if (current is not None and current.fingerprint == candidate.fingerprint
+                and current.change_version == candidate.change_version):
+            _catalog_checked_at = time.time()
+            return current
+
+        _catalog = candidate
+        _catalog_checked_at = candidate.loaded_at
+        logger.info(f"📚 Model catalog v{candidate.version} installed "
+                    f"({len(candidate)} models, {len(candidate.available_model_ids)} active)")
+        return candidate
+
+
+def refresh_model_catalog() -> Optional[ModelCatalog]:
+    """
+    Rebuild the catalog from the database and swap it in.
+    On failure the previous catalog stays in place.
+
+    Returns:
+        ModelCatalog or None if no catalog could be loaded
+    """
+    try:
+        from catalog_changelog import current_catalog_version
+        change_version = current_catalog_version()
+        return swap_model_catalog(_load_entries(), change_version)
+    except Exception as e:
+        logger.error(f"Error refreshing model catalog: {e}")
+        return _catalog
+
+
+def _refresh_in_background():
+    """Reload the catalog in a daemon thread, at most one at a time"""
+    global _refresh_in_progress
+
+    with _catalog_lock:
+        if _refresh_in_progress:
+            return
+        _refresh_in_progress = True
+
+    def _run():
+        global _refresh_in_progress
+        try:
+            refresh_model_catalog()
+        finally:
+            _refresh_in_progress = False
+
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def get_model_catalog() -> Optional[ModelCatalog]:
+    """
+    Get the current model catalog.
+
+    The first call loads the catalog synchronously. After that, a catalog older
+    than CATALOG_MAX_AGE is still returned immediately while a background
+    reload runs, so callers never wait on the database. While this process
+    receives invalidation_bus events, changes arrive as they are committed and
+    the timed reload only runs every CATALOG_MAX_AGE_SUBSCRIBED seconds.
+
+    Returns:
+        ModelCatalog or None if the database could not be read
+    """
+    ensure_listener()
+
+    catalog = _catalog
+    if catalog is None:
+        return refresh_model_catalog()
+
+    max_age = CATALOG_MAX_AGE_SUBSCRIBED if is_listening() else CATALOG_MAX_AGE
+    if time.time() - _catalog_checked_at > max_age:
+        _refresh_in_background()
+
+    return catalog
+
+
+def _on_catalog_invalidated(event: Dict[str, Any]):
+    """invalidation_bus handler: reload unless this catalog already has the published version"""
+    catalog = _catalog
+    version = event.get('version')
+    if (catalog is not None and version is not None and catalog.change_version is not None
+            and catalog.change_version >= version):
+        return
+    refresh_model_catalog()
+
+
+subscribe(MODEL_CATALOG_TOPIC, _on_catalog_invalidated)
@@ -0,0 +1,380 @@
+"""
+Model Payloads Module
+
+This module serves the model list endpoints (/models, /api/get_model_prices and
+/api/model-pricing) from one canonical JSON body per catalog version. Each body
+is serialized once, precompressed with gzip (and brotli when available) and
+tagged with a strong ETag, so a page load costs a header comparison and, at
+most, a write of bytes that already exist.
+
+Payloads are rebuilt only when model_catalog installs a new version. Clients
+that send since=<version> get only the models added, changed or removed after
+that version, taken from catalog_changelog.
+"""
+
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+    logger.info("brotli not installed, model payloads will be served with gzip only")
+
+# Bodies smaller than this are served uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Browsers must revalidate, but a matching ETag costs only a 304
+CACHE_CONTROL = 'no-cache'
+
+# Model whose pricing is decided by OpenRouter per request
+AUTO_ROUTER_ID = 'openrouter/auto'
+
+
+class PreparedPayload:
+    """
+    A serialized response body and its precompressed variants.
+
+    Each encoding has its own strong ETag, since the bytes on the wire differ.
+    """
+
+    __slots__ = ('version', 'body', 'encoded', 'etags')
+
+    def __init__(self, version: int, data: Dict[str, Any]):
+        """
+        Serialize and compress a payload
+
+        Args:
+            version: Catalog version the payload was built from
+            data: JSON-serializable response data
+        """
+        self.version = version
+        self.body = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+
+        self.encoded = {'identity': self.body}
+        if len(self.body) >= MIN_COMPRESS_SIZE:
+            self.encoded['gzip'] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                self.encoded['br'] = brotli.compress(self.body, quality=11)
+
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.encoded
+        }
+
+    def choose_encoding(self, accept_encoding: Optional[str]) -> str:
+        """
+        Pick the smallest variant the client accepts
+
+        Args:
+            accept_encoding: Accept-Encoding request header
+
+        Returns:
+            str: 'br', 'gzip' or 'identity'
+        """
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return 'identity'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Check an If-None-Match header against every variant's ETag.
+        Any variant matching means the client holds the current version.
+        """
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return any(etag in candidates for etag in self.etags.values())
+
+
+def _parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q}"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def build_conditional_response(prepared: PreparedPayload, if_none_match: Optional[str],
+                               accept_encoding: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Work out status, headers and body for a request against a prepared payload
+
+    Args:
+        prepared: Payload to serve
+        if_none_match: If-None-Match request header
+        accept_encoding: Accept-Encoding request header
+
+    Returns:
+        tuple: (status code, response headers, body bytes)
+    """
+    encoding = prepared.choose_encoding(accept_encoding)
+    headers = {
+        'ETag': prepared.etags[encoding],
+        'Cache-Control': CACHE_CONTROL,
+        'Vary': 'Accept-Encoding',
+    }
+
+    if prepared.matches(if_none_match):
+        return 304, headers, b''
+
+    body = prepared.encoded[encoding]
+    headers['Content-Type'] = 'application/json'
+    headers['Content-Length'] = str(len(body))
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return 200, headers, body
+
+
+def _cost_band(entry) -> str:
+    """Stored cost band, or the same estimate price_updater gives rows without one"""
+    cost_band = entry['cost_band']
+    if cost_band and cost_band.strip():
+        return cost_band
+    input_price = entry['input_price_usd_million'] or 0
+    if entry['is_free'] or input_price == 0:
+        return "Free"
+    elif input_price < 1.0:
+        return "$"
+    elif input_price < 5.0:
+        return "$$"
+    return "$$$"
+
+
+def _active_entries(catalog, model_ids: Optional[Iterable[str]] = None) -> Iterable:
+    """Active catalog entries, optionally limited to the given (active) model IDs"""
+    if model_ids is not None:
+        return (catalog.get(model_id) for model_id in model_ids)
+    return (entry for entry in catalog.entries() if entry['model_is_active'])
+
+
+def build_models_data(catalog, document_models: Iterable[str] = (),
+                      model_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Build the /models response from a catalog
+
+    Args:
+        catalog: ModelCatalog snapshot
+        document_models: Model IDs that handle documents regardless of PDF support
+        model_ids: Only include these active models (for deltas)
+
+    Returns:
+        dict: {"version": ..., "data": [...]} sorted by model name
+    """
+    document_models = frozenset(document_models)
+    processed_models = []
+    for entry in sorted(_active_entries(catalog, model_ids), key=lambda e: e['name'] or ''):
+        model_id = entry['model_id']
+        input_price = entry['input_price_usd_million'] or 0
+        output_price = entry['output_price_usd_million'] or 0
+        processed_models.append({
+            'id': model_id,
+            'name': entry['name'],
+            'description': entry['description'] or '',
+            'context_length': entry['context_length'],
+            'pricing': {
+                # Convert back to per-token pricing from per-million
+                'prompt': str(input_price / 1000000),
+                'completion': str(output_price / 1000000)
+            },
+            'is_multimodal': bool(entry['is_multimodal']),
+            'supports_vision': bool(entry['is_multimodal']),  # Frontend expects this field
+            'supports_pdf': bool(entry['supports_pdf'] or model_id in document_models),
+            'is_free': input_price == 0 and output_price == 0,
+            'is_perplexity': 'perplexity/' in model_id.lower(),
+            'is_reasoning': bool(entry['supports_reasoning']),
+        })
+    return {"version": catalog.change_version, "data": processed_models}
+
+
+def build_prices_data(catalog, model_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Build the /api/get_model_prices response from a catalog
+
+    Args:
+        catalog: ModelCatalog snapshot
+        model_ids: Only include these active models (for deltas)
+
+    Returns:
+        dict: {'success', 'version', 'prices', 'last_updated'}
+    """
+    last_updated = None
+    for entry in _active_entries(catalog):
+        updated_at = entry['updated_at']
+        if updated_at is not None and (last_updated is None or updated_at > last_updated):
+            last_updated = updated_at
+
+    prices = {}
+    for entry in _active_entries(catalog, model_ids):
+        model_id = entry['model_id']
+        is_auto = model_id == AUTO_ROUTER_ID
+
+        pricing_data = {
+            'input_price': None if is_auto else (entry['input_price_usd_million'] or 0),
+            'output_price': None if is_auto else (entry['output_price_usd_million'] or 0),
+            'context_length': str(entry['context_length']) if entry['context_length'] else 'N/A',
+            'multimodal': "Yes" if entry['is_multimodal'] else "No",
+            'pdfs': "Yes" if entry['supports_pdf'] else "No",
+            'model_name': entry['name'] or model_id,
+            'model_id': model_id,
+            'cost_band': "Auto" if is_auto else _cost_band(entry),
+            'is_free': False if is_auto else bool(entry['is_free']),
+            'is_reasoning': bool(entry['supports_reasoning']),
+            'elo_score': entry['elo_score'],
+            'source': 'database'
+        }
+        if is_auto:
+            pricing_data.update({
+                'display_input_price': 'Dynamic*',
+                'display_output_price': 'Dynamic*',
+                'context_length_display': 'Variable',
+                'cost_band_symbol': 'Auto',
+                'cost_band_class': 'cost-band-auto'
+            })
+        prices[model_id] = pricing_data
+
+    return {
+        'success': True,
+        'version': catalog.change_version,
+        'prices': prices,
+        'last_updated': last_updated.isoformat() if last_updated is not None else None
+    }
+
+
+# Prepared payloads by name, each tagged with the catalog version it was built from
+_prepared: Dict[str, PreparedPayload] = {}
+_prepared_lock = threading.Lock()
+
+# Prepared deltas by (name, since) for the catalog version in _deltas_version
+_deltas: Dict[Tuple[str, int], PreparedPayload] = {}
+_deltas_version = None
+
+
+def _get_prepared_delta(name: str, builder: Callable[..., Dict[str, Any]], catalog,
+                        since: int) -> Optional[PreparedPayload]:
+    """
+    Get the changes between catalog version `since` and the current catalog
+
+    Returns:
+        PreparedPayload with the changed models and removed IDs, or None if the
+        change log cannot answer and the full payload must be served
+    """
+    global _deltas_version
+
+    if catalog.change_version is None:
+        return None
+
+    prepared = _deltas.get((name, since))
+    if prepared is not None and prepared.version == catalog.version:
+        return prepared
+
+    from catalog_changelog import changes_since
+
+    changes = changes_since(since, catalog.change_version)
+    if changes is None:
+        return None
+
+    changed = sorted(model_id for model_id in changes if catalog.is_available(model_id))
+    removed = sorted(model_id for model_id in changes if not catalog.is_available(model_id))
+    data = builder(catalog, changed)
+    data.update({'delta': True, 'since': since, 'removed': removed})
+    prepared = PreparedPayload(catalog.version, data)
+
+    with _prepared_lock:
+        if _deltas_version != catalog.version:
+            _deltas.clear()
+            _deltas_version = catalog.version
+        _deltas[(name, since)] = prepared
+    return prepared
+
+
+def get_prepared_payload(name: str, builder: Callable[..., Dict[str, Any]],
+                         catalog=None, since: Optional[int] = None) -> Optional[PreparedPayload]:
+    """
+    Get the payload for the current catalog, building it on the first request
+    after a catalog version change
+
+    Args:
+        name: Payload name ('models' or 'prices')
+        builder: Function taking a catalog and optional model IDs, returning response data
+        catalog: Catalog to use, defaults to model_catalog.get_model_catalog()
+        since: Catalog version the client holds; only the changes are returned
+            when the change log covers it
+
+    Returns:
+        PreparedPayload, or None if no non-empty catalog is available
+    """
+    if catalog is None:
+        from model_catalog import get_model_catalog
+        catalog = get_model_catalog()
+    if catalog is None or not catalog.available_model_ids:
+        return None
+
+    if since is not None:
+        delta = _get_prepared_delta(name, builder, catalog, since)
+        registry.inc('model_payload_delta_requests_total', help='Model list requests with since=',
+                     payload=name, result='delta' if delta is not None else 'full')
+        if delta is not None:
+            return delta
+
+    prepared = _prepared.get(name)
+    if prepared is not None and prepared.version == catalog.version:
+        return prepared
+
+    with _prepared_lock:
+        prepared = _prepared.get(name)
+        if prepared is not None and prepared.version == catalog.version:
+            return prepared
+        prepared = PreparedPayload(catalog.version, builder(catalog))
+        _prepared[name] = prepared
+
+    registry.inc('model_payload_builds_total', help='Model list payloads serialized and compressed', payload=name)
+    logger.info(f"Prepared {name} payload for catalog v{catalog.version} "
+                f"({', '.join(f'{enc}={len(body)}B' for enc, body in prepared.encoded.items())})")
+    return prepared
+
+
+def serve_payload(prepared: PreparedPayload, payload_name: str):
+    """
+    Build a Flask response for the current request from a prepared payload
+
+    Args:
+        prepared: Payload to serve
+        payload_name: Metric label for the endpoint
+
+    Returns:
+        flask.Response (200 with the negotiated encoding, or 304)
+    """
+    from flask import Response, request
+
+    status, headers, body = build_conditional_response(
+        prepared, request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'))
+    registry.inc('model_payload_responses_total', help='Model list responses by status and encoding',
+                 payload=payload_name, status=str(status), encoding=headers.get('Content-Encoding', 'identity'))
+    return Response(body, status=status, headers=headers)
@@ -7,54 +7,116 @@ and to safely fallback to alternative models when the requested model is not ava
 import os
 import json
 import time
+import hashlib
 import logging
-import requests
+import tempfile
+import threading
 import traceback
 
 logger = logging.getLogger(__name__)
 
+# How long a computed availability list is reused before re-checking the catalog
+AVAILABLE_MODELS_TTL = int(os.environ.get('AVAILABLE_MODELS_TTL', '60'))
+AVAILABLE_MODELS_FILE = 'available_models.json'
+
+# Cached availability list, keyed by the catalog version it was built from
+_available_models_cache = {
+    'models': None,
+    'version': None,
+    'expires_at': 0.0
+}
+_snapshot_fingerprint = None
+_snapshot_lock = threading.Lock()
+
+def _write_models_snapshot(models, fingerprint=None):
+    """
+    Atomically write the available models snapshot file, skipping the write
+    when the content is unchanged.
+    
+    The file is written to a temporary path in the same directory and moved
+    into place with os.replace, so concurrent workers never see a partial file.
+    
+    Args:
+        models (list): Model IDs to write
+        fingerprint (str, optional): Content hash of the models list
+    """
+    global _snapshot_fingerprint
+    
+    if fingerprint is None:
+        fingerprint = hashlib.sha256(json.dumps(models).encode('utf-8')).hexdigest()
+    
+    with _snapshot_lock:
+        if fingerprint == _snapshot_fingerprint:
+            return
+        
+        try:
+            # Another worker may already have written identical content
+            if os.path.exists(AVAILABLE_MODELS_FILE):
+                with open(AVAILABLE_MODELS_FILE, 'r') as f:
+                    if json.load(f) == models:
+                        _snapshot_fingerprint = fingerprint
+                        return
+        except Exception:
+            # Unreadable or corrupt snapshot - overwrite it below
+            pass
+        
+        try:
+            directory = os.path.dirname(os.path.abspath(AVAILABLE_MODELS_FILE))
+            fd, tmp_path = tempfile.mkstemp(prefix='.available_models.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(models, f)
+                os.replace(tmp_path, AVAILABLE_MODELS_FILE)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            _snapshot_fingerprint = fingerprint
+            logger.info(f"✅ Wrote available models snapshot ({len(models)} models)")
+        except Exception as write_error:
+            logger.warning(f"⚠️ Could not update cache file: {write_error}")
+
 def get_available_models():
     """
-    Get a list of all available model IDs from the database (primary source)
-    or fallback to OpenRouter API if the database is empty.
+    Get a list of all available model IDs from the in-process model catalog
+    (primary source) or fallback to OpenRouter API if the catalog is empty.
+    
+    The list is cached for AVAILABLE_MODELS_TTL seconds and rebuilt early when
+    the catalog version changes. The available_models.json snapshot is only
+    rewritten when the list itself changes.
     
     Returns:
         list: List of model IDs available
     """
     try:
-        # First try to get models from database (most reliable source)
-        logger.info("🔍 Attempting to fetch models from database")
-        try:
-            from app import app
-            from models import OpenRouterModel
+        from model_catalog import get_model_catalog
+        
+        catalog = get_model_catalog()
+        if catalog and catalog.available_model_ids:
+            cached = _available_models_cache
+            if cached['version'] == catalog.version and time.time() < cached['expires_at']:
+                return cached['models']
             
-            with app.app_context():
-                # Only include active models
-                db_models = OpenRouterModel.query.filter_by(model_is_active=True).all()
-                logger.info(f"🔍 Database query returned {len(db_models) if db_models else 0} active models")
-                
-                if db_models:
-                    model_ids = [model.model_id for model in db_models]
-                    logger.info(f"✅ Found {len(model_ids)} models in database")
-                    logger.info(f"🔍 Sample model IDs: {model_ids[:10]}")
-                    
-                    # Still update the cache file for backward compatibility
-                    try:
-                        with open('available_models.json', 'w') as f:
-                            json.dump(model_ids, f, indent=2)
-                        logger.info("✅ Updated cache file with database models")
-                    except Exception as cache_write_error:
-                        logger.warning(f"⚠️ Could not update cache file: {cache_write_error}")
-                        
-                    return model_ids
-                else:
-                    logger.warning("❌ No models found in database, will try API")
-        except Exception as db_error:
-            logger.error(f"❌ Error accessing database models: {db_error}")
-            import traceback
-            logger.error(f"❌ Database error traceback: {traceback.format_exc()}")
+            model_ids = list(catalog.available_model_ids)
+            
+            # Only touch the snapshot file when the catalog content changed
+            if cached['version'] != catalog.version:
+                logger.info(f"✅ Model catalog v{catalog.version}: {len(model_ids)} available models")
+                _write_models_snapshot(model_ids)
+            
+            _available_models_cache.update({
+                'models': model_ids,
+                'version': catalog.version,
+                'expires_at': time.time() + AVAILABLE_MODELS_TTL
+            })
+            return model_ids
         
-        # If database access failed, try direct API call
+        logger.warning("❌ No models found in model catalog, will try API")
+    except Exception as catalog_error:
+        logger.error(f"❌ Error accessing model catalog: {catalog_error}")
+        logger.error(f"❌ Catalog error traceback: {traceback.format_exc()}")
+    
+    try:
+        # If the catalog is unavailable, try direct API call
         api_key = os.environ.get('OPENROUTER_API_KEY')
         if not api_key:
             logger.error("OPENROUTER_API_KEY not found")
@@ -66,7 +128,8 @@ def get_available_models():
         }
         
         logger.info("Fetching models from OpenRouter API for validation...")
-        response = requests.get(
+        from openrouter_client import get_openrouter_session
+        response = get_openrouter_session().get(
             'https://openrouter.ai/api/v1/models',
             headers=headers,
             timeout=15.0
@@ -81,8 +144,7 @@ def get_available_models():
         logger.info(f"Found {len(models)} available models via API")
         
         # Cache the results to a file for offline reference
-        with open('available_models.json', 'w') as f:
-            json.dump(models, f, indent=2)
+        _write_models_snapshot(models)
             
         # Try to update the database with these models for future use
         try:
@@ -99,8 +161,8 @@ def get_available_models():
         
         # Try to load from cache if available
         try:
-            if os.path.exists('available_models.json'):
-                with open('available_models.json', 'r') as f:
+            if os.path.exists(AVAILABLE_MODELS_FILE):
+                with open(AVAILABLE_MODELS_FILE, 'r') as f:
                     models = json.load(f)
                 logger.info(f"Loaded {len(models)} models from cache file")
                 return models
@@ -184,7 +246,7 @@ def get_fallback_model(requested_model, fallback_models, available_models=None):
 def select_multimodal_fallback(has_image_content, available_models=None, has_rag_content=False):
     """
     Select an appropriate model based on content type (images, documents, etc).
-    Tries to use database query first for efficiency, then falls back to list filtering.
+    Tries the in-process model catalog first, then a database query, then falls back to list filtering.
     
     Args:
         has_image_content (bool): Whether the message contains image content
@@ -195,7 +257,28 @@ def select_multimodal_fallback(has_image_content, available_models=None, has_rag
         str: The best available model ID appropriate for the content type
     """
     try:
-        # First try to get models directly from the database by capability
+        # First try the in-process model catalog (no database query)
+        from model_catalog import get_model_catalog
+        
+        catalog = get_model_catalog()
+        if catalog and catalog.available_model_ids:
+            model_id = None
+            
+            # Prefer reasoning models for text or RAG content
+            if not has_image_content or has_rag_content:
+                model_id = catalog.best_model(multimodal=has_image_content, reasoning=True)
+            
+            if not model_id:
+                model_id = catalog.best_model(multimodal=has_image_content)
+            
+            if model_id:
+                logger.info(f"Selected {'multimodal' if has_image_content else 'text'} model from catalog: {model_id} (RAG content: {has_rag_content})")
+                return model_id
+    except Exception as catalog_error:
+        logger.error(f"Error selecting model from catalog: {catalog_error}")
+    
+    try:
+        # Then try to get models directly from the database by capability
         from app import app
         from models import OpenRouterModel
         
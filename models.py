@@ -8,6 +8,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 import enum
 from sqlalchemy import Text
+from history_window import message_token_count_default
 
 class PaymentStatus(enum.Enum):
     """Payment status for transactions"""
@@ -127,6 +128,9 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     is_active = db.Column(db.Boolean, default=True, index=True)
+    history_summary = db.Column(db.Text, nullable=True)  # Rolling summary of turns older than the recent window
+    summary_message_id = db.Column(db.Integer, nullable=True)  # Newest message covered by history_summary
+    summary_token_count = db.Column(db.Integer, nullable=True)  # tiktoken count of history_summary
     
     # Relationships
     messages = db.relationship('Message', backref='conversation', lazy='dynamic', cascade='all, delete-orphan')
@@ -146,6 +150,8 @@ class Message(db.Model):
     model_id_used = db.Column(db.String(64), nullable=True)  # Exact model ID returned by the API
     prompt_tokens = db.Column(db.Integer, nullable=True)  # Number of prompt tokens used
     completion_tokens = db.Column(db.Integer, nullable=True)  # Number of completion tokens used
+    token_count = db.Column(db.Integer, nullable=True, default=message_token_count_default)  # tiktoken count of content, set at insert
+    is_truncated = db.Column(db.Boolean, nullable=False, default=False)  # Reply cut short because the client disconnected
     image_url = db.Column(db.String(512), nullable=True)  # URL to an image for multimodal messages
     pdf_url = db.Column(db.Text, nullable=True)  # URL or data URL for PDF document (can be large)
     pdf_filename = db.Column(db.String(255), nullable=True)  # Name of the PDF file
@@ -261,6 +267,7 @@ class Usage(db.Model):
     usage_type = db.Column(db.String(20), nullable=False)  # Type of usage (e.g., "chat", "embedding")
     prompt_tokens = db.Column(db.Integer, nullable=True)  # Number of prompt tokens
     completion_tokens = db.Column(db.Integer, nullable=True)  # Number of completion tokens
+    reconciled = db.Column(db.Boolean, nullable=False, default=True)  # False until applied to User.credits (see credit_ledger.py)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
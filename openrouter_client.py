@@ -0,0 +1,226 @@
+"""
+OpenRouter HTTP Client Module
+
+This module provides one shared, pooled keep-alive HTTP client per worker
+process for all OpenRouter traffic: chat streaming, title generation, the
+memory system's LLM calls and the price updater. Reusing connections avoids a
+fresh TCP + TLS handshake before the first token of every chat turn.
+
+Two transports are exposed because the codebase uses both:
+- get_openrouter_session(): a requests.Session for direct HTTP calls
+- get_openrouter_http_client(): an httpx.Client for the OpenAI SDK client
+
+Both record connection-reuse and handshake-time statistics, available through
+get_connection_stats().
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_BASE_URL = 'https://openrouter.ai/api/v1'
+
+# Pool sizing - each gevent worker can have many concurrent streams
+POOL_MAXSIZE = int(os.environ.get('OPENROUTER_POOL_MAXSIZE', '50'))
+KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENROUTER_KEEPALIVE_CONNECTIONS', '20'))
+KEEPALIVE_EXPIRY = float(os.environ.get('OPENROUTER_KEEPALIVE_EXPIRY', '60'))
+
+
+class _ConnectionStats:
+    """Thread-safe counters for requests, new connections and handshake time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections_opened = 0
+            self.handshake_seconds_total = 0.0
+            self.handshake_seconds_max = 0.0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_handshake(self, seconds: float):
+        with self._lock:
+            self.connections_opened += 1
+            self.handshake_seconds_total += seconds
+            if seconds > self.handshake_seconds_max:
+                self.handshake_seconds_max = seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'connections_reused': reused,
+                'reuse_ratio': (reused / self.requests) if self.requests else 0.0,
+                'handshake_seconds_total': self.handshake_seconds_total,
+                'handshake_seconds_avg': (self.handshake_seconds_total / self.connections_opened)
+                                         if self.connections_opened else 0.0,
+                'handshake_seconds_max': self.handshake_seconds_max,
+            }
+
+
+_stats = {
+    'requests': _ConnectionStats(),
+    'httpx': _ConnectionStats(),
+}
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that records how long TCP connect + TLS handshake take"""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _stats['requests'].record_handshake(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose HTTPS pools use timed connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': HTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def _count_response(response, *args, **kwargs):
+    """requests response hook: count every request sent through the session"""
+    _stats['requests'].record_request()
+    return response
+
+
+# Per-process transports. gunicorn preloads the app before forking, so the
+# owning PID is tracked and the pools are rebuilt in each child instead of
+# sharing sockets inherited from the master.
+_session = None
+_session_pid = None
+_http_client = None
+_http_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_openrouter_session() -> requests.Session:
+    """
+    Get the shared keep-alive requests session for OpenRouter
+
+    Returns:
+        requests.Session: Session backed by a bounded connection pool
+    """
+    global _session, _session_pid
+
+    session = _session
+    if session is not None and _session_pid == os.getpid():
+        return session
+
+    with _client_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = _PooledAdapter(
+                pool_connections=4,
+                pool_maxsize=POOL_MAXSIZE,
+                max_retries=0,
+                pool_block=False
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.hooks['response'].append(_count_response)
+
+            _session = session
+            _session_pid = os.getpid()
+            logger.info(f"Created pooled OpenRouter session (pid {_session_pid}, pool size {POOL_MAXSIZE})")
+
+        return _session
+
+
+def _httpx_trace(event_name: str, info: Dict[str, Any]):
+    """httpcore trace callback: time TCP connect + TLS handshake for new connections"""
+    if event_name == 'connection.connect_tcp.started':
+        _httpx_trace.local.start = time.perf_counter()
+    elif event_name == 'connection.start_tls.complete':
+        start = getattr(_httpx_trace.local, 'start', None)
+        if start is not None:
+            _stats['httpx'].record_handshake(time.perf_counter() - start)
+            _httpx_trace.local.start = None
+
+
+_httpx_trace.local = threading.local()
+
+
+def _httpx_on_request(request):
+    """httpx request hook: count requests and attach the connection trace"""
+    _stats['httpx'].record_request()
+    request.extensions['trace'] = _httpx_trace
+
+
+def get_openrouter_http_client():
+    """
+    Get the shared keep-alive httpx client for OpenAI SDK clients that talk to OpenRouter
+
+    Returns:
+        httpx.Client or None if httpx is not installed
+    """
+    global _http_client, _http_client_pid
+
+    client = _http_client
+    if client is not None and _http_client_pid == os.getpid():
+        return client
+
+    try:
+        import httpx
+    except ImportError:
+        logger.warning("httpx not installed, OpenAI clients will use their own connection pool")
+        return None
+
+    with _client_lock:
+        if _http_client is None or _http_client_pid != os.getpid():
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=POOL_MAXSIZE,
+                    max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                event_hooks={'request': [_httpx_on_request]}
+            )
+            _http_client_pid = os.getpid()
+            logger.info(f"Created pooled OpenRouter httpx client (pid {_http_client_pid})")
+
+        return _http_client
+
+
+def get_connection_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get connection-reuse and handshake-time statistics for this process
+
+    Returns:
+        dict: Stats keyed by transport ('requests', 'httpx')
+    """
+    return {name: stats.snapshot() for name, stats in _stats.items()}
+
+
+def reset_connection_stats():
+    """Reset all connection statistics (mainly for tests)"""
+    for stats in _stats.values():
+        stats.reset()
@@ -240,6 +240,213 @@ def _populate_redis_pricing_cache():
     except Exception as e:
         logger.error(f"Error populating Redis pricing cache: {e}")
 
+# Columns the price updater owns; elo_score and created_at are never overwritten
+_SYNCED_COLUMNS = (
+    'name',
+    'description',
+    'context_length',
+    'input_price_usd_million',
+    'output_price_usd_million',
+    'is_multimodal',
+    'supports_pdf',
+    'cost_band',
+    'is_free',
+    'supports_reasoning',
+    'model_is_active',
+)
+
+def build_model_row(model_id: str, model_data: dict, api_model: dict) -> dict:
+    """
+    Build the OpenRouterModel column values for one model from the API response
+    
+    Args:
+        model_id: OpenRouter model ID
+        model_data: Processed price entry for the model (see fetch_and_store_openrouter_prices)
+        api_model: The model's raw entry in the API response
+        
+    Returns:
+        dict: Column values for _SYNCED_COLUMNS plus model_id
+    """
+    context_length = model_data['context_length']
+    if not isinstance(context_length, int):
+        try:
+            context_length = int(context_length)
+        except (ValueError, TypeError):
+            context_length = None
+    
+    # Check for free models based on price or special tags
+    is_free = model_data['input_price'] < 0.01 or ':free' in model_id.lower()
+    
+    # Use accurate reasoning support from OpenRouter API supported_parameters
+    supported_parameters = api_model.get('supported_parameters') or []
+    supports_reasoning = 'reasoning' in supported_parameters or 'include_reasoning' in supported_parameters
+    
+    cost_band = model_data['cost_band']
+    if not cost_band or cost_band.strip() == '':
+        # Ensure every model has a cost band - this prevents models from being filtered out
+        input_price = model_data['input_price']
+        if is_free or input_price == 0:
+            cost_band = "Free"
+        elif input_price < 1.0:
+            cost_band = "$"
+        elif input_price < 5.0:
+            cost_band = "$$"
+        else:
+            cost_band = "$$$"
+    
+    return {
+        'model_id': model_id,
+        'name': model_data['model_name'],
+        'description': api_model.get('description', ''),
+        'context_length': context_length,
+        'input_price_usd_million': model_data['input_price'],
+        'output_price_usd_million': model_data['output_price'],
+        'is_multimodal': model_data['is_multimodal'],
+        'supports_pdf': model_data['supports_pdf'],
+        'cost_band': cost_band,
+        'is_free': is_free,
+        'supports_reasoning': supports_reasoning,
+        'model_is_active': True,
+    }
+
+def diff_model_rows(desired: dict, current: dict) -> tuple:
+    """
+    Compare the rows built from the API response with the stored rows
+    
+    Args:
+        desired: model_id -> row from build_model_row
+        current: model_id -> stored values of _SYNCED_COLUMNS
+        
+    Returns:
+        tuple: (rows to insert or update, IDs of unchanged rows, IDs of active rows missing from the API)
+    """
+    changed = []
+    unchanged = []
+    for model_id, row in desired.items():
+        stored = current.get(model_id)
+        if stored is not None and all(stored.get(column) == row[column] for column in _SYNCED_COLUMNS):
+            unchanged.append(model_id)
+        else:
+            changed.append(row)
+    
+    missing = [model_id for model_id, stored in current.items()
+               if model_id not in desired and stored.get('model_is_active')]
+    return changed, unchanged, missing
+
+def classify_model_changes(changed: list, current: dict, missing: list) -> dict:
+    """
+    Describe a diff_model_rows result for the catalog change log
+    
+    Args:
+        changed: Rows that were inserted or updated
+        current: model_id -> stored values before the write
+        missing: IDs of models that were deactivated
+        
+    Returns:
+        dict: model_id -> 'added', 'removed', 'repriced' or 'updated'
+    """
+    from catalog_changelog import ADDED, REMOVED, REPRICED, UPDATED
+    
+    changes = {model_id: REMOVED for model_id in missing}
+    for row in changed:
+        stored = current.get(row['model_id'])
+        if stored is None or not stored.get('model_is_active'):
+            changes[row['model_id']] = ADDED
+        elif (stored.get('input_price_usd_million') != row['input_price_usd_million'] or
+              stored.get('output_price_usd_million') != row['output_price_usd_million']):
+            changes[row['model_id']] = REPRICED
+        else:
+            changes[row['model_id']] = UPDATED
+    return changes
+
+def _upsert_statement(table, rows: list):
+    """Build a single INSERT ... ON CONFLICT DO UPDATE for the rows, or None if the dialect lacks it"""
+    from database import db
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.model_id],
+        set_={column: stmt.excluded[column] for column in _SYNCED_COLUMNS + ('last_fetched_at', 'updated_at')}
+    )
+
+def store_model_rows(prices: dict, api_models: dict) -> tuple:
+    """
+    Write the fetched models to the database, touching only rows that changed.
+    Must run inside an application context; commits the session.
+    
+    Changed and new models are written with one INSERT ... ON CONFLICT DO UPDATE,
+    unchanged models only get their last_fetched_at bumped, and active models no
+    longer returned by the API are deactivated.
+    
+    Args:
+        prices: model_id -> processed price entry
+        api_models: model_id -> raw API entry
+        
+    Returns:
+        tuple: (new models, updated models, deactivated models)
+    """
+    from sqlalchemy import select, update
+    from database import db
+    from models import OpenRouterModel
+    
+    table = OpenRouterModel.__table__
+    columns = [table.c.model_id] + [table.c[column] for column in _SYNCED_COLUMNS]
+    current = {row.model_id: dict(row._mapping) for row in db.session.execute(select(*columns))}
+    
+    desired = {
+        model_id: build_model_row(model_id, model_data, api_models.get(model_id, {}))
+        for model_id, model_data in prices.items()
+    }
+    changed, unchanged, missing = diff_model_rows(desired, current)
+    new_count = sum(1 for row in changed if row['model_id'] not in current)
+    now = datetime.utcnow()
+    
+    if changed:
+        rows = [dict(row, elo_score=None, created_at=now, updated_at=now, last_fetched_at=now) for row in changed]
+        stmt = _upsert_statement(table, rows)
+        if stmt is not None:
+            db.session.execute(stmt)
+        else:
+            for row in rows:
+                existing = db.session.get(OpenRouterModel, row['model_id'])
+                if existing is None:
+                    db.session.add(OpenRouterModel(**row))
+                else:
+                    for column in _SYNCED_COLUMNS + ('last_fetched_at', 'updated_at'):
+                        setattr(existing, column, row[column])
+    
+    if unchanged:
+        # Record the fetch without bumping updated_at (should_update_prices reads last_fetched_at)
+        db.session.execute(
+            update(table)
+            .where(table.c.model_id.in_(unchanged))
+            .values(last_fetched_at=now, updated_at=table.c.updated_at)
+        )
+    
+    if missing:
+        db.session.execute(
+            update(table)
+            .where(table.c.model_id.in_(missing))
+            .values(model_is_active=False, updated_at=now)
+        )
+    
+    db.session.commit()
+    
+    # Tell clients holding an older catalog which models changed, and every
+    # worker that its catalog is stale
+    from catalog_changelog import publish_catalog_changes
+    publish_catalog_changes(classify_model_changes(changed, current, missing))
+    
+    return new_count, len(changed) - new_count, len(missing)
+
 def fetch_and_store_openrouter_prices(force_update=False) -> bool:
     """
     Fetch current model prices from OpenRouter API and store them in the database.
@@ -266,7 +473,6 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
     # and ensure we have access to the app object
     try:
         from database import db
-        from models import OpenRouterModel
         # Import app only if we need the context, otherwise work without it
         app = None
         try:
@@ -357,7 +563,8 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
         logger.debug(f"API Request URL: {request_url} with params: {params}")
         logger.debug(f"Using API key: {masked_key}")
         
-        response = requests.get(
+        from openrouter_client import get_openrouter_session
+        response = get_openrouter_session().get(
             request_url,
             headers=headers,
             params=params,
@@ -376,6 +583,9 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
         # Log response data with more details
         models = models_data.get('data', [])
         data_count = len(models)
+        
+        # Index the payload once - lookups by ID below are O(1)
+        api_models = {m.get('id'): m for m in models if m.get('id')}
         logger.info(f"Received data for {data_count} models from OpenRouter API")
         
         # Log details of the first few and last few models to understand what we're getting
@@ -392,7 +602,7 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
                 
             # Check if our target model exists in the data
             target_model_id = "nousresearch/deephermes-3-mistral-24b-preview:free"
-            target_model = next((m for m in models if m.get('id') == target_model_id), None)
+            target_model = api_models.get(target_model_id)
             if target_model:
                 logger.info(f"Target model '{target_model_id}' found in API response")
             else:
@@ -516,153 +726,14 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
             
             # Use a single application context for all database operations
             with flask_app.app_context():
-                updated_count = 0
-                new_count = 0
-                
-                # First, mark all models as inactive - we'll re-activate the ones we find in the API response
-                try:
-                    # Mark all existing models as inactive before updating
-                    OpenRouterModel.query.update({OpenRouterModel.model_is_active: False})
-                    logger.info("Marked all existing models as inactive")
-                except Exception as e:
-                    logger.error(f"Error marking models as inactive: {e}")
-                
-                # Use a single database session for all operations
-                for model_id, model_data in prices.items():
-                    try:
-                        # Try to get existing model from the database
-                        db_model = OpenRouterModel.query.get(model_id)
-                        
-                        if db_model:
-                            # Update existing model - preserve existing prices if new ones aren't valid
-                            db_model.name = model_data['model_name']
-                            
-                            # Find the original model object to get description
-                            original_model = next((m for m in models_data.get('data', []) if m.get('id') == model_id), {})
-                            db_model.description = original_model.get('description', '')
-                            
-                            # Update pricing and other details - only update if we have valid new pricing
-                            db_model.context_length = model_data['context_length'] if isinstance(model_data['context_length'], int) else None
-                            
-                            # Only update prices if the new data is valid (not just preserving existing)
-                            new_input_price = model_data['input_price']
-                            new_output_price = model_data['output_price']
-                            
-                            # Update pricing if we have valid new data
-                            if new_input_price is not None and new_output_price is not None:
-                                db_model.input_price_usd_million = new_input_price
-                                db_model.output_price_usd_million = new_output_price
-                            # Otherwise, keep existing prices unchanged
-                            db_model.is_multimodal = model_data['is_multimodal']
-                            db_model.supports_pdf = model_data['supports_pdf']
-                            db_model.cost_band = model_data['cost_band']
-                            
-                            # Update additional fields
-                            # Check for free models based on price or special tags
-                            db_model.is_free = model_data['input_price'] < 0.01 or ':free' in model_id.lower()
-                            
-                            # ELO scores are now managed manually via admin interface
-                            # Don't overwrite existing manually-set ELO scores
-                            
-                            # Use accurate reasoning support from OpenRouter API supported_parameters
-                            original_model = next((m for m in models_data.get('data', []) if m.get('id') == model_id), {})
-                            supported_parameters = original_model.get('supported_parameters', [])
-                            db_model.supports_reasoning = 'reasoning' in supported_parameters or 'include_reasoning' in supported_parameters
-                            
-                            # Since we found this model in the API response, mark it as active
-                            db_model.model_is_active = True
-                            
-                            # Update timestamps
-                            db_model.last_fetched_at = datetime.utcnow()
-                            db_model.updated_at = datetime.utcnow()
-                            updated_count += 1
-                            
-                            # Log updates for specific models we're tracking
-                            if model_id in ["nousresearch/deephermes-3-mistral-24b-preview:free"]:
-                                logger.info(f"Updated tracked model in database: {model_id}, PDF support: {db_model.supports_pdf}")
-                            # Also log some updates for verification
-                            elif updated_count <= 3 or updated_count % 50 == 0:
-                                logger.info(f"Updated model in database: {model_id}, PDF support: {db_model.supports_pdf}")
-                        else:
-                            # Create new model
-                            original_model = next((m for m in models_data.get('data', []) if m.get('id') == model_id), {})
-                            context_length = model_data['context_length']
-                            if not isinstance(context_length, int):
-                                try:
-                                    context_length = int(context_length)
-                                except (ValueError, TypeError):
-                                    context_length = None
-                            
-                            # Check for free models based on price or special tags
-                            is_free = model_data['input_price'] < 0.01 or ':free' in model_id.lower()
-                            
-                            # Use accurate reasoning support from OpenRouter API supported_parameters
-                            original_model = next((m for m in models_data.get('data', []) if m.get('id') == model_id), {})
-                            supported_parameters = original_model.get('supported_parameters', [])
-                            supports_reasoning = 'reasoning' in supported_parameters or 'include_reasoning' in supported_parameters
-                            
-                            # Ensure cost band is properly set - this prevents models from being filtered out
-                            cost_band = model_data['cost_band']
-                            if not cost_band or cost_band.strip() == '':
-                                # Auto-generate cost band based on pricing
-                                input_price = model_data['input_price']
-                                if is_free or input_price == 0:
-                                    cost_band = "Free"
-                                elif input_price < 1.0:
-                                    cost_band = "$"
-                                elif input_price < 5.0:
-                                    cost_band = "$$"
-                                else:
-                                    cost_band = "$$$"
-                                logger.info(f"Auto-generated cost band '{cost_band}' for new model {model_id}")
-                            
-                            # Create a new model instance
-                            new_model = OpenRouterModel()
-                            new_model.model_id = model_id
-                            new_model.name = model_data['model_name']
-                            new_model.description = original_model.get('description', '')
-                            new_model.context_length = context_length
-                            new_model.input_price_usd_million = model_data['input_price']
-                            new_model.output_price_usd_million = model_data['output_price']
-                            new_model.is_multimodal = model_data['is_multimodal']
-                            new_model.supports_pdf = model_data['supports_pdf']
-                            new_model.is_free = is_free
-                            new_model.supports_reasoning = supports_reasoning
-                            new_model.cost_band = cost_band
-                            
-                            # ELO scores are managed manually via admin interface for new models
-                            new_model.elo_score = None
-                            
-                            new_model.model_is_active = True
-                            new_model.created_at = datetime.utcnow()
-                            new_model.updated_at = datetime.utcnow()
-                            new_model.last_fetched_at = datetime.utcnow()
-                            db.session.add(new_model)
-                            new_count += 1
-                            
-                            # Log newly created models for specific models we're tracking
-                            if model_id in ["nousresearch/deephermes-3-mistral-24b-preview:free"]:
-                                logger.info(f"Created new database entry for tracked model: {model_id}")
-                            # Also log some new models for verification
-                            elif new_count <= 3 or new_count % 50 == 0:
-                                logger.info(f"Created new database entry for model: {model_id}")
-                            
-                    except Exception as model_error:
-                        logger.error(f"Error updating model {model_id} in database: {model_error}")
-                        # Rollback the current transaction to avoid InFailedSqlTransaction errors
-                        db.session.rollback()
-                        continue
-                
                 try:
-                    # Commit all changes in one transaction
-                    db.session.commit()
-                    logger.info(f"Database updated: {updated_count} models updated, {new_count} new models added")
+                    new_count, updated_count, deactivated_count = store_model_rows(prices, api_models)
+                    logger.info(f"Database updated: {updated_count} models updated, {new_count} new models added, "
+                                f"{deactivated_count} models deactivated, {len(prices) - new_count - updated_count} unchanged")
                 except SQLAlchemyError as commit_error:
-                    # If commit fails, rollback and log the error
+                    # If the write fails, rollback and log the error
                     db.session.rollback()
                     logger.error(f"Failed to commit database changes: {commit_error}")
-                    # The transaction failed but we don't want to report a complete failure
-                    # as we might have had some successful model updates
             
         except ImportError as e:
             logger.error(f"Failed to import database modules: {e}")
@@ -694,7 +765,14 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
         except Exception as redis_error:
             logger.warning(f"Failed to update Redis cache after database update: {redis_error}")
             # Don't fail the entire operation if Redis is unavailable
-        
+
+        # Swap in a fresh in-process model catalog so the chat path sees the new rows
+        try:
+            from model_catalog import refresh_model_catalog
+            refresh_model_catalog()
+        except Exception as catalog_error:
+            logger.warning(f"Failed to refresh model catalog after database update: {catalog_error}")
+
         # Log successful completion
         elapsed_time = time.time() - start_time
         logger.info(f"✅ Successfully processed {len(prices)} models in {elapsed_time:.2f} seconds")
@@ -728,10 +806,41 @@ def fetch_and_store_openrouter_prices(force_update=False) -> bool:
             except Exception as e:
                 logger.error(f"❌ Error releasing Redis lock: {e}")
 
+# Minimum seconds between background price refreshes triggered by unknown models
+MISSING_PRICE_REFRESH_INTERVAL = int(os.environ.get('MISSING_PRICE_REFRESH_INTERVAL', '600'))
+
+_missing_price_refresh_lock = threading.Lock()
+_missing_price_refresh_at = 0.0
+
+def _queue_missing_price_refresh(model_id: str):
+    """
+    Refresh prices in a background thread because a model wasn't in the catalog.
+    At most one refresh per MISSING_PRICE_REFRESH_INTERVAL; the billing path never waits for it.
+    """
+    global _missing_price_refresh_at
+
+    with _missing_price_refresh_lock:
+        if time.time() - _missing_price_refresh_at < MISSING_PRICE_REFRESH_INTERVAL:
+            return
+        _missing_price_refresh_at = time.time()
+
+    logger.info(f"Model {model_id} has no stored price, queueing a background price refresh")
+
+    def _run():
+        try:
+            fetch_and_store_openrouter_prices(force_update=True)
+        except Exception as e:
+            logger.error(f"Background price refresh for {model_id} failed: {e}")
+
+    threading.Thread(target=_run, name='missing-price-refresh', daemon=True).start()
+
 def get_model_cost(model_id: str) -> dict:
     """
     Get the cost per million tokens and cost band for a specific model.
-    This function now primarily uses the database but falls back to cache and then to defaults.
+    Prices come from the in-process model catalog (see model_catalog.py), which is
+    rebuilt after each price update and reloaded by other workers after
+    MODEL_CATALOG_MAX_AGE. Unknown models get estimated prices while a background
+    refresh is queued - this never queries the database or OpenRouter inline.
     
     Args:
         model_id (str): The ID of the model
@@ -739,43 +848,22 @@ def get_model_cost(model_id: str) -> dict:
     Returns:
         dict: Dictionary containing prompt_cost_per_million, completion_cost_per_million, and cost_band
     """
+    from metrics import registry
+
     try:
-        # Import directly to avoid application context issues
-        from app import app, db
-        from models import OpenRouterModel
-        
-        # Use a proper app context for all database operations
-        with app.app_context():
-            # Get model from database
-            db_model = OpenRouterModel.query.filter_by(model_id=model_id).first()
-                
-            if db_model:
-                return {
-                    'prompt_cost_per_million': db_model.input_price_usd_million,
-                    'completion_cost_per_million': db_model.output_price_usd_million,
-                    'cost_band': db_model.cost_band or '',
-                    'source': 'database'  # For debugging
-                }
-            
-            # If model not found, try to update prices from API
-            logger.info(f"Model {model_id} not found in database, attempting to refresh prices")
-            
-            # Attempt to update the database with fresh data from the API
-            # We're already in an app context, so this should work properly
-            if fetch_and_store_openrouter_prices(force_update=True):
-                # Try database lookup again after the fresh fetch
-                db_model = OpenRouterModel.query.filter_by(model_id=model_id).first()
-                    
-                if db_model:
-                    return {
-                        'prompt_cost_per_million': db_model.input_price_usd_million,
-                        'completion_cost_per_million': db_model.output_price_usd_million,
-                        'cost_band': db_model.cost_band or '',
-                        'source': 'database_refresh'  # For debugging
-                    }
-    except Exception as db_error:
-        logger.warning(f"Failed to get model cost from database: {db_error}")
-    
+        from model_catalog import get_model_catalog
+
+        catalog = get_model_catalog()
+        pricing = catalog.pricing(model_id) if catalog else None
+        if pricing and pricing['prompt_cost_per_million'] is not None and pricing['completion_cost_per_million'] is not None:
+            registry.inc('model_cost_lookups_total', help='Model price lookups by source', source='catalog')
+            return pricing
+    except Exception as catalog_error:
+        logger.warning(f"Failed to get model cost from catalog: {catalog_error}")
+
+    _queue_missing_price_refresh(model_id)
+    registry.inc('model_cost_lookups_total', help='Model price lookups by source', source='fallback')
+
     # If we still don't have data, use fallback logic
     # Approximate fallback costs based on model name
     model_name = model_id.lower()
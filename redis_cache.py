@@ -9,11 +9,12 @@ Enhanced version of the Redis cache module with:
 """
 
 import os
-import json
 import time
 import logging
 import functools
-from typing import Any, Dict, Optional, Union, Callable, TypeVar
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union, Callable, TypeVar
 from urllib.parse import urlparse
 
 # Configure logging
@@ -22,6 +23,9 @@ logger = logging.getLogger(__name__)
 
 # Import Redis configuration
 from redis_config import get_redis_connection_params, initialize_redis_client
+from cache_codec import CodecError, decode_value, encode_value
+from invalidation_bus import ensure_listener, publish, subscribe
+from metrics import registry
 
 try:
     import redis
@@ -33,6 +37,130 @@ except ImportError:
 # Type variable for better type hinting
 T = TypeVar('T')
 
+# In-process near cache (L1) defaults for RedisCache instances created with local_cache=True.
+# Other workers drop their copy through invalidation_bus when a key is written;
+# the TTL bounds staleness when an event is missed or a key expires in Redis.
+LOCAL_CACHE_TTL = float(os.environ.get('REDIS_LOCAL_CACHE_TTL', '30'))
+LOCAL_CACHE_MAX_ENTRIES = int(os.environ.get('REDIS_LOCAL_CACHE_MAX_ENTRIES', '1024'))
+
+# invalidation_bus topic for near cache coherence
+LOCAL_CACHE_TOPIC = 'redis_cache_l1'
+
+_MISSING = object()
+
+
+class NearCache:
+    """
+    Bounded LRU with per-entry TTL holding deserialized values for one namespace.
+
+    Values are shared between callers, so caches that opt in must hold data
+    callers treat as read-only.
+    """
+
+    __slots__ = ('namespace', 'ttl', 'max_entries', '_entries', '_lock',
+                 'hits', 'l2_hits', 'misses')
+
+    def __init__(self, namespace: str, ttl: float = LOCAL_CACHE_TTL,
+                 max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Get a live value, or _MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def hit_ratio(self) -> float:
+        """Share of lookups answered from memory"""
+        total = self.hits + self.l2_hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# Near caches in this process by namespace (several instances may share one)
+_near_caches: Dict[str, List[NearCache]] = {}
+_near_caches_lock = threading.Lock()
+
+
+def _drop_local_entries(event: Dict[str, Any]):
+    """Drop the event's keys (or everything on flush) from this process's near caches"""
+    with _near_caches_lock:
+        caches = list(_near_caches.get(event.get('namespace'), ()))
+    for cache in caches:
+        if event.get('flush'):
+            cache.clear()
+        else:
+            for key in event.get('keys') or ():
+                cache.discard(key)
+
+
+def _on_local_cache_invalidated(event: Dict[str, Any]):
+    """invalidation_bus handler: drop keys another worker wrote"""
+    if event.get('origin') != os.getpid():
+        _drop_local_entries(event)
+
+
+def _near_cache_collector():
+    """Export per-namespace near cache lookups, hit ratio and size"""
+    with _near_caches_lock:
+        caches = [cache for group in _near_caches.values() for cache in group]
+    totals: Dict[str, List[int]] = {}
+    for cache in caches:
+        counts = totals.setdefault(cache.namespace, [0, 0, 0, 0])
+        counts[0] += cache.hits
+        counts[1] += cache.l2_hits
+        counts[2] += cache.misses
+        counts[3] += len(cache)
+    for namespace, (hits, l2_hits, misses, size) in totals.items():
+        for tier, value in (('l1', hits), ('l2', l2_hits), ('miss', misses)):
+            yield ('redis_cache_lookups_total', 'counter', 'RedisCache lookups by the tier that answered',
+                   {'namespace': namespace, 'tier': tier}, value)
+        lookups = hits + l2_hits + misses
+        yield ('redis_cache_l1_hit_ratio', 'gauge', 'Share of RedisCache lookups answered in process',
+               {'namespace': namespace}, hits / lookups if lookups else 0.0)
+        yield ('redis_cache_l1_entries', 'gauge', 'Entries held in the in-process near cache',
+               {'namespace': namespace}, size)
+
+
+subscribe(LOCAL_CACHE_TOPIC, _on_local_cache_invalidated)
+registry.register_collector(_near_cache_collector)
+
 def handle_redis_error(default_return_value):
     """
     Decorator for handling Redis errors
@@ -63,19 +191,33 @@ class RedisCache:
     - Safe serialization/deserialization
     - Consistent timeouts
     - Automatic key namespacing
+    - Optional in-process near cache (L1) for hot, read-mostly values
     """
     
-    def __init__(self, namespace: str = '', expire_time: int = 3600):
+    def __init__(self, namespace: str = '', expire_time: int = 3600,
+                 local_cache: bool = False, local_ttl: float = LOCAL_CACHE_TTL,
+                 local_max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
         """
         Initialize Redis cache
         
         Args:
             namespace: Key namespace for this cache instance
             expire_time: Default expiration time in seconds
+            local_cache: Keep hot values in process memory in front of Redis.
+                Only for values callers never mutate and that tolerate
+                local_ttl seconds of staleness if an invalidation is missed.
+            local_ttl: Longest time a value is served from memory
+            local_max_entries: Near cache size bound (LRU eviction)
         """
         self.namespace = namespace
         self.expire_time = expire_time
         self.redis_client = None
+        self.local = None
+        
+        if local_cache:
+            self.local = NearCache(namespace, ttl=local_ttl, max_entries=local_max_entries)
+            with _near_caches_lock:
+                _near_caches.setdefault(namespace, []).append(self.local)
         
         # Initialize Redis client safely
         if REDIS_AVAILABLE:
@@ -86,9 +228,10 @@ class RedisCache:
                 # Pass the namespace as a parameter to initialize_redis_client
                 # This is the key fix to avoid the namespace parameter conflict
                 logger.info(f"Initializing Redis client for namespace '{namespace}'")
+                # Values are binary (cache_codec), so responses stay bytes
                 self.redis_client = initialize_redis_client(
                     namespace=namespace,
-                    decode_responses=True,
+                    decode_responses=False,
                     max_retries=3,
                     retry_delay=0.5
                 )
@@ -117,7 +260,21 @@ class RedisCache:
             return f"{self.namespace}:{key}"
         return key
     
-    def _serialize(self, value: Any) -> str:
+    def _invalidate_local(self, keys: Optional[List[str]] = None):
+        """Drop keys (or everything) from the near cache here and in every other worker"""
+        if self.local is None:
+            return
+        event = {'namespace': self.namespace}
+        if keys is None:
+            event['flush'] = True
+        else:
+            event['keys'] = keys
+        # Every instance in this process sharing the namespace drops the keys now;
+        # the listener ignores our own event and other workers drop theirs on receipt
+        _drop_local_entries(event)
+        publish(LOCAL_CACHE_TOPIC, **event)
+    
+    def _serialize(self, value: Any) -> bytes:
         """
         Serialize a value for Redis storage
         
@@ -125,13 +282,12 @@ class RedisCache:
             value: The value to serialize
             
         Returns:
-            str: Serialized value
+            bytes: Encoded value (see cache_codec)
+            
+        Raises:
+            TypeError: If the value can't be encoded; it is not cached then
         """
-        try:
-            return json.dumps(value)
-        except (TypeError, ValueError):
-            # Fallback to string representation if JSON serialization fails
-            return str(value)
+        return encode_value(value)
     
     def _deserialize(self, value: Optional[bytes]) -> Any:
         """
@@ -143,36 +299,12 @@ class RedisCache:
         Returns:
             Any: Deserialized value or None
         """
-        if value is None:
+        try:
+            return decode_value(value)
+        except CodecError as e:
+            # Written by a worker with a codec this one lacks; treat as a miss
+            logger.warning(f"Cannot decode cached value in '{self.namespace}': {e}")
             return None
-        
-        # Handle bytes data (most common from Redis)
-        if isinstance(value, bytes):
-            try:
-                # Try to decode bytes to UTF-8 string
-                str_value = value.decode('utf-8')
-                
-                # Now try to parse as JSON
-                try:
-                    return json.loads(str_value)
-                except json.JSONDecodeError:
-                    # Not valid JSON, return as string
-                    return str_value
-            except UnicodeDecodeError:
-                # Binary data that can't be decoded as UTF-8
-                return value
-        
-        # Handle string data (already decoded)
-        elif isinstance(value, str):
-            try:
-                # Try to parse as JSON 
-                return json.loads(value)
-            except json.JSONDecodeError:
-                # Not valid JSON, return as is
-                return value
-        
-        # Any other type, return as is
-        return value
     
     @handle_redis_error(False)
     def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
@@ -196,7 +328,12 @@ class RedisCache:
         # Use provided expiration or default
         expiration = expire if expire is not None else self.expire_time
         
-        return self.redis_client.set(full_key, serialized, ex=expiration)
+        result = self.redis_client.set(full_key, serialized, ex=expiration)
+        if self.local is not None:
+            self._invalidate_local([key])
+            # Keep what a Redis read would return, not the caller's (mutable) object
+            self.local.put(key, self._deserialize(serialized), expiration)
+        return result
     
     @handle_redis_error(None)
     def get(self, key: str) -> Any:
@@ -209,13 +346,25 @@ class RedisCache:
         Returns:
             Any: The cached value or None if not found
         """
+        if self.local is not None:
+            ensure_listener()
+            value = self.local.get(key)
+            if value is not _MISSING:
+                return value
+        
         if self.redis_client is None:
             return None
             
         full_key = self._get_full_key(key)
-        value = self.redis_client.get(full_key)
+        value = self._deserialize(self.redis_client.get(full_key))
         
-        return self._deserialize(value)
+        if self.local is not None:
+            if value is None:
+                self.local.misses += 1
+            else:
+                self.local.l2_hits += 1
+                self.local.put(key, value)
+        return value
     
     @handle_redis_error(False)
     def exists(self, key: str) -> bool:
@@ -249,7 +398,9 @@ class RedisCache:
             return 0
             
         full_key = self._get_full_key(key)
-        return self.redis_client.delete(full_key)
+        deleted = self.redis_client.delete(full_key)
+        self._invalidate_local([key])
+        return deleted
     
     @handle_redis_error(0)
     def incr(self, key: str, amount: int = 1) -> int:
@@ -267,7 +418,9 @@ class RedisCache:
             return 0
             
         full_key = self._get_full_key(key)
-        return self.redis_client.incr(full_key, amount)
+        value = self.redis_client.incr(full_key, amount)
+        self._invalidate_local([key])
+        return value
     
     @handle_redis_error(False)
     def expire(self, key: str, time_seconds: int) -> bool:
@@ -285,7 +438,9 @@ class RedisCache:
             return False
             
         full_key = self._get_full_key(key)
-        return bool(self.redis_client.expire(full_key, time_seconds))
+        updated = bool(self.redis_client.expire(full_key, time_seconds))
+        self._invalidate_local([key])
+        return updated
     
     @handle_redis_error(None)
     def ttl(self, key: str) -> Optional[int]:
@@ -315,6 +470,8 @@ class RedisCache:
         if self.redis_client is None:
             return False
             
+        self._invalidate_local()
+        
         # If namespace is set, only clear keys in that namespace
         if self.namespace:
             pattern = f"{self.namespace}:*"
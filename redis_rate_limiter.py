@@ -6,8 +6,11 @@ It allows for flexible rate limits based on user authentication status,
 request path, and client IP address.
 """
 
+import math
 import time
 import logging
+import threading
+from collections import OrderedDict
 from functools import wraps
 from typing import Dict, Optional, List, Union, Callable, Any
 import ipaddress
@@ -15,7 +18,8 @@ import ipaddress
 from flask import Flask, request, jsonify, g
 from werkzeug.local import LocalProxy
 
-from redis_cache import RedisCache, get_redis_connection, handle_redis_error
+from redis_cache import RedisCache
+from metrics import registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,6 +43,54 @@ DEFAULT_RATE_LIMITS = {
     }
 }
 
+# Keys with a per-worker token bucket (least recently used are dropped first)
+LOCAL_BUCKET_MAX_KEYS = 10000
+
+# GCRA over one key holding the theoretical arrival time (TAT) in ms.
+# ARGV: now (ms), limit, window (ms). Returns {limited, remaining, reset_ms};
+# reset_ms is the wait until the next allowed request when limited, otherwise
+# until the key would be back to a full allowance. Denied requests don't
+# move the TAT, and the key expires once the allowance is full again.
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local interval = window / limit
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+    return {1, 0, math.ceil(allow_at - now)}
+end
+local ttl = math.ceil(new_tat - now)
+redis.call('SET', KEYS[1], string.format('%d', math.ceil(new_tat)), 'PX', ttl)
+return {0, math.floor((window - (new_tat - now)) / interval), ttl}
+"""
+
+
+class _LocalBucket:
+    """Token bucket holding one worker's share of a key's allowance"""
+    
+    __slots__ = ('tokens', 'updated_at')
+    
+    def __init__(self, limit: int, now: float):
+        self.tokens = float(limit)
+        self.updated_at = now
+    
+    def take(self, limit: int, window: float, now: float) -> Optional[float]:
+        """Take a token; returns None if one was available, else seconds until one is"""
+        rate = limit / window
+        self.tokens = min(float(limit), self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / rate
+
+
 class RedisRateLimiter:
     """Redis-backed rate limiter for Flask applications"""
     
@@ -48,12 +100,16 @@ class RedisRateLimiter:
         
         Args:
             namespace: Redis key namespace for rate limit data
-            expire_time: Default expiration time in seconds for rate limit windows
+            expire_time: Rate limit window in seconds
         """
         self.namespace = namespace
         self.expire_time = expire_time
         self.client_ip = None
         self.rate_limits = DEFAULT_RATE_LIMITS
+        self._local_buckets: OrderedDict = OrderedDict()
+        self._local_lock = threading.Lock()
+        self._gcra_script = None
+        self._gcra_client = None
         
         # Safely initialize Redis connection with error handling
         try:
@@ -148,20 +204,106 @@ class RedisRateLimiter:
         # Get the limit for this user type and category
         return self.rate_limits[auth_type].get(category, self.rate_limits[auth_type]['default'])
         
+    def _check_local(self, key: str, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Reject a request in process when this worker alone has used up the limit
+        
+        Args:
+            key: Rate limit key
+            limit: Rate limit (requests per window)
+            
+        Returns:
+            Dict: Rate limit information if the request is limited, else None
+        """
+        now = time.monotonic()
+        with self._local_lock:
+            bucket = self._local_buckets.get(key)
+            if bucket is None:
+                bucket = _LocalBucket(limit, now)
+                self._local_buckets[key] = bucket
+                if len(self._local_buckets) > LOCAL_BUCKET_MAX_KEYS:
+                    self._local_buckets.popitem(last=False)
+            else:
+                self._local_buckets.move_to_end(key)
+            retry_after = bucket.take(limit, self.expire_time, now)
+        
+        if retry_after is None:
+            return None
+        return {
+            'limited': True,
+            'count': limit,
+            'limit': limit,
+            'remaining': 0,
+            'reset': max(int(math.ceil(retry_after)), 1)
+        }
+    
+    def _check_redis(self, key: str, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Apply the cluster-wide limit with one GCRA script call
+        
+        Args:
+            key: Rate limit key
+            limit: Rate limit (requests per window)
+            
+        Returns:
+            Dict: Rate limit information, or None if Redis is unavailable
+        """
+        client = self.redis.redis_client if self.redis else None
+        if client is None:
+            return None
+        
+        if self._gcra_script is None or self._gcra_client is not client:
+            self._gcra_script = client.register_script(_GCRA_SCRIPT)
+            self._gcra_client = client
+        
+        limited, remaining, reset_ms = self._gcra_script(
+            keys=[self.redis._get_full_key(key)],
+            args=[int(time.time() * 1000), limit, self.expire_time * 1000]
+        )
+        remaining = int(remaining)
+        return {
+            'limited': bool(int(limited)),
+            'count': limit - remaining,
+            'limit': limit,
+            'remaining': remaining,
+            'reset': int(math.ceil(int(reset_ms) / 1000))
+        }
+    
     def is_rate_limited(self, key: str, limit: int) -> Dict[str, Any]:
         """
         Check if a request should be rate limited
         
+        A per-worker token bucket rejects obvious bursts without a round trip;
+        otherwise the shared limit is checked and updated atomically in Redis
+        (GCRA: a request is allowed when at most `limit` requests were admitted
+        in the trailing window). If Redis is unavailable only the per-worker
+        bucket applies.
+        
         Args:
             key: Rate limit key
             limit: Rate limit (requests per minute)
             
         Returns:
-            Dict: Rate limit information
+            Dict: Rate limit information (limited, count, limit, remaining, and
+                reset: seconds until a request is allowed again if limited,
+                otherwise until the window is fully replenished)
         """
-        # If Redis is not available, disable rate limiting
-        if self.redis is None:
-            logger.debug("Redis not available, rate limiting is disabled")
+        rate_info = self._check_local(key, limit)
+        if rate_info is not None:
+            registry.inc('rate_limit_decisions_total', help='Rate limit decisions by where they were made',
+                         source='local', result='limited')
+            return rate_info
+        
+        try:
+            rate_info = self._check_redis(key, limit)
+        except Exception as e:
+            logger.error(f"Error checking rate limit: {str(e)}")
+            rate_info = None
+        
+        if rate_info is None:
+            # Redis unavailable: the local bucket already admitted this request
+            registry.inc('rate_limit_decisions_total', help='Rate limit decisions by where they were made',
+                         source='local', result='allowed')
             return {
                 'limited': False,
                 'count': 0,
@@ -169,98 +311,10 @@ class RedisRateLimiter:
                 'remaining': limit,
                 'reset': 0
             }
-            
-        try:
-            # Get current count - handle different Redis implementations
-            try:
-                # Try to increment the counter
-                count = self.redis.incr(key)
-            except (AttributeError, Exception) as e:
-                logger.debug(f"Redis incr failed: {str(e)}, using fallback")
-                
-                # Fallback implementation if incr is not available or fails
-                try:
-                    current = self.redis.get(key)
-                    if current is None:
-                        count = 1
-                        try:
-                            self.redis.set(key, count, self.expire_time)
-                        except Exception:
-                            # If set fails, just continue without rate limiting
-                            pass
-                    else:
-                        try:
-                            count = int(current) + 1
-                            self.redis.set(key, count, self.expire_time)
-                        except (ValueError, TypeError, Exception):
-                            count = 1
-                            try:
-                                self.redis.set(key, count, self.expire_time)
-                            except Exception:
-                                # If set fails, just continue without rate limiting
-                                pass
-                except Exception as e:
-                    # If all Redis operations fail, disable rate limiting for this request
-                    logger.error(f"Redis rate limiting failed: {str(e)}")
-                    return {
-                        'limited': False,
-                        'count': 0,
-                        'limit': limit,
-                        'remaining': limit,
-                        'reset': 0
-                    }
-            
-            # Create timer key if it doesn't exist
-            timer_key = f"{key}:reset"
-            timestamp = None
-            
-            try:
-                if self.redis:
-                    timestamp = self.redis.get(timer_key)
-                
-                if not timestamp:
-                    # Set expiration time to current time + window
-                    timestamp = time.time() + self.expire_time
-                    if self.redis:
-                        try:
-                            self.redis.set(timer_key, str(timestamp), expire=self.expire_time)
-                        except Exception as e:
-                            logger.debug(f"Failed to set timer key: {e}")
-                else:
-                    try:
-                        timestamp = float(timestamp)
-                    except (ValueError, TypeError):
-                        # Invalid timestamp format, create a new one
-                        timestamp = time.time() + self.expire_time
-            except Exception as e:
-                # If any Redis operation fails, create a default timestamp
-                logger.debug(f"Error handling rate limit timer: {e}")
-                timestamp = time.time() + self.expire_time
-            
-            # Time remaining in the window
-            reset_time = max(int(timestamp - time.time()), 0)
-            
-            # Check if limit is exceeded
-            limited = count > limit
-            
-            return {
-                'limited': limited,
-                'count': count,
-                'limit': limit,
-                'remaining': max(limit - count, 0),
-                'reset': reset_time
-            }
         
-        except Exception as e:
-            # On error, don't rate limit
-            logger.error(f"Error checking rate limit: {str(e)}")
-            return {
-                'limited': False,
-                'count': 1,
-                'limit': limit,
-                'remaining': limit - 1,
-                'reset': self.expire_time
-            }
+        registry.inc('rate_limit_decisions_total', help='Rate limit decisions by where they were made',
+                     source='redis', result='limited' if rate_info['limited'] else 'allowed')
+        return rate_info
     
     def limit_path(self, path: str = None, user_id_function: Callable = None):
         """
@@ -4,11 +4,15 @@ Redis Session Module
 This module provides a Redis-backed session interface for Flask applications.
 It allows sessions to be shared across multiple application instances, enabling
 horizontal scaling and improved reliability.
+
+Sessions are loaded lazily and saved as per-field hash updates, so requests
+that don't use the session cost no Redis commands.
 """
 
 import os
 import json
 import pickle
+import time
 import uuid
 import logging
 from datetime import timedelta
@@ -16,52 +20,128 @@ from typing import Dict, Any, Optional, MutableMapping, Mapping, Iterable, Union
 
 from flask import Flask
 from flask.sessions import SessionInterface, SessionMixin
-from werkzeug.datastructures import CallbackDict
 
 # Import Redis cache module
 from redis_cache import get_redis_connection, RedisCache
+from cache_codec import decode_value, encode_value
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class RedisSession(CallbackDict, SessionMixin):
-    """Redis-backed session implementation"""
+# Refresh a session's TTL (sliding expiry) at most this often, in seconds
+SESSION_TTL_REFRESH_INTERVAL = int(os.environ.get('SESSION_TTL_REFRESH_INTERVAL', '300'))
+
+# Hash field holding the last TTL refresh time (not part of the session data)
+_REFRESHED_AT_FIELD = '__refreshed_at'
+
+
+class RedisSession(SessionMixin):
+    """
+    Redis-backed session, loaded on first access
     
-    def __init__(self, initial=None, sid=None, new=False):
-        def on_update(self):
-            self.modified = True
-            
-        CallbackDict.__init__(self, initial or {}, on_update)
+    Requests that never read the session (static files, the service worker,
+    health checks) cost no Redis command. Writes are tracked per key so that
+    saving only sends the fields that changed. Values mutated in place are
+    not detected; assign them again or set session.modified = True.
+    """
+    
+    def __init__(self, interface=None, sid=None, new=False, initial=None):
+        self.interface = interface
         self.sid = sid
         self.new = new
-        self.modified = False
-        self.permanent = True
+        self._data: Dict[str, Any] = dict(initial or {})
+        self._loaded = new or interface is None
+        self._legacy = False
+        self._refreshed_at = 0.0
+        self._dirty = set(self._data)
+        self._removed = set()
+    
+    def _ensure_loaded(self):
+        """Fetch the stored fields, keeping changes made before the first read"""
+        if self._loaded:
+            return
+        self._loaded = True
+        stored, self._refreshed_at, self._legacy = self.interface._load(self.sid)
+        for key in self._removed:
+            stored.pop(key, None)
+        stored.update((key, self._data[key]) for key in self._dirty)
+        self._data = stored
+        if self._legacy:
+            # Rewrite a session stored in the old single-value format as a hash
+            self._dirty = set(stored)
+    
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+    
+    @property
+    def accessed(self) -> bool:
+        return self._loaded and not self.new
+    
+    @property
+    def modified(self) -> bool:
+        return bool(self._dirty or self._removed)
+    
+    @modified.setter
+    def modified(self, value: bool):
+        if value:
+            self._ensure_loaded()
+            self._dirty = set(self._data)
+        else:
+            self._dirty.clear()
+            self._removed.clear()
+    
+    @property
+    def permanent(self) -> bool:
+        # All Redis sessions are permanent; not stored, so reading it needs no load
+        return True
+    
+    @permanent.setter
+    def permanent(self, value: bool):
+        pass
     
     def __getitem__(self, key):
-        return super().__getitem__(key)
+        self._ensure_loaded()
+        return self._data[key]
     
     def __setitem__(self, key, value):
-        super().__setitem__(key, value)
-        
+        self._data[key] = value
+        self._dirty.add(key)
+        self._removed.discard(key)
+    
     def __delitem__(self, key):
-        super().__delitem__(key)
+        self._ensure_loaded()
+        del self._data[key]
+        self._dirty.discard(key)
+        self._removed.add(key)
+    
+    def __iter__(self):
+        self._ensure_loaded()
+        return iter(self._data)
+    
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._data)
+    
+    def __contains__(self, key):
+        self._ensure_loaded()
+        return key in self._data
     
     def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
-    
-    def update(self, other=None, **kwargs):
-        if other:
-            for key, value in other.items() if hasattr(other, 'items') else other:
-                self[key] = value
-        for key, value in kwargs.items():
-            self[key] = value
+        self._ensure_loaded()
+        return self._data.get(key, default)
+
 
 class RedisSessionInterface(SessionInterface):
-    """Session interface that uses Redis as the session backend"""
+    """
+    Session interface that uses Redis as the session backend
+    
+    Each session is a Redis hash with one field per session key, holding the
+    value encoded by cache_codec. The key's TTL slides: it is extended when
+    fields are written, and otherwise at most every SESSION_TTL_REFRESH_INTERVAL
+    seconds for sessions that are read.
+    """
     
     serializer = json
     session_class = RedisSession
@@ -90,9 +170,51 @@ class RedisSessionInterface(SessionInterface):
         """Get the Redis key for a session ID"""
         return f"{self.prefix}{sid}"
     
+    def _get_hash_key(self, sid):
+        """Get the Redis hash key holding a session's fields"""
+        return f"{self.prefix}hash:{sid}"
+    
+    def _load(self, sid) -> Tuple[Dict[str, Any], float, bool]:
+        """
+        Read a session from Redis
+        
+        Args:
+            sid: Session ID
+            
+        Returns:
+            tuple: (session data, last TTL refresh time, whether the session was
+                found in the old single-value format)
+        """
+        client = self.redis.redis_client
+        if client is None:
+            return {}, 0.0, False
+        
+        try:
+            fields = client.hgetall(self._get_hash_key(sid))
+            if fields:
+                data = {}
+                refreshed_at = 0.0
+                for field, value in fields.items():
+                    field = field.decode('utf-8') if isinstance(field, bytes) else field
+                    if field == _REFRESHED_AT_FIELD:
+                        refreshed_at = float(decode_value(value) or 0)
+                    else:
+                        data[field] = decode_value(value)
+                return data, refreshed_at, False
+            
+            # Sessions written before the hash format are migrated on save
+            legacy = self.redis.get(sid)
+            if legacy is not None:
+                data = self.serializer.loads(legacy) if isinstance(legacy, str) else legacy
+                if isinstance(data, dict):
+                    return data, 0.0, True
+        except Exception as e:
+            logger.error(f"Error loading session {sid}: {e}")
+        return {}, 0.0, False
+    
     def open_session(self, app: Flask, request):
         """
-        Open a session
+        Open a session without contacting Redis; it is loaded on first access
         
         Args:
             app: Flask application
@@ -108,23 +230,13 @@ class RedisSessionInterface(SessionInterface):
         if not sid:
             # Create a new session
             sid = str(uuid.uuid4())
-            return self.session_class(sid=sid, new=True)
-            
-        # Try to load existing session
-        try:
-            data = self.redis.get(sid)
-            if data is not None:
-                data = self.serializer.loads(data)
-                return self.session_class(data, sid=sid)
-        except Exception as e:
-            logger.error(f"Error loading session {sid}: {e}")
+            return self.session_class(self, sid=sid, new=True)
         
-        # Return a new session if loading failed
-        return self.session_class(sid=sid, new=True)
+        return self.session_class(self, sid=sid)
             
     def save_session(self, app: Flask, session, response):
         """
-        Save a session
+        Write the fields that changed and slide the session's TTL
         
         Args:
             app: Flask application
@@ -134,51 +246,70 @@ class RedisSessionInterface(SessionInterface):
         Returns:
             None
         """
+        # Nothing read or written: no Redis command, no cookie
+        if not session.loaded and not session.modified:
+            return
+        
         domain = self.get_cookie_domain(app)
         path = self.get_cookie_path(app)
+        session_cookie_name = getattr(app, 'session_cookie_name', 'session')
         
-        # Skip saving if session should be deleted
-        if not session:
-            if session.modified:
-                self.redis.delete(session.sid)
-                response.delete_cookie(
-                    getattr(app, 'session_cookie_name', 'session'),
-                    domain=domain,
-                    path=path
-                )
-            return
-            
-        # Skip saving if session is not modified
-        if not session.modified:
-            return
-            
-        # Set session expiration
-        httponly = self.get_cookie_httponly(app)
-        secure = self.get_cookie_secure(app)
-        samesite = self.get_cookie_samesite(app)
+        if session.accessed:
+            response.vary.add('Cookie')
         
         # Get session expiration
         timeout = self.expire
         if session.permanent:
             timeout = app.permanent_session_lifetime.total_seconds()
         
-        # Save session data to Redis
+        client = self.redis.redis_client
+        hash_key = self._get_hash_key(session.sid)
+        
+        # Everything removed: delete the session and its cookie
+        if session.loaded and not session._data:
+            if session.modified or session._legacy:
+                try:
+                    if client is not None:
+                        client.delete(hash_key, self.redis._get_full_key(session.sid))
+                except Exception as e:
+                    logger.error(f"Error deleting session {session.sid}: {e}")
+                response.delete_cookie(session_cookie_name, domain=domain, path=path)
+            return
+        
+        now = time.time()
+        refresh_due = session.loaded and now - session._refreshed_at >= SESSION_TTL_REFRESH_INTERVAL
+        if not session.modified and not refresh_due:
+            return
+        
+        # One round trip: changed fields, removed fields and the TTL together
         try:
-            data = dict(session)
-            self.redis.set(session.sid, self.serializer.dumps(data), expire=int(timeout))
+            if client is not None:
+                pipe = client.pipeline(transaction=False)
+                fields = {key: encode_value(session._data[key]) for key in session._dirty}
+                fields[_REFRESHED_AT_FIELD] = encode_value(now)
+                pipe.hset(hash_key, mapping=fields)
+                if session._removed:
+                    pipe.hdel(hash_key, *session._removed)
+                pipe.expire(hash_key, int(timeout))
+                if session._legacy:
+                    pipe.delete(self.redis._get_full_key(session.sid))
+                pipe.execute()
+                session.modified = False
+                session._legacy = False
+                session._refreshed_at = now
         except Exception as e:
             logger.error(f"Error saving session {session.sid}: {e}")
             
-        # Set cookie
+        # Set cookie (its expiry slides with the TTL)
         response.set_cookie(
-            getattr(app, 'session_cookie_name', 'session'),
+            session_cookie_name,
             session.sid,
             expires=self.get_expiration_time(app, session),
-            httponly=httponly,
+            httponly=self.get_cookie_httponly(app),
             domain=domain,
             path=path,
-            secure=secure,
-            samesite=samesite
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
         )
 
 def setup_redis_session(app: Flask, expire: int = 86400, redis_url: Optional[str] = None) -> None:
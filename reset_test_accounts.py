@@ -53,6 +53,11 @@ def reset_test_accounts():
         
         # Commit changes
         db.session.commit()
+        
+        # Drop the cached balances so chat credit checks see the reset values
+        from billing import invalidate_cached_balance
+        for user in test_users:
+            invalidate_cached_balance(user.id)
         logger.info("Successfully reset test accounts and transactions")
         return True
     
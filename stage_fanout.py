@@ -0,0 +1,184 @@
+"""
+Stage Fan-out Module
+
+Runs independent pre-stream I/O stages of the chat pipeline (memory enrichment,
+document checks and retrieval, chat settings lookup) concurrently on the gevent
+hub instead of one after another.
+
+Each stage gets its own deadline. A stage that misses its deadline or fails is
+skipped and its default value is used, so time-to-first-token tracks the
+slowest stage that finishes in time instead of the sum of all stages.
+"""
+
+import os
+import time
+import logging
+import functools
+from typing import Any, Callable, Dict, Optional
+
+from ensure_app_context import get_app
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    import gevent
+    GEVENT_AVAILABLE = True
+except ImportError:
+    gevent = None
+    GEVENT_AVAILABLE = False
+    logger.warning("gevent not installed, pre-stream stages will run sequentially")
+
+# Per-stage deadlines in seconds, measured from when the stage was spawned
+STAGE_DEADLINES = {
+    'memory_enrichment': float(os.environ.get('FANOUT_MEMORY_DEADLINE', '3.0')),
+    'user_has_documents': float(os.environ.get('FANOUT_DOCUMENTS_DEADLINE', '1.5')),
+    'rag_retrieval': float(os.environ.get('FANOUT_RAG_DEADLINE', '3.0')),
+    'chat_settings': float(os.environ.get('FANOUT_SETTINGS_DEADLINE', '1.0')),
+}
+DEFAULT_DEADLINE = 2.0
+
+
+def _in_fresh_app_context(func: Callable) -> Callable:
+    """
+    Wrap func so it always runs in a newly pushed application context.
+
+    Flask-SQLAlchemy scopes its session to the app context, so a fresh context
+    gives the greenlet its own session instead of sharing the request's.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_app().app_context():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class _Stage:
+    __slots__ = ('name', 'greenlet', 'deadline_at', 'default', 'value', 'error', 'done')
+
+    def __init__(self, name: str, deadline_at: float, default: Any):
+        self.name = name
+        self.greenlet = None
+        self.deadline_at = deadline_at
+        self.default = default
+        self.value = None
+        self.error = None
+        self.done = False
+
+
+class StageFanout:
+    """
+    Concurrent runner for independent request stages.
+
+    Usage:
+        fanout = StageFanout(trace)
+        fanout.spawn('chat_settings', get_chat_settings_for_user, user_id,
+                     default={}, app_context=True)
+        ...
+        settings = fanout.result('chat_settings')
+    """
+
+    def __init__(self, trace=None):
+        """
+        Args:
+            trace: Optional metrics.StageTrace used for the model label
+        """
+        self.trace = trace
+        self._stages: Dict[str, _Stage] = {}
+
+    def _record(self, name: str, started: float, outcome: str):
+        model = getattr(self.trace, 'model', None) or 'unknown'
+        registry.observe('chat_fanout_stage_seconds', time.perf_counter() - started,
+                         help='Duration of concurrently executed pre-stream chat stages',
+                         stage=name, model=model, outcome=outcome)
+
+    def spawn(self, name: str, func: Callable, *args, default: Any = None,
+              deadline: Optional[float] = None, app_context: bool = False, **kwargs):
+        """
+        Start a stage immediately in its own greenlet
+
+        Args:
+            name: Stage name
+            func: Function to run
+            *args: Positional arguments for func
+            default: Value returned by result() if the stage is skipped
+            deadline: Seconds the stage may take (defaults to STAGE_DEADLINES)
+            app_context: Run func inside a fresh Flask application context
+                (required for database access - each greenlet gets its own session)
+            **kwargs: Keyword arguments for func
+        """
+        if deadline is None:
+            deadline = STAGE_DEADLINES.get(name, DEFAULT_DEADLINE)
+
+        started = time.perf_counter()
+        stage = _Stage(name, started + deadline, default)
+        self._stages[name] = stage
+        target = _in_fresh_app_context(func) if app_context else func
+
+        def run():
+            outcome = 'failed'
+            try:
+                value = target(*args, **kwargs)
+                outcome = 'ok'
+                return value
+            finally:
+                # Also reached when a greenlet past its deadline is killed
+                self._record(name, started, outcome)
+
+        if GEVENT_AVAILABLE:
+            stage.greenlet = gevent.spawn(run)
+        else:
+            # No hub to fan out on - run inline, the deadline can't be enforced
+            try:
+                stage.value = run()
+            except Exception as e:
+                stage.error = e
+            stage.done = True
+
+    def result(self, name: str, default: Any = None) -> Any:
+        """
+        Wait for a stage until its deadline and return its value
+
+        Args:
+            name: Stage name
+            default: Returned if the stage was never spawned
+
+        Returns:
+            The stage's return value, or its default if it was skipped
+        """
+        stage = self._stages.get(name)
+        if stage is None:
+            return default
+
+        if stage.greenlet is not None and not stage.done:
+            stage.greenlet.join(timeout=max(stage.deadline_at - time.perf_counter(), 0))
+            stage.done = True
+
+            if not stage.greenlet.ready():
+                # Missed the deadline: stop waiting and free the greenlet
+                stage.greenlet.kill(block=False)
+                logger.warning(f"⏱️ Stage '{name}' missed its deadline, continuing without it")
+                registry.inc('chat_fanout_stage_skipped_total', help='Pre-stream stages skipped',
+                             stage=name, reason='deadline')
+                stage.value = stage.default
+                return stage.value
+
+            if stage.greenlet.successful():
+                stage.value = stage.greenlet.value
+            else:
+                stage.error = stage.greenlet.exception
+
+        if stage.error is not None:
+            logger.error(f"Stage '{name}' failed: {stage.error}")
+            registry.inc('chat_fanout_stage_skipped_total', help='Pre-stream stages skipped',
+                         stage=name, reason='error')
+            stage.value = stage.default
+            stage.error = None
+
+        return stage.value
+
+    def cancel_all(self):
+        """Kill any stages that are still running (e.g. on early return)"""
+        for stage in self._stages.values():
+            if stage.greenlet is not None and not stage.greenlet.ready():
+                stage.greenlet.kill(block=False)
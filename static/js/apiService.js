@@ -48,6 +48,19 @@ export async function sendMessageAPI(payload) {
     }
 }
 
+// Resume an interrupted chat response after the last event that was received
+export async function resumeMessageStreamAPI(lastEventId) {
+    const response = await fetch('/chat/stream', {
+        headers: { 'Last-Event-ID': lastEventId }
+    });
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    
+    return response;
+}
+
 // Load specific conversation
 export async function loadConversationAPI(conversationId) {
     try {
@@ -247,11 +260,14 @@ export async function cleanupEmptyConversationsAPI() {
     }
 }
 
-// Fetch available models
-export async function fetchAvailableModelsAPI() {
+// Fetch available models (only the changes after catalog version `since`, if given)
+export async function fetchAvailableModelsAPI(since = null) {
     try {
-        console.log('🔍 Calling /api/get_model_prices...');
-        const response = await fetch('/api/get_model_prices');
+        const url = since !== null && since !== undefined
+            ? `/api/get_model_prices?since=${encodeURIComponent(since)}`
+            : '/api/get_model_prices';
+        console.log(`🔍 Calling ${url}...`);
+        const response = await fetch(url);
         
         console.log('📡 Response status:', response.status, response.statusText);
         console.log('📡 Response headers:', response.headers.get('content-type'));
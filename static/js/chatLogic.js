@@ -1,6 +1,6 @@
 // Import required modules
 import { forceRepaint } from './utils.js';
-import { sendMessageAPI, shareConversationAPI, rateMessageAPI } from './apiService.js';
+import { sendMessageAPI, resumeMessageStreamAPI, shareConversationAPI, rateMessageAPI } from './apiService.js';
 import { messageInput } from './uiSetup.js';
 import { formatModelName, currentModel } from './modelSelection.js';
 
@@ -931,7 +931,7 @@ async function sendMessageToBackend(message, selectedModel, typingIndicator) {
         }
         
         // Handle streaming response
-        const reader = response.body.getReader();
+        let reader = response.body.getReader();
         const decoder = new TextDecoder();
         
         // Remove typing indicator
@@ -950,17 +950,39 @@ async function sendMessageToBackend(message, selectedModel, typingIndicator) {
         let isStreamingReasoning = false;
         let reasoningComplete = false;
         let responseContainer = null; // Track the response container
+        let lastEventId = null; // Id of the last event received, used to resume a dropped stream
+        let resumeAttempts = 0;
+        const maxResumeAttempts = 3;
         
         // Process stream
         while (true) {
-            const { value, done } = await reader.read();
+            let value, done;
+            try {
+                ({ value, done } = await reader.read());
+            } catch (readError) {
+                // Connection dropped mid-response - the server keeps the response running
+                // briefly, so pick it up after the last event instead of failing
+                if (!lastEventId || resumeAttempts >= maxResumeAttempts) throw readError;
+                resumeAttempts++;
+                console.warn(`🔌 Stream interrupted, resuming after ${lastEventId} (attempt ${resumeAttempts})`, readError);
+                await new Promise(resolve => setTimeout(resolve, 500 * resumeAttempts));
+                try {
+                    const resumed = await resumeMessageStreamAPI(lastEventId);
+                    reader = resumed.body.getReader();
+                } catch (resumeError) {
+                    console.warn('🔌 Could not resume stream:', resumeError);
+                }
+                continue;
+            }
             if (done) break;
             
             const chunk = decoder.decode(value);
             const lines = chunk.split('\n');
             
             for (const line of lines) {
-                if (line.startsWith('data: ')) {
+                if (line.startsWith('id: ')) {
+                    lastEventId = line.slice(4).trim();
+                } else if (line.startsWith('data: ')) {
                     const data = line.slice(6);
                     if (data === '[DONE]') continue;
                     
@@ -43,9 +43,9 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentPresetId = null;
 
     /** ----------------------------------------------------------------
-     * Session-cache key  (v1 so you can bust the cache later if needed)
+     * Session-cache key  (v2 stores the catalog version with the models)
      * ---------------------------------------------------------------*/
-    const MODEL_CACHE_KEY = 'gm_mobile_model_cache_v1';
+    const MODEL_CACHE_KEY = 'gm_mobile_model_cache_v2';
     
     // Initialize on page load - fetch user preferences and update model names
     console.log('Mobile: Initializing model selections on page load');
@@ -172,7 +172,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 /*  🗄️  cache for this session so re-opens are instant  */
                 try {
-                    sessionStorage.setItem(MODEL_CACHE_KEY, JSON.stringify(window.availableModels));
+                    sessionStorage.setItem(MODEL_CACHE_KEY, JSON.stringify({
+                        version: event.detail.version,
+                        models: window.availableModels
+                    }));
                 } catch (e) {
                     console.warn('Mobile: Unable to cache model list in sessionStorage', e);
                 }
@@ -693,9 +696,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 const cached = sessionStorage.getItem(MODEL_CACHE_KEY);
                 if (cached) {
                     try {
-                        allModels = JSON.parse(cached);
+                        const cachedEntry = JSON.parse(cached);
+                        allModels = Array.isArray(cachedEntry.models) ? cachedEntry.models : [];
                         window.availableModels = allModels;   // keep the global in sync
-                        console.log(`Mobile: Loaded ${allModels.length} models from sessionStorage cache`);
+                        console.log(`Mobile: Loaded ${allModels.length} models (catalog v${cachedEntry.version}) from sessionStorage cache`);
                     } catch (e) {
                         console.warn('Mobile: Failed to parse cached models', e);
                     }
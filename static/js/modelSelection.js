@@ -18,6 +18,46 @@ export let currentlyEditingPresetId = null;
 window.availableModels = allModels;
 window.userPreferences = userPreferences;
 
+// Last full price map and its catalog version, so reloads only fetch what changed
+const MODEL_PRICES_CACHE_KEY = 'gm_model_prices_v1';
+
+function loadCachedModelPrices() {
+    try {
+        const cached = JSON.parse(localStorage.getItem(MODEL_PRICES_CACHE_KEY) || 'null');
+        if (cached && cached.prices && Number.isInteger(cached.version)) {
+            return cached;
+        }
+    } catch (e) {
+        console.warn('⚠️ Unable to read cached model prices', e);
+    }
+    return null;
+}
+
+function storeCachedModelPrices(version, prices) {
+    try {
+        if (Number.isInteger(version)) {
+            localStorage.setItem(MODEL_PRICES_CACHE_KEY, JSON.stringify({ version, prices }));
+        } else {
+            localStorage.removeItem(MODEL_PRICES_CACHE_KEY);
+        }
+    } catch (e) {
+        console.warn('⚠️ Unable to cache model prices', e);
+    }
+}
+
+// Apply a delta response to the cached price map, or take a full response as is
+function mergeModelPrices(cached, data) {
+    if (!data.delta || !cached) {
+        return data.prices;
+    }
+    const prices = Object.assign({}, cached.prices, data.prices);
+    for (const modelId of data.removed || []) {
+        delete prices[modelId];
+    }
+    console.log(`🔄 Applied model delta since v${data.since}: ${Object.keys(data.prices).length} changed, ${(data.removed || []).length} removed`);
+    return prices;
+}
+
 // Filter configurations for each preset
 export const presetFilters = {
     '1': (model) => {
@@ -337,7 +377,8 @@ export async function fetchUserPreferences() {
 export async function fetchAvailableModels() {
     try {
         console.log('🤖 Fetching available models...');
-        const data = await fetchAvailableModelsAPI();
+        const cached = loadCachedModelPrices();
+        const data = await fetchAvailableModelsAPI(cached ? cached.version : null);
         
         console.log('🔍 Complete API response structure:', data);
         
@@ -345,6 +386,9 @@ export async function fetchAvailableModels() {
         if (data.success && data.prices) {
             console.log('✅ API returned prices data, processing models...');
             
+            data.prices = mergeModelPrices(cached, data);
+            storeCachedModelPrices(data.version, data.prices);
+            
             // Create model data array directly from pricing data (matching original logic)
             const modelDataArray = [];
             for (const modelId in data.prices) {
@@ -389,6 +433,9 @@ export async function fetchAvailableModels() {
             allModels = modelDataArray;
             window.availableModels = allModels;
             console.log(`✅ Loaded ${allModels.length} models from prices data`);
+            document.dispatchEvent(new CustomEvent('modelsLoaded', {
+                detail: { models: allModels, version: data.version }
+            }));
             updatePresetButtonLabels();
             
             // Initialize upload controls for the default preset
@@ -0,0 +1,333 @@
+"""
+Stream Replay Module
+
+Makes /chat responses resumable after a dropped connection.
+
+Every SSE event yielded by the chat generator is also appended to a short-lived
+per-turn Redis Stream (chat:stream:<stream_id>) and sent with an
+`id: <stream_id>:<seq>` line. A client that loses its connection reconnects
+with Last-Event-ID; the events after that id are replayed from Redis and the
+reader then tails the stream until the turn ends. The upstream request keeps
+running in the original worker - a reconnect never starts a new one.
+
+When the original client disconnects, the publisher keeps draining the
+upstream response into Redis for STREAM_RESUME_GRACE seconds. If no reader
+attaches within that time the chat generator is closed, which cancels the
+upstream request and saves the partial reply as before.
+"""
+
+import os
+import re
+import time
+import uuid
+import logging
+from typing import Iterable, Iterator, Optional, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Redis namespace (REDIS_STREAM_* variables override the default connection)
+STREAM_REDIS_NAMESPACE = 'stream'
+
+STREAM_KEY_PREFIX = 'chat:stream:'
+
+# Seconds a finished or abandoned stream stays available for replay
+STREAM_TTL = int(os.environ.get('STREAM_REPLAY_TTL', '300'))
+
+# Seconds the upstream keeps streaming after the client disconnects, waiting for a reconnect
+STREAM_RESUME_GRACE = float(os.environ.get('STREAM_RESUME_GRACE', '10'))
+
+# Events are written to Redis in pipelined batches while the original client is connected
+STREAM_FLUSH_EVENTS = 16
+STREAM_FLUSH_INTERVAL = 0.1
+
+# XREAD BLOCK timeout for readers; a keepalive comment is sent after each empty read
+READ_BLOCK_MS = 2000
+
+# Readers give up when a stream produces nothing for this long
+READ_IDLE_TIMEOUT = float(os.environ.get('STREAM_READ_IDLE_TIMEOUT', '120'))
+
+# Readers refresh a presence key so a detached publisher knows someone is listening
+READER_PRESENCE_TTL = 5
+
+# Seconds between presence checks while draining a detached stream
+PRESENCE_CHECK_INTERVAL = 0.5
+
+# Retry connecting to Redis at most this often after a failure
+CLIENT_RETRY_INTERVAL = 30.0
+
+_EVENT_ID_RE = re.compile(r'^([0-9a-f]{32}):(\d+)$')
+
+_client = None
+_client_failed_at = None
+
+
+def get_stream_client():
+    """
+    Get the Redis client used for chat streams
+
+    Returns:
+        Redis client, or None if Redis is unavailable
+    """
+    global _client, _client_failed_at
+
+    if _client is not None:
+        return _client
+    if _client_failed_at is not None and time.monotonic() - _client_failed_at < CLIENT_RETRY_INTERVAL:
+        return None
+
+    from redis_config import create_redis_client
+
+    _client = create_redis_client(STREAM_REDIS_NAMESPACE)
+    if _client is None:
+        _client_failed_at = time.monotonic()
+        logger.warning("Redis unavailable, chat streams will not be resumable")
+    return _client
+
+
+def new_stream_id() -> str:
+    """Generate an unguessable id for a chat turn's stream"""
+    return uuid.uuid4().hex
+
+
+def stream_key(stream_id: str) -> str:
+    return f"{STREAM_KEY_PREFIX}{stream_id}"
+
+
+def owner_key(stream_id: str) -> str:
+    return f"{STREAM_KEY_PREFIX}{stream_id}:owner"
+
+
+def reader_key(stream_id: str) -> str:
+    return f"{STREAM_KEY_PREFIX}{stream_id}:reader"
+
+
+def format_event(stream_id: str, seq: int, chunk: str) -> str:
+    """
+    Prefix an SSE event with its id line
+
+    Args:
+        stream_id: Stream ID
+        seq: Sequence number of the event within the stream
+        chunk: SSE event as yielded by the chat generator
+
+    Returns:
+        str: Event with an `id:` line
+    """
+    return f"id: {stream_id}:{seq}\n{chunk}"
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Parse a Last-Event-ID value
+
+    Args:
+        event_id: Value of the Last-Event-ID header
+
+    Returns:
+        Tuple of (stream_id, seq), or None if the id isn't one of ours
+    """
+    match = _EVENT_ID_RE.match((event_id or '').strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def _is_comment(chunk: str) -> bool:
+    # SSE comments (keepalives) are sent live but not stored or numbered
+    return chunk.startswith(':')
+
+
+class _Publisher:
+    """Buffers events and appends them to the Redis Stream with explicit ids"""
+
+    __slots__ = ('client', 'stream_id', 'owner', 'pending', 'last_seq', 'last_flush', 'created', 'failed')
+
+    def __init__(self, client, stream_id: str, owner: Optional[str]):
+        self.client = client
+        self.stream_id = stream_id
+        self.owner = owner
+        self.pending = []
+        self.last_seq = 0
+        self.last_flush = time.monotonic()
+        self.created = False
+        self.failed = False
+
+    def add(self, chunk: str, flush: bool = False) -> int:
+        self.last_seq += 1
+        if not self.failed:
+            self.pending.append((self.last_seq, chunk))
+            if (flush or not self.created or len(self.pending) >= STREAM_FLUSH_EVENTS
+                    or time.monotonic() - self.last_flush >= STREAM_FLUSH_INTERVAL):
+                self.flush()
+        return self.last_seq
+
+    def flush(self, end: bool = False):
+        if self.failed or (not self.pending and not end):
+            return
+
+        key = stream_key(self.stream_id)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            if not self.created:
+                pipe.set(owner_key(self.stream_id), self.owner or '', ex=STREAM_TTL)
+            for seq, chunk in self.pending:
+                pipe.xadd(key, {'data': chunk}, id=f"0-{seq}")
+            if end:
+                pipe.xadd(key, {'end': '1'}, id=f"0-{self.last_seq + 1}")
+                pipe.expire(owner_key(self.stream_id), STREAM_TTL)
+            pipe.expire(key, STREAM_TTL)
+            pipe.execute()
+            self.created = True
+        except Exception as e:
+            # Keep serving the live client; the stream just won't be resumable
+            logger.warning(f"Could not write chat stream {self.stream_id} to Redis: {e}")
+            self.failed = True
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def reader_attached(self) -> bool:
+        try:
+            return bool(self.client.exists(reader_key(self.stream_id)))
+        except Exception:
+            return False
+
+
+def publish_stream(stream_id: str, events: Iterable[str], owner: Optional[str] = None,
+                   client=None) -> Iterator[str]:
+    """
+    Serve a chat generator while recording its events for replay
+
+    Args:
+        stream_id: Stream ID from new_stream_id()
+        events: Chat generator yielding SSE events
+        owner: User ID allowed to resume the stream (None for guests)
+        client: Redis client (defaults to get_stream_client())
+
+    Yields:
+        str: SSE events with id lines
+    """
+    client = client or get_stream_client()
+    if client is None:
+        yield from events
+        return
+
+    publisher = _Publisher(client, stream_id, owner)
+    try:
+        for chunk in events:
+            if _is_comment(chunk):
+                yield chunk
+                continue
+            seq = publisher.add(chunk)
+            yield format_event(stream_id, seq, chunk)
+    except GeneratorExit:
+        publisher.flush()
+        try:
+            _drain_detached(publisher, events)
+        except Exception as e:
+            logger.error(f"Error draining detached chat stream {stream_id}: {e}")
+        raise
+    finally:
+        publisher.flush(end=True)
+
+
+def _drain_detached(publisher: _Publisher, events: Iterator[str]):
+    """Keep recording a stream whose client went away until it ends or nobody reconnects"""
+    if publisher.failed:
+        events.close()
+        return
+
+    logger.info(f"Client detached from chat stream {publisher.stream_id}, waiting up to "
+                f"{STREAM_RESUME_GRACE:.0f}s for a reconnect")
+    detached_at = time.monotonic()
+    last_check = 0.0
+    resumed = False
+
+    for chunk in events:
+        if not _is_comment(chunk):
+            publisher.add(chunk, flush=True)
+
+        now = time.monotonic()
+        if now - last_check < PRESENCE_CHECK_INTERVAL:
+            continue
+        last_check = now
+
+        if publisher.reader_attached():
+            detached_at = now
+            resumed = True
+        elif now - detached_at > STREAM_RESUME_GRACE:
+            # Nobody is listening - closing the generator cancels the upstream request
+            logger.info(f"No reader for chat stream {publisher.stream_id}, cancelling upstream")
+            registry.inc('chat_stream_abandoned_total', help='Detached chat streams cancelled after the resume grace period')
+            events.close()
+            break
+
+    if resumed:
+        registry.inc('chat_stream_resumed_total', help='Detached chat streams picked up by a reconnecting reader')
+
+
+def stream_owner(stream_id: str, client=None) -> Optional[str]:
+    """
+    Look up who may resume a stream
+
+    Args:
+        stream_id: Stream ID
+        client: Redis client (defaults to get_stream_client())
+
+    Returns:
+        str: Owner user ID ('' for guest streams), or None if the stream doesn't exist
+    """
+    client = client or get_stream_client()
+    if client is None:
+        return None
+    try:
+        return client.get(owner_key(stream_id))
+    except Exception as e:
+        logger.warning(f"Could not look up chat stream {stream_id}: {e}")
+        return None
+
+
+def replay_stream(stream_id: str, last_seq: int = 0, client=None) -> Iterator[str]:
+    """
+    Replay a stream after last_seq from Redis, then tail it until the turn ends
+
+    Args:
+        stream_id: Stream ID
+        last_seq: Sequence number of the last event the client received
+        client: Redis client (defaults to get_stream_client())
+
+    Yields:
+        str: SSE events with id lines, and keepalive comments while waiting
+    """
+    client = client or get_stream_client()
+    if client is None:
+        return
+
+    key = stream_key(stream_id)
+    cursor = f"0-{last_seq}"
+    last_event_at = time.monotonic()
+    registry.inc('chat_stream_replays_total', help='Chat stream reconnects served from Redis')
+
+    try:
+        while True:
+            client.set(reader_key(stream_id), '1', ex=READER_PRESENCE_TTL)
+            result = client.xread({key: cursor}, count=500, block=READ_BLOCK_MS)
+
+            if not result:
+                if not client.exists(key) or time.monotonic() - last_event_at > READ_IDLE_TIMEOUT:
+                    logger.warning(f"Chat stream {stream_id} expired before it finished")
+                    yield 'data: {"type": "error", "error": "The response is no longer available"}\n\n'
+                    return
+                yield ": keepalive\n\n"
+                continue
+
+            last_event_at = time.monotonic()
+            for entry_id, fields in result[0][1]:
+                cursor = entry_id
+                if 'end' in fields:
+                    return
+                yield format_event(stream_id, int(entry_id.split('-')[1]), fields['data'])
+    except Exception as e:
+        logger.error(f"Error replaying chat stream {stream_id}: {e}")
+        yield 'data: {"type": "error", "error": "Lost connection to the response stream"}\n\n'
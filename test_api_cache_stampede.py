@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test the API cache's stampede protection: concurrent misses run the wrapped
+function once, XFetch refreshes a value early with rising probability,
+values cached before recompute metadata existed are still served, and model
+responses are dropped when the catalog changes.
+"""
+import sys
+import time
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from api_cache import ApiCache, should_recompute_early
+
+
+class InMemoryLockClient:
+    """SET NX PX and the lock release script, without a server"""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value
+            return True
+
+    def eval(self, script, numkeys, key, token):
+        with self.lock:
+            if self.values.get(key) == token:
+                del self.values[key]
+                return 1
+            return 0
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.values.pop(key, None) is not None)
+
+
+class InMemoryRedisCache:
+    """The RedisCache methods ApiCache uses"""
+
+    def __init__(self):
+        self.namespace = 'test'
+        self.values = {}
+        self.redis_client = InMemoryLockClient()
+
+    def _get_full_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, expire=None):
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+
+def _cache():
+    cache = ApiCache(namespace='test_stampede')
+    cache.redis = InMemoryRedisCache()
+    return cache
+
+
+def test_burst_on_miss_computes_once():
+    """100 concurrent callers on a missing key share one call"""
+    cache = _cache()
+    calls = []
+
+    @cache.cache_api_response(ttl=60, key_extractor=lambda: 'pricing')
+    def load_pricing():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'models': 3}
+
+    barrier = threading.Barrier(100)
+    results = []
+
+    def request():
+        barrier.wait()
+        results.append(load_pricing())
+
+    threads = [threading.Thread(target=request) for _ in range(100)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'models': 3}] * 100
+
+
+def test_xfetch_probability():
+    """Far from expiry nobody recomputes; close to it a slow value usually does"""
+    now = 1000.0
+    assert not should_recompute_early(0.5, now + 300, now=now, rand=lambda: 0.5)
+    assert should_recompute_early(0.5, now + 0.1, now=now, rand=lambda: 0.5)
+    assert should_recompute_early(0, now - 1, now=now)
+    assert not should_recompute_early(0, now + 1, now=now)
+
+
+def test_plain_cached_values_still_served():
+    """Values written by the old decorator (no metadata) are hits"""
+    cache = _cache()
+    calls = []
+
+    @cache.cache_api_call(ttl=60)
+    def lookup(name):
+        calls.append(name)
+        return name.upper()
+
+    cache.redis.values[cache._generate_cache_key('a')] = 'OLD'
+    assert lookup('a') == 'OLD'
+    assert lookup('b') == 'B'
+    assert lookup('b') == 'B'
+    assert calls == ['b']
+
+
+def test_clear_model_caches():
+    """The cached pricing entry and the raw pricing keys go; other entries stay"""
+    import api_cache
+
+    cache = _cache()
+    calls = []
+
+    # What cache_model_pricing() wraps get_model_prices with
+    @cache.cache_api_response(ttl=60, key_extractor=lambda *args, **kwargs: 'model_pricing')
+    def prices():
+        calls.append(1)
+        return {'openai/gpt-4o': 5.0}
+
+    raw = cache.redis.redis_client.values
+    raw.update({'cache:pricing_data': 'old', 'cache:pricing_table_data': 'old', 'cache:other': 'kept'})
+    cache.redis.values['unrelated'] = 'kept'
+
+    original = api_cache._api_cache
+    api_cache._api_cache = cache
+    try:
+        prices()
+        assert api_cache.clear_model_caches() == 3
+        prices()
+    finally:
+        api_cache._api_cache = original
+
+    assert calls == [1, 1]
+    assert raw == {'cache:other': 'kept'}
+    assert cache.redis.values['unrelated'] == 'kept'
+
+
+if __name__ == "__main__":
+    test_burst_on_miss_computes_once()
+    test_xfetch_probability()
+    test_plain_cached_values_still_served()
+    test_clear_model_caches()
+    logger.info("API cache stampede tests passed")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test that get_available_models serves a cached list and only rewrites
+available_models.json when the model catalog changes.
+"""
+import os
+import sys
+import json
+import logging
+import tempfile
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import model_catalog
+import model_validator
+
+
+def _entries(*model_ids):
+    return [{'model_id': model_id, 'model_is_active': True} for model_id in model_ids]
+
+
+def test_snapshot_written_only_on_change():
+    """The snapshot file is written once per distinct catalog version"""
+    original_file = model_validator.AVAILABLE_MODELS_FILE
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, 'available_models.json')
+        model_validator.AVAILABLE_MODELS_FILE = snapshot_path
+        model_validator._snapshot_fingerprint = None
+        model_validator._available_models_cache.update({'models': None, 'version': None, 'expires_at': 0.0})
+        model_catalog._catalog = None
+
+        try:
+            model_catalog.swap_model_catalog(_entries('openai/gpt-4o', 'deepseek/deepseek-r1'))
+            first = model_validator.get_available_models()
+            assert first == ['openai/gpt-4o', 'deepseek/deepseek-r1']
+            first_mtime = os.stat(snapshot_path).st_mtime_ns
+
+            # Same catalog version: served from cache, file untouched
+            assert model_validator.get_available_models() is first
+            assert os.stat(snapshot_path).st_mtime_ns == first_mtime
+
+            # New catalog version: list rebuilt and snapshot rewritten
+            model_catalog.swap_model_catalog(_entries('openai/gpt-4o'))
+            second = model_validator.get_available_models()
+            assert second == ['openai/gpt-4o']
+            with open(snapshot_path) as f:
+                assert json.load(f) == ['openai/gpt-4o']
+
+            # No temporary files left behind
+            assert os.listdir(tmp_dir) == ['available_models.json']
+        finally:
+            model_validator.AVAILABLE_MODELS_FILE = original_file
+            model_catalog._catalog = None
+
+
+if __name__ == "__main__":
+    test_snapshot_written_only_on_change()
+    logger.info("Available models snapshot test passed")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test the bounded background pool: tasks run on a fixed set of workers, a full
+queue overflows to the spill callable or drops the task, shutdown drains the
+queue, and the queue depth is exported.
+"""
+import sys
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import background_pool
+from background_pool import BoundedWorkerPool
+
+
+def _blocked_pool(name, **kwargs):
+    """A one-worker pool whose worker is held until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    pool = BoundedWorkerPool(name, workers=1, max_queue=2, put_timeout=0.01, **kwargs)
+    pool.submit(hold)
+    assert started.wait(5)
+    return pool, release
+
+
+def test_full_queue_drops_and_reports_depth():
+    """With the worker busy and the queue full, further tasks are dropped"""
+    pool, release = _blocked_pool('test_drop')
+    done = []
+    assert pool.submit(done.append, 1) and pool.submit(done.append, 2)
+    assert pool.submit(done.append, 3) is False
+
+    depth = {labels['pool']: value for name, _, _, labels, value in background_pool._pool_collector()
+             if name == 'background_pool_queue_depth'}
+    assert depth['test_drop'] == 2
+
+    release.set()
+    pool.shutdown(timeout=5)
+    assert done == [1, 2]
+
+
+def test_full_queue_spills():
+    """Overflowing tasks go to the spill callable when it accepts them"""
+    spilled = []
+    pool, release = _blocked_pool('test_spill', spill=lambda func, args, kwargs: spilled.append(args) or True)
+    pool.submit(len, 'a')
+    pool.submit(len, 'b')
+    assert pool.submit(len, 'overflow') is True
+    assert spilled == [('overflow',)]
+    release.set()
+    pool.shutdown(timeout=5)
+
+
+def test_shutdown_drains_queue():
+    """Queued tasks finish on shutdown and later submissions are refused"""
+    pool, release = _blocked_pool('test_shutdown')
+    done = []
+    pool.submit(done.append, 'first')
+    pool.submit(done.append, 'second')
+
+    release.set()
+    assert pool.shutdown(timeout=5) == 0
+    assert done == ['first', 'second']
+    assert pool.submit(done.append, 'late') is False
+
+
+def test_shutdown_deadline_hands_back_leftovers():
+    """Tasks still queued at the deadline are spilled"""
+    spilled = []
+    pool, release = _blocked_pool('test_deadline', spill=lambda func, args, kwargs: spilled.append(args) or True)
+    pool.submit(len, 'queued')
+    assert pool.shutdown(timeout=0.1) == 1
+    assert spilled == [('queued',)]
+    release.set()
+
+
+if __name__ == "__main__":
+    test_full_queue_drops_and_reports_depth()
+    test_full_queue_spills()
+    test_shutdown_drains_queue()
+    test_shutdown_deadline_hands_back_leftovers()
+    logger.info("Background pool tests passed")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the cache codec layer: values round-trip with their types, values written
+before the codec existed still decode, counters stay INCR-compatible, large
+bodies are compressed and values that can't be encoded are not cached.
+"""
+import sys
+import logging
+from decimal import Decimal
+from datetime import date, datetime
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import cache_codec
+from cache_codec import CODECS, CodecError, decode_value, encode_value
+from redis_cache import RedisCache
+
+
+class DictRedisClient:
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+
+def test_round_trip_every_codec():
+    """Non-JSON types come back as themselves with every installed codec"""
+    value = {
+        'prices': {'openai/gpt-4o': {'input_price': 5.0, 'context_length': '128000'}},
+        'last_updated': datetime(2025, 5, 1, 12, 30),
+        'day': date(2025, 5, 1),
+        'credit': Decimal('0.0015'),
+        'tags': {'vision'},
+        'blob': b'\x00\xfe\xff',
+        'flags': [True, None, 3],
+    }
+    for codec in CODECS.values():
+        assert decode_value(encode_value(value, codec)) == value, codec.name
+
+
+def test_legacy_and_counter_values():
+    """JSON text and plain strings written earlier decode as before; ints stay plain"""
+    assert decode_value(b'{"success": true}') == {'success': True}
+    assert decode_value('not json') == 'not json'
+    assert decode_value(None) is None
+    assert encode_value(42) == b'42'
+    assert decode_value(encode_value(42)) == 42
+
+
+def test_large_values_compressed():
+    """Bodies over the threshold are stored compressed"""
+    value = {'description': 'a long model description ' * 200}
+    encoded = encode_value(value, compress_min_bytes=1024)
+    assert encoded[1] & (cache_codec.COMPRESS_ZSTD | cache_codec.COMPRESS_ZLIB)
+    assert len(encoded) < len(encode_value(value, compress_min_bytes=0)) / 5
+    assert decode_value(encoded) == value
+
+
+def test_unencodable_and_unknown_values():
+    """Unencodable values aren't cached as str(); unknown codecs read as misses"""
+    cache = RedisCache(namespace='test_codec')
+    cache.redis_client = DictRedisClient()
+
+    assert cache.set('bad', {'handle': object()}) is False
+    assert cache.redis_client.values == {}
+
+    try:
+        decode_value(bytes((cache_codec.MARKER, 0x3F)) + b'data')
+        assert False, "expected CodecError"
+    except CodecError:
+        pass
+    cache.redis_client.values['test_codec:future'] = bytes((cache_codec.MARKER, 0x3F)) + b'data'
+    assert cache.get('future') is None
+
+
+if __name__ == "__main__":
+    test_round_trip_every_codec()
+    test_legacy_and_counter_values()
+    test_large_values_compressed()
+    test_unencodable_and_unknown_values()
+    logger.info("Cache codec tests passed")
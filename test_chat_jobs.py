@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test the write-behind chat jobs: jobs go to RQ when it is available and run on
+a bounded worker pool of the web process when it is not, memory writes on the
+memory system's pool.
+"""
+import sys
+import time
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import memory_integration
+from jobs import background_job
+from chat_jobs import enqueue_chat_job, save_assistant_memory_job
+
+ran = threading.Event()
+ran_on = []
+
+
+@background_job(queue_name='default')
+def sample_job(value):
+    """Job used by the tests"""
+    ran_on.append(threading.current_thread().name)
+    ran.set()
+    return value
+
+
+def unavailable(*args, **kwargs):
+    raise ConnectionError("redis down")
+
+
+def test_enqueue_uses_queue():
+    """When RQ accepts the job it is not also run locally"""
+    class FakeJob:
+        id = 'job-1'
+
+    original = sample_job.async_run
+    sample_job.async_run = lambda *args, **kwargs: FakeJob()
+    try:
+        ran.clear()
+        assert enqueue_chat_job(sample_job, 1).id == 'job-1'
+        assert not ran.wait(0.2)
+    finally:
+        sample_job.async_run = original
+
+
+def test_fallback_runs_on_pool():
+    """If the queue is unavailable the job still runs, on a chat jobs pool worker"""
+    original = sample_job.async_run
+    sample_job.async_run = unavailable
+    try:
+        ran.clear()
+        assert enqueue_chat_job(sample_job, 1) is None
+        assert ran.wait(2)
+        assert ran_on[-1].startswith('chat_jobs-worker-')
+    finally:
+        sample_job.async_run = original
+
+
+def test_memory_job_fallback_uses_memory_pool():
+    """/chat's assistant memory write runs on the bounded memory pool when RQ is down"""
+    saved = threading.Event()
+    calls = []
+
+    class FakeMemoryManager:
+        def add_message(self, session_id, user_id, role, content):
+            calls.append((session_id, role, content, threading.current_thread().name))
+            saved.set()
+            return True
+
+    original_async_run = save_assistant_memory_job.async_run
+    original_manager = memory_integration.get_memory_manager
+    save_assistant_memory_job.async_run = unavailable
+    memory_integration.get_memory_manager = lambda: FakeMemoryManager()
+    try:
+        threads_before = threading.active_count()
+        # Called exactly as the /chat stream does after saving the reply
+        assert enqueue_chat_job(save_assistant_memory_job, session_id='42', user_id='7',
+                                content='Paris is the capital of France.') is None
+        assert saved.wait(2)
+        session_id, role, content, thread_name = calls[0]
+        assert (session_id, role, content) == ('42', 'assistant', 'Paris is the capital of France.')
+        assert thread_name.startswith('memory-worker-')
+
+        # A burst of replies reuses the pool's workers instead of starting a thread each
+        for index in range(30):
+            enqueue_chat_job(save_assistant_memory_job, session_id='42', user_id='7', content=f"reply {index}")
+        assert threading.active_count() - threads_before <= memory_integration.MEMORY_WORKERS
+
+        deadline = time.monotonic() + 5
+        while len(calls) < 31 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(calls) == 31
+    finally:
+        save_assistant_memory_job.async_run = original_async_run
+        memory_integration.get_memory_manager = original_manager
+
+
+if __name__ == "__main__":
+    test_enqueue_uses_queue()
+    test_fallback_runs_on_pool()
+    test_memory_job_fallback_uses_memory_pool()
+    logger.info("Chat job tests passed")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test the rolling conversation summary: when it is recomputed, which messages
+are folded into it, what is stored after a successful or failed update, and
+how it is sent to the model.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from flask import Flask
+
+import conversation_summary
+from conversation_summary import needs_summary_update, summary_system_message, update_conversation_summary
+
+
+def test_short_conversations_are_not_summarized():
+    """Nothing is summarized while everything fits in the recent window"""
+    recent = conversation_summary.SUMMARY_RECENT_MESSAGES
+    assert not needs_summary_update(recent, 0)
+    assert not needs_summary_update(recent + conversation_summary.SUMMARY_MIN_NEW_MESSAGES - 1, 0)
+    assert needs_summary_update(recent + conversation_summary.SUMMARY_MIN_NEW_MESSAGES, 0)
+
+
+def test_summary_recomputed_only_when_turns_age_out():
+    """An up-to-date summary isn't recomputed on every turn"""
+    recent = conversation_summary.SUMMARY_RECENT_MESSAGES
+    step = conversation_summary.SUMMARY_MIN_NEW_MESSAGES
+    summarized = 20
+    assert not needs_summary_update(recent + summarized + 1, summarized)
+    assert needs_summary_update(recent + summarized + step, summarized)
+
+
+def test_summary_message():
+    """The summary is sent as a system message"""
+    message = summary_system_message("The user is planning a trip to Lisbon.")
+    assert message['role'] == 'system'
+    assert 'Lisbon' in message['content']
+
+
+def _sqlite_app():
+    """Flask app with the User, Conversation and Message tables on in-memory sqlite"""
+    from database import db
+    from models import User, Conversation, Message
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[User.__table__, Conversation.__table__, Message.__table__])
+    return app
+
+
+def _add_messages(conversation_id, start, count):
+    from database import db
+    from models import Message
+
+    for index in range(start, start + count):
+        db.session.add(Message(conversation_id=conversation_id, role='user' if index % 2 else 'assistant',
+                               content=f"turn-{index:02d}"))
+    db.session.commit()
+
+
+def _with_summaries(replies):
+    """Stub _request_summary with canned replies; returns the recorded requests"""
+    requests_made = []
+
+    def request_summary(previous_summary, transcript):
+        requests_made.append((previous_summary, transcript))
+        return replies.pop(0)
+
+    conversation_summary._request_summary = request_summary
+    return requests_made
+
+
+def test_update_folds_aged_out_messages():
+    """Only messages older than the recent window are sent, and the stored position advances"""
+    from database import db
+    from models import Conversation
+    from history_window import count_tokens
+
+    recent = conversation_summary.SUMMARY_RECENT_MESSAGES
+    step = conversation_summary.SUMMARY_MIN_NEW_MESSAGES
+    app = _sqlite_app()
+    original = conversation_summary._request_summary
+    requests_made = _with_summaries(["The user asked about Lisbon.", "The user booked a flight to Lisbon."])
+    try:
+        with app.app_context():
+            conversation = Conversation(title='Trip', share_id='summary-test')
+            db.session.add(conversation)
+            db.session.commit()
+            _add_messages(conversation.id, 1, recent + step)
+
+            assert update_conversation_summary(conversation.id)
+            previous, transcript = requests_made[0]
+            assert previous is None
+            assert 'turn-01' in transcript and f"turn-{step:02d}" in transcript
+            assert f"turn-{step + 1:02d}" not in transcript
+
+            conversation = db.session.get(Conversation, conversation.id)
+            assert conversation.history_summary == "The user asked about Lisbon."
+            first_id = conversation.summary_message_id
+            assert first_id is not None
+            assert conversation.summary_token_count == count_tokens("The user asked about Lisbon.")
+
+            # Up to date: no request until another `step` messages age out
+            assert not update_conversation_summary(conversation.id)
+            _add_messages(conversation.id, recent + step + 1, step)
+            assert update_conversation_summary(conversation.id)
+            previous, transcript = requests_made[1]
+            assert previous == "The user asked about Lisbon."
+            assert f"turn-{step:02d}" not in transcript
+            assert f"turn-{step + 1:02d}" in transcript and f"turn-{2 * step:02d}" in transcript
+            assert f"turn-{2 * step + 1:02d}" not in transcript
+
+            conversation = db.session.get(Conversation, conversation.id)
+            assert conversation.summary_message_id == first_id + step
+            assert conversation.summary_token_count == count_tokens("The user booked a flight to Lisbon.")
+    finally:
+        conversation_summary._request_summary = original
+    assert len(requests_made) == 2
+
+
+def test_failed_update_keeps_previous_summary():
+    """When no summary comes back the stored summary and position are left alone"""
+    from database import db
+    from models import Conversation, Message
+
+    recent = conversation_summary.SUMMARY_RECENT_MESSAGES
+    step = conversation_summary.SUMMARY_MIN_NEW_MESSAGES
+    app = _sqlite_app()
+    original = conversation_summary._request_summary
+    requests_made = _with_summaries([None])
+    try:
+        with app.app_context():
+            conversation = Conversation(title='Trip', share_id='summary-failure')
+            db.session.add(conversation)
+            db.session.commit()
+            _add_messages(conversation.id, 1, recent + step + 2)
+            # The first two messages are already summarized
+            covered_id = conversation.messages.order_by(Message.id).all()[1].id
+            conversation.history_summary = "Earlier summary."
+            conversation.summary_message_id = covered_id
+            conversation.summary_token_count = 3
+            db.session.commit()
+
+            assert not update_conversation_summary(conversation.id)
+            conversation = db.session.get(Conversation, conversation.id)
+            assert conversation.history_summary == "Earlier summary."
+            assert conversation.summary_message_id == covered_id
+            assert conversation.summary_token_count == 3
+    finally:
+        conversation_summary._request_summary = original
+    previous, transcript = requests_made[0]
+    assert previous == "Earlier summary."
+    assert 'turn-02' not in transcript and 'turn-03' in transcript
+
+
+if __name__ == "__main__":
+    test_short_conversations_are_not_summarized()
+    test_summary_recomputed_only_when_turns_age_out()
+    test_summary_message()
+    test_update_folds_aged_out_messages()
+    test_failed_update_keeps_previous_summary()
+    logger.info("Conversation summary tests passed")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Test the credit ledger's fallbacks and reservation bookkeeping: without Redis
+callers get None and use the database, a reservation is settled or released
+exactly once, a balance is loaded from one consistent query, a load racing a
+turn's usage commit doesn't charge the turn twice, and a direct debit drops
+the mirrored balance.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from flask import Flask
+from sqlalchemy import event
+
+import credit_ledger
+from credit_ledger import CreditReservation, get_available_credits, reserve_credits
+
+
+def _with_scripts(settle_calls):
+    """Point the ledger at recording scripts instead of Redis"""
+    original = credit_ledger.get_ledger_client, dict(credit_ledger._scripts)
+    credit_ledger.get_ledger_client = lambda: object()
+    credit_ledger._scripts['settle'] = lambda keys, args: settle_calls.append((keys, args))
+    credit_ledger._scripts['reserve'] = lambda keys, args: [min(args[2], 500), 500]
+    return original
+
+
+def _restore(original):
+    credit_ledger.get_ledger_client = original[0]
+    credit_ledger._scripts.clear()
+    credit_ledger._scripts.update(original[1])
+
+
+def _sqlite_app():
+    """Flask app with the User and Usage tables on in-memory sqlite"""
+    from database import db
+    from models import User, Usage
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[User.__table__, Usage.__table__])
+    return app
+
+
+class LedgerRedis:
+    """Balance keys in a dict, with the settle script's charge logic"""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+    def settle(self, keys, args):
+        if int(args[1]) > 0 and keys[0] in self.values:
+            self.values[keys[0]] -= int(args[1])
+            return self.values[keys[0]]
+        return None
+
+
+def test_unavailable_ledger_falls_back():
+    """Without Redis, balance checks and reservations return None"""
+    original = credit_ledger.get_ledger_client
+    credit_ledger.get_ledger_client = lambda: None
+    try:
+        assert get_available_credits(1) is None
+        assert reserve_credits(1, 100) is None
+    finally:
+        credit_ledger.get_ledger_client = original
+
+
+def test_reservation_capped_at_available():
+    """A turn is granted what is left when its estimate exceeds the balance"""
+    settle_calls = []
+    original = _with_scripts(settle_calls)
+    try:
+        small = reserve_credits(7, 120)
+        large = reserve_credits(7, 2000)
+    finally:
+        _restore(original)
+
+    assert small.granted and small.amount == 120
+    assert large.granted and large.amount == 500
+
+
+def test_settle_once():
+    """Settling charges the actual cost once; a later release is a no-op"""
+    settle_calls = []
+    original = _with_scripts(settle_calls)
+    try:
+        reservation = CreditReservation(7, 'abc', 300, 1000)
+        reservation.settle(250)
+        reservation.settle(250)
+        reservation.release()
+    finally:
+        _restore(original)
+
+    assert len(settle_calls) == 1
+    keys, args = settle_calls[0]
+    assert keys[0] == 'credits:user:7:balance'
+    assert args == ['abc', 250]
+
+
+def test_insufficient_reservation_is_inert():
+    """A reservation that got nothing never touches Redis"""
+    settle_calls = []
+    original = _with_scripts(settle_calls)
+    try:
+        reservation = CreditReservation(7, 'abc', 0, 0)
+        assert not reservation.granted
+        reservation.release()
+    finally:
+        _restore(original)
+
+    assert settle_calls == []
+
+
+def test_balance_loaded_in_one_statement():
+    """Credits and unreconciled usage are read together, so a reconcile can't land in between"""
+    from database import db
+    from models import User, Usage
+
+    app = _sqlite_app()
+    with app.app_context():
+        db.session.add_all([
+            User(id=7, username='ana', email='ana@example.com', credits=1000),
+            User(id=8, username='ben', email='ben@example.com', credits=5000),
+            Usage(user_id=7, credits_used=300, usage_type='chat', reconciled=True),
+            Usage(user_id=7, credits_used=200, usage_type='chat', reconciled=False),
+            Usage(user_id=7, credits_used=50, usage_type='chat', reconciled=False),
+            Usage(user_id=8, credits_used=999, usage_type='chat', reconciled=False),
+        ])
+        db.session.commit()
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        client = LedgerRedis()
+        try:
+            assert credit_ledger._load_balance(client, 7)
+            assert not credit_ledger._load_balance(client, 99)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert client.values == {'credits:user:7:balance': 750}
+    assert len(statements) == 2
+
+
+def test_load_after_usage_commit_charges_once():
+    """A balance load landing right after the turn's usage commit doesn't subtract it again"""
+    from database import db
+    from models import User, Usage
+
+    app = _sqlite_app()
+    client = LedgerRedis()
+    original = credit_ledger.get_ledger_client, dict(credit_ledger._scripts)
+    credit_ledger.get_ledger_client = lambda: client
+    credit_ledger._scripts['settle'] = client.settle
+    balance_key = 'credits:user:7:balance'
+
+    def commit_usage(amount, then_load, fail=False):
+        def commit():
+            if fail:
+                db.session.rollback()
+                raise RuntimeError("database unavailable")
+            db.session.add(Usage(user_id=7, credits_used=amount, usage_type='chat', reconciled=False))
+            db.session.commit()
+            then_load()
+        return commit
+
+    try:
+        with app.app_context():
+            db.session.add(User(id=7, username='ana', email='ana@example.com', credits=1000))
+            db.session.commit()
+            assert credit_ledger._load_balance(client, 7)
+
+            # Another worker loads the balance between the commit and the end of the turn
+            CreditReservation(7, 'first', 300, 1000).commit_charge(
+                200, commit_usage(200, lambda: credit_ledger._load_balance(client, 7)))
+            assert client.values[balance_key] == 800
+
+            # The mirror expired meanwhile, so the load reads the committed usage instead
+            def expire_and_load():
+                client.delete(balance_key)
+                credit_ledger._load_balance(client, 7)
+            CreditReservation(7, 'second', 300, 800).commit_charge(100, commit_usage(100, expire_and_load))
+            assert client.values[balance_key] == 700
+
+            # A failed commit undoes the charge by reloading from Postgres
+            try:
+                CreditReservation(7, 'third', 300, 700).commit_charge(
+                    300, commit_usage(300, lambda: None, fail=True))
+                assert False, "commit error should propagate"
+            except RuntimeError:
+                pass
+            assert balance_key not in client.values
+            assert credit_ledger._load_balance(client, 7)
+            assert client.values[balance_key] == 700
+    finally:
+        _restore(original)
+
+
+def test_direct_debit_invalidates_balance():
+    """Usage deducted from User.credits drops the mirror; ledger-held usage leaves it alone"""
+    import billing
+    from database import db
+    from models import User
+
+    app = _sqlite_app()
+    invalidated = []
+    original = billing.invalidate_balance, billing.invalidate_user_context
+    billing.invalidate_balance = lambda user_id: invalidated.append(('balance', user_id))
+    billing.invalidate_user_context = lambda user_id: invalidated.append(('context', user_id))
+    try:
+        with app.app_context():
+            db.session.add(User(id=7, username='ana', email='ana@example.com', credits=1000))
+            db.session.commit()
+
+            billing.record_usage(7, 100, 'chat')
+            assert invalidated == [('balance', 7), ('context', 7)]
+            billing.record_usage(7, 100, 'chat', deduct=False)
+            assert len(invalidated) == 2
+            assert db.session.get(User, 7).credits == 900
+    finally:
+        billing.invalidate_balance, billing.invalidate_user_context = original
+
+
+if __name__ == "__main__":
+    test_unavailable_ledger_falls_back()
+    test_reservation_capped_at_available()
+    test_settle_once()
+    test_insufficient_reservation_is_inert()
+    test_balance_loaded_in_one_statement()
+    test_load_after_usage_commit_charges_once()
+    test_direct_debit_invalidates_balance()
+    logger.info("Credit ledger tests passed")
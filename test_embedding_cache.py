@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the embedding cache: an embedding is computed once per model and text,
+served from process memory or Redis afterwards, stored losslessly as float32,
+and lookups are reported by tier.
+"""
+import sys
+import logging
+from array import array
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+class BytesRedisClient:
+    """GET/SET on a dict of bytes"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+
+def _cache(model, redis_client=None):
+    cache = EmbeddingCache(model)
+    cache.redis_client = redis_client or BytesRedisClient()
+    cache._redis_checked = True
+    return cache
+
+
+def _vector(seed):
+    # Values exactly representable as float32, like the API's embeddings
+    return array('f', [seed + i / 8 for i in range(16)]).tolist()
+
+
+def test_computed_once_per_text():
+    """Repeated text hits memory; different text or model is a separate entry"""
+    calls = []
+
+    def compute(text):
+        calls.append(text)
+        return _vector(len(calls))
+
+    cache = _cache('test-model')
+    first = cache.get_or_compute('what did I say about Rust?', compute)
+    assert cache.get_or_compute('what did I say about Rust?', compute) == first
+    cache.get_or_compute('something else', compute)
+    assert len(calls) == 2
+
+    other_model = _cache('other-model', cache.redis_client)
+    assert cache.key('something else') != other_model.key('something else')
+    assert other_model.get('something else') is None
+
+
+def test_shared_tier_and_float32_roundtrip():
+    """Another worker's embedding is read from Redis without loss and returned as a fresh list"""
+    shared = BytesRedisClient()
+    writer = _cache('test-shared', shared)
+    vector = _vector(3)
+    writer.put('hello', vector)
+    assert len(next(iter(shared.values.values()))) == 4 * len(vector)
+
+    reader = _cache('test-shared', shared)
+    result = reader.get('hello')
+    assert result == vector
+    result.append(0.0)
+    assert reader.get('hello') == vector
+    assert (reader.local.hits, reader.local.l2_hits, reader.local.misses) == (1, 1, 0)
+
+
+def test_hit_ratio_metric():
+    """The collector reports lookups by tier and the hit ratio per model"""
+    cache = embedding_cache.get_embedding_cache('test-metrics')
+    cache.redis_client = BytesRedisClient()
+    cache._redis_checked = True
+    cache.get_or_compute('a', lambda text: _vector(1))
+    cache.get('a')
+    cache.get('a')
+
+    samples = {(name, labels.get('tier')): value
+               for name, _, _, labels, value in embedding_cache._embedding_cache_collector()
+               if labels['model'] == 'test-metrics'}
+    assert samples[('embedding_cache_lookups_total', 'l1')] == 2
+    assert samples[('embedding_cache_lookups_total', 'miss')] == 1
+    assert abs(samples[('embedding_cache_hit_ratio', None)] - 2 / 3) < 1e-9
+
+
+if __name__ == "__main__":
+    test_computed_once_per_text()
+    test_shared_tier_and_float32_roundtrip()
+    test_hit_ratio_metric()
+    logger.info("Embedding cache tests passed")
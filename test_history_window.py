@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test token counting and the history budget used to fit conversation history
+into the target model's context window, including after memory and document
+context are injected.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import history_window
+from history_window import (count_tokens, count_prompt_tokens, history_token_budget, message_token_count_default,
+                            prompt_token_budget, trim_history)
+
+
+def test_count_tokens():
+    """Empty content costs nothing; longer text costs more"""
+    assert count_tokens('') == 0
+    assert count_tokens(None) == 0
+    short = count_tokens('Hello there')
+    long = count_tokens('Hello there, ' * 50)
+    assert 0 < short < long
+
+
+def test_column_default_uses_content():
+    """The Message.token_count default counts the inserted content"""
+    class Context:
+        def get_current_parameters(self):
+            return {'content': 'How many tokens is this?'}
+
+    assert message_token_count_default(Context()) == count_tokens('How many tokens is this?')
+
+
+def test_count_prompt_tokens():
+    """Prompt estimates cover text parts, images and per-message overhead"""
+    text_only = [{'role': 'user', 'content': 'Describe this picture'}]
+    with_image = [{'role': 'user', 'content': [
+        {'type': 'text', 'text': 'Describe this picture'},
+        {'type': 'image_url', 'image_url': {'url': 'https://example.com/cat.png'}}
+    ]}]
+    assert count_prompt_tokens(text_only) == count_tokens('Describe this picture') + history_window.MESSAGE_OVERHEAD_TOKENS
+    assert count_prompt_tokens(with_image) == count_prompt_tokens(text_only) + history_window.IMAGE_TOKENS
+
+
+def test_budget_scales_with_context_length():
+    """Bigger context windows leave more room; the reply and prompt are reserved"""
+    small = history_token_budget(8192)
+    large = history_token_budget(200000)
+    assert 0 < small < large
+    assert large < 200000
+
+    with_prompt = history_token_budget(8192, prompt_tokens=1000)
+    assert with_prompt == small - 1000
+
+    with_max_tokens = history_token_budget(8192, completion_tokens=500)
+    assert with_max_tokens > small
+
+
+def test_budget_unknown_model_and_cap():
+    """Unknown models use the default context length; the budget is never negative"""
+    assert history_token_budget(None) == history_token_budget(history_window.DEFAULT_CONTEXT_LENGTH)
+    assert history_token_budget(1000, prompt_tokens=5000) == 0
+
+
+def test_trim_after_injected_context():
+    """Injected context pushes out the oldest turns, never system messages or the current turn"""
+    history = [{'role': role, 'content': f"turn {i} " * 40}
+               for i, role in enumerate(['user', 'assistant'] * 3)]
+    messages = ([{'role': 'system', 'content': 'Be helpful.'}] + history +
+                [{'role': 'user', 'content': 'And now?'}])
+    budget = count_prompt_tokens(messages)
+    assert trim_history(messages, budget) == 0
+
+    context = {'role': 'system', 'content': 'Relevant facts: ' + 'the user likes Rust. ' * 30}
+    messages.insert(0, context)
+    dropped = trim_history(messages, budget)
+    assert dropped > 0
+    assert count_prompt_tokens(messages) <= budget
+    assert messages[:2] == [context, {'role': 'system', 'content': 'Be helpful.'}]
+    assert messages[2:-1] == history[dropped:]
+    assert messages[-1]['content'] == 'And now?'
+
+    # Nothing left to drop: the prompt is sent as is
+    assert trim_history(messages, 0) == len(history) - dropped
+    assert [m['role'] for m in messages] == ['system', 'system', 'user']
+    assert prompt_token_budget(8192) == history_token_budget(8192)
+
+
+if __name__ == "__main__":
+    test_count_tokens()
+    test_column_default_uses_content()
+    test_count_prompt_tokens()
+    test_budget_scales_with_context_length()
+    test_budget_unknown_model_and_cap()
+    test_trim_after_injected_context()
+    logger.info("History window tests passed")
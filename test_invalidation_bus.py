@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test the invalidation bus: received events reach the handlers for their topic,
+the propagation delay is recorded, and a worker whose catalog already has the
+published version does not reload it.
+"""
+import sys
+import json
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import model_catalog
+import invalidation_bus
+from metrics import registry
+
+
+def test_dispatch_runs_topic_handlers():
+    """Handlers get their topic's events and the delay is observed"""
+    received = []
+    invalidation_bus.subscribe('test_topic', received.append)
+    invalidation_bus.subscribe('other_topic', lambda event: received.append('wrong'))
+
+    invalidation_bus.dispatch(json.dumps({'topic': 'test_topic', 'version': 3,
+                                          'published_at': time.time() - 0.25}))
+    invalidation_bus.dispatch('not json')
+
+    assert [event['version'] for event in received] == [3]
+    summary = registry.get_summary('cache_invalidation_delay_seconds', topic='test_topic')
+    assert summary['count'] == 1
+    assert 0.25 <= summary['sum'] < 5
+
+
+def test_failing_handler_does_not_block_others():
+    """One broken handler doesn't stop the rest"""
+    received = []
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    invalidation_bus.subscribe('fragile_topic', broken)
+    invalidation_bus.subscribe('fragile_topic', received.append)
+    invalidation_bus.dispatch(json.dumps({'topic': 'fragile_topic', 'published_at': time.time()}))
+    assert len(received) == 1
+
+
+def test_catalog_reloads_only_when_behind():
+    """A model_catalog event reloads the catalog unless it already has that version"""
+    reloads = []
+    original_refresh = model_catalog.refresh_model_catalog
+    model_catalog.refresh_model_catalog = lambda: reloads.append(True)
+    original_catalog = model_catalog._catalog
+    model_catalog._catalog = model_catalog.ModelCatalog([], version=1, change_version=7)
+    try:
+        model_catalog._on_catalog_invalidated({'version': 7})
+        model_catalog._on_catalog_invalidated({'version': 8})
+        model_catalog._on_catalog_invalidated({'version': None})
+    finally:
+        model_catalog.refresh_model_catalog = original_refresh
+        model_catalog._catalog = original_catalog
+
+    assert reloads == [True, True]
+
+
+if __name__ == "__main__":
+    test_dispatch_runs_topic_handlers()
+    test_failing_handler_does_not_block_others()
+    test_catalog_reloads_only_when_behind()
+    logger.info("Invalidation bus tests passed")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test the in-process metrics registry, chat stage tracing and the
+Prometheus text output served at /metrics.
+"""
+import os
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from flask import Flask
+
+from metrics import MetricsRegistry, StageTrace, init_metrics, registry
+
+
+def test_summary_quantiles():
+    """p50/p95/p99 are computed over the recorded window"""
+    test_registry = MetricsRegistry()
+    for i in range(1, 101):
+        test_registry.observe('latency_seconds', i / 100.0, model='openai/gpt-4o')
+
+    summary = test_registry.get_summary('latency_seconds', model='openai/gpt-4o')
+    assert summary['count'] == 100
+    assert abs(summary['p50'] - 0.5) < 0.02
+    assert abs(summary['p95'] - 0.95) < 0.02
+    assert abs(summary['p99'] - 0.99) < 0.02
+
+
+def test_stage_trace_publishes_per_model():
+    """A finished trace records each stage once, labelled by model"""
+    registry.reset()
+    trace = StageTrace('chat', model='openai/gpt-4o')
+    trace.checkpoint('parse')
+    with trace.span('memory_enrichment'):
+        pass
+    trace.checkpoint('payload_build')
+    trace.finish()
+    trace.finish()  # second call is a no-op
+
+    for stage in ('parse', 'memory_enrichment', 'payload_build'):
+        summary = registry.get_summary('chat_stage_seconds', stage=stage, model='openai/gpt-4o')
+        assert summary is not None and summary['count'] == 1, stage
+    registry.reset()
+
+
+def test_prometheus_text_format():
+    """Rendered output follows the Prometheus text exposition format"""
+    test_registry = MetricsRegistry()
+    test_registry.inc('requests_total', help='Requests', route='/chat')
+    test_registry.observe('stage_seconds', 0.25, stage='parse', model='a"b')
+
+    text = test_registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert '# TYPE stage_seconds summary' in text
+    assert 'quantile="0.99"' in text
+    assert 'model="a\\"b"' in text
+    assert 'stage_seconds_count{' in text
+
+
+def test_endpoint_access():
+    """Without METRICS_TOKEN only direct local scrapes are served; with it the token is required"""
+    app = Flask(__name__)
+    init_metrics(app)
+    client = app.test_client()
+    remote = {'REMOTE_ADDR': '203.0.113.7'}
+    previous = os.environ.pop('METRICS_TOKEN', None)
+    try:
+        assert client.get('/metrics', environ_base=remote).status_code == 401
+        assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 401
+        assert client.get('/metrics').status_code == 200
+
+        os.environ['METRICS_TOKEN'] = 'scrape-secret'
+        assert client.get('/metrics').status_code == 401
+        response = client.get('/metrics', environ_base=remote,
+                              headers={'Authorization': 'Bearer scrape-secret'})
+        assert response.status_code == 200
+    finally:
+        os.environ.pop('METRICS_TOKEN', None)
+        if previous is not None:
+            os.environ['METRICS_TOKEN'] = previous
+
+
+if __name__ == "__main__":
+    test_summary_quantiles()
+    test_stage_trace_publishes_per_model()
+    test_prometheus_text_format()
+    test_endpoint_access()
+    logger.info("Metrics tests passed")
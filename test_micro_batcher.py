@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the micro batcher: concurrent submissions are coalesced into one batch
+call, batches are capped at max_batch, and a failed batch call raises in every
+caller that joined it.
+"""
+import sys
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from micro_batcher import MicroBatcher
+
+
+def _submit_concurrently(batcher, items):
+    """Submit each item from its own thread; returns results and errors by item"""
+    results, errors = {}, {}
+    start = threading.Barrier(len(items))
+
+    def worker(item):
+        start.wait()
+        try:
+            results[item] = batcher.submit(item)
+        except Exception as e:
+            errors[item] = e
+
+    threads = [threading.Thread(target=worker, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_calls_share_a_batch():
+    """Calls arriving within max_wait become one batch call, each getting its own result"""
+    calls = []
+
+    def square(items):
+        calls.append(list(items))
+        return [item * item for item in items]
+
+    batcher = MicroBatcher(square, max_batch=16, max_wait=0.2, name='test')
+    results, errors = _submit_concurrently(batcher, list(range(6)))
+    assert not errors
+    assert results == {item: item * item for item in range(6)}
+    assert len(calls) == 1 and sorted(calls[0]) == list(range(6))
+
+
+def test_batches_capped_at_max_batch():
+    """A full batch runs at once; the rest go in further batches"""
+    calls = []
+
+    def identity(items):
+        calls.append(len(items))
+        return list(items)
+
+    batcher = MicroBatcher(identity, max_batch=3, max_wait=0.2, name='test')
+    results, errors = _submit_concurrently(batcher, list(range(7)))
+    assert not errors and results == {item: item for item in range(7)}
+    assert max(calls) <= 3 and sum(calls) == 7
+
+
+def test_batch_error_reaches_every_caller():
+    """An exception from the batch function is raised in all callers of that batch"""
+    def fail(items):
+        raise RuntimeError("embeddings endpoint unavailable")
+
+    batcher = MicroBatcher(fail, max_batch=8, max_wait=0.2, name='test')
+    results, errors = _submit_concurrently(batcher, ['a', 'b', 'c'])
+    assert not results
+    assert set(errors) == {'a', 'b', 'c'}
+    assert all(isinstance(e, RuntimeError) for e in errors.values())
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_a_batch()
+    test_batches_capped_at_max_batch()
+    test_batch_error_reaches_every_caller()
+    logger.info("Micro batcher tests passed")
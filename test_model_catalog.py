@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the in-process model catalog used by the /chat hot path.
+
+These tests build catalogs from plain entry dicts, so no database is needed.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import model_catalog
+from model_catalog import ModelCatalog, swap_model_catalog
+
+
+def _entry(model_id, **overrides):
+    entry = {
+        'model_id': model_id,
+        'name': model_id.split('/')[-1],
+        'context_length': 128000,
+        'input_price_usd_million': 1.0,
+        'output_price_usd_million': 2.0,
+        'is_multimodal': False,
+        'is_free': False,
+        'supports_reasoning': False,
+        'supports_pdf': False,
+        'cost_band': '$$',
+        'elo_score': None,
+        'model_is_active': True,
+    }
+    entry.update(overrides)
+    return entry
+
+
+SAMPLE_ENTRIES = [
+    _entry('openai/gpt-4o', is_multimodal=True, supports_pdf=True, output_price_usd_million=20.0),
+    _entry('anthropic/claude-3.7-sonnet', is_multimodal=True, supports_reasoning=True,
+           output_price_usd_million=30.0, context_length=200000),
+    _entry('deepseek/deepseek-r1', supports_reasoning=True, output_price_usd_million=5.0),
+    _entry('old/retired-model', model_is_active=False, output_price_usd_million=100.0),
+]
+
+
+def test_capability_lookups():
+    """Capability and pricing lookups answer from the snapshot"""
+    catalog = ModelCatalog(SAMPLE_ENTRIES, version=1)
+
+    assert catalog.is_available('openai/gpt-4o')
+    assert not catalog.is_available('old/retired-model')
+    assert not catalog.is_available('unknown/model')
+
+    assert catalog.supports_multimodal('openai/gpt-4o') is True
+    assert catalog.supports_multimodal('deepseek/deepseek-r1') is False
+    assert catalog.supports_multimodal('unknown/model') is None
+
+    assert catalog.supports_pdf('openai/gpt-4o') is True
+    assert catalog.supports_reasoning('deepseek/deepseek-r1') is True
+    assert catalog.context_length('anthropic/claude-3.7-sonnet') == 200000
+
+    pricing = catalog.pricing('openai/gpt-4o')
+    assert pricing['prompt_cost_per_million'] == 1.0
+    assert pricing['completion_cost_per_million'] == 20.0
+    assert catalog.pricing('unknown/model') is None
+
+
+def test_entries_are_read_only():
+    """Catalog entries cannot be mutated after construction"""
+    catalog = ModelCatalog(SAMPLE_ENTRIES, version=1)
+    entry = catalog.get('openai/gpt-4o')
+    try:
+        entry['is_multimodal'] = False
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Catalog entry should be immutable")
+
+
+def test_best_model_selection():
+    """best_model ignores inactive models and respects capability filters"""
+    catalog = ModelCatalog(SAMPLE_ENTRIES, version=1)
+
+    assert catalog.best_model() == 'anthropic/claude-3.7-sonnet'
+    assert catalog.best_model(reasoning=True) == 'anthropic/claude-3.7-sonnet'
+    assert catalog.best_model(multimodal=True) == 'anthropic/claude-3.7-sonnet'
+
+
+def test_swap_bumps_version_only_on_change():
+    """Swapping identical content keeps the version; changed content bumps it"""
+    model_catalog._catalog = None
+
+    first = swap_model_catalog(SAMPLE_ENTRIES)
+    same = swap_model_catalog([dict(e) for e in SAMPLE_ENTRIES])
+    assert same is first
+
+    repriced = [dict(e) for e in SAMPLE_ENTRIES]
+    repriced[0]['output_price_usd_million'] = 25.0
+    second = swap_model_catalog(repriced)
+    assert second.version == first.version + 1
+    assert model_catalog.get_model_catalog() is second
+
+    model_catalog._catalog = None
+
+
+if __name__ == "__main__":
+    test_capability_lookups()
+    test_entries_are_read_only()
+    test_best_model_selection()
+    test_swap_bumps_version_only_on_change()
+    logger.info("All model catalog tests passed")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test the billing price lookup: known models are priced from the in-process
+catalog, unknown models get estimated prices and queue one background refresh.
+"""
+import sys
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import price_updater
+from model_catalog import swap_model_catalog
+
+
+def _install_catalog():
+    swap_model_catalog([{
+        'model_id': 'openai/gpt-4o',
+        'name': 'GPT-4o',
+        'context_length': 128000,
+        'input_price_usd_million': 5.0,
+        'output_price_usd_million': 15.0,
+        'is_multimodal': True,
+        'is_free': False,
+        'supports_reasoning': False,
+        'supports_pdf': False,
+        'cost_band': '$$$',
+        'elo_score': None,
+        'model_is_active': True,
+    }])
+
+
+def test_known_model_priced_from_catalog():
+    """Prices come from the catalog without a database or API call"""
+    _install_catalog()
+    cost = price_updater.get_model_cost('openai/gpt-4o')
+    assert cost['prompt_cost_per_million'] == 5.0
+    assert cost['completion_cost_per_million'] == 15.0
+    assert cost['source'] == 'catalog'
+
+
+def test_unknown_model_queues_one_refresh():
+    """Misses return an estimate immediately and refresh prices in the background once"""
+    _install_catalog()
+    refreshes = []
+    original_fetch = price_updater.fetch_and_store_openrouter_prices
+    price_updater.fetch_and_store_openrouter_prices = lambda force_update=False: refreshes.append(force_update)
+    price_updater._missing_price_refresh_at = 0.0
+    try:
+        first = price_updater.get_model_cost('new-vendor/new-model')
+        second = price_updater.get_model_cost('new-vendor/other-model')
+        for thread in [t for t in threading.enumerate() if t.name == 'missing-price-refresh']:
+            thread.join(timeout=1.0)
+    finally:
+        price_updater.fetch_and_store_openrouter_prices = original_fetch
+
+    assert first['source'] == 'fallback'
+    assert second['source'] == 'fallback'
+    assert refreshes == [True]
+
+
+if __name__ == "__main__":
+    test_known_model_priced_from_catalog()
+    test_unknown_model_queues_one_refresh()
+    logger.info("Model cost tests passed")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test the precomputed model list payloads: one body per catalog version,
+content negotiation between gzip and identity, 304 on a matching ETag and
+since=<version> deltas from the catalog change log, which every model table
+writer records to.
+"""
+import sys
+import gzip
+import json
+import logging
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import catalog_changelog
+from model_catalog import ModelCatalog
+from model_payloads import (build_conditional_response, build_models_data, build_prices_data,
+                            get_prepared_payload)
+
+
+def _entry(model_id, name, input_price, reasoning=False, updated_at=None, active=True):
+    return {
+        'model_id': model_id,
+        'name': name,
+        'description': f"{name} is a large language model " * 20,
+        'context_length': 128000,
+        'input_price_usd_million': input_price,
+        'output_price_usd_million': input_price * 4,
+        'is_multimodal': False,
+        'is_free': input_price == 0,
+        'supports_reasoning': reasoning,
+        'supports_pdf': False,
+        'cost_band': '',
+        'elo_score': None,
+        'model_is_active': active,
+        'updated_at': updated_at,
+    }
+
+
+def _catalog(version=1, change_version=None):
+    return ModelCatalog([
+        _entry('openai/gpt-4o', 'GPT-4o', 5.0, updated_at=datetime(2025, 5, 1)),
+        _entry('anthropic/claude-3-opus', 'Claude 3 Opus', 15.0, updated_at=datetime(2025, 5, 3)),
+        _entry('deepseek/deepseek-r1', 'DeepSeek R1', 0.5, reasoning=True),
+        _entry('openrouter/auto', 'Auto Router', 0.0),
+        _entry('old/retired', 'Retired', 1.0, active=False),
+    ], version=version, change_version=change_version)
+
+
+def test_payload_contents():
+    """Reasoning comes from supports_reasoning, not model names; inactive models are left out"""
+    catalog = _catalog()
+    models = build_models_data(catalog, ['openai/gpt-4o'])['data']
+    assert [m['name'] for m in models] == ['Auto Router', 'Claude 3 Opus', 'DeepSeek R1', 'GPT-4o']
+    by_id = {m['id']: m for m in models}
+    assert by_id['deepseek/deepseek-r1']['is_reasoning'] is True
+    assert by_id['anthropic/claude-3-opus']['is_reasoning'] is False
+    assert by_id['openai/gpt-4o']['supports_pdf'] is True
+
+    prices = build_prices_data(catalog)
+    assert 'old/retired' not in prices['prices']
+    assert prices['prices']['openrouter/auto']['cost_band'] == 'Auto'
+    assert prices['prices']['openrouter/auto']['input_price'] is None
+    assert prices['prices']['deepseek/deepseek-r1']['cost_band'] == '$'
+    assert prices['last_updated'] == '2025-05-03T00:00:00'
+
+
+def test_rebuilt_only_on_new_version():
+    """The same catalog version reuses the serialized payload"""
+    builds = []
+
+    def builder(catalog):
+        builds.append(catalog.version)
+        return build_prices_data(catalog)
+
+    first = get_prepared_payload('test_prices', builder, catalog=_catalog(version=1))
+    again = get_prepared_payload('test_prices', builder, catalog=_catalog(version=1))
+    newer = get_prepared_payload('test_prices', builder, catalog=_catalog(version=2))
+
+    assert first is again
+    assert newer is not first
+    assert builds == [1, 2]
+    assert get_prepared_payload('test_prices', builder, catalog=ModelCatalog([], version=3)) is None
+
+
+def test_negotiation_and_not_modified():
+    """gzip is served when accepted, and any variant's ETag yields a 304"""
+    prepared = get_prepared_payload('test_models', build_models_data, catalog=_catalog(version=1))
+
+    status, headers, body = build_conditional_response(prepared, None, 'gzip, deflate')
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(gzip.decompress(body))['data'][0]['name'] == 'Auto Router'
+
+    status, headers, body = build_conditional_response(prepared, None, 'gzip;q=0')
+    assert status == 200
+    assert 'Content-Encoding' not in headers
+    assert body == prepared.body
+    identity_etag = headers['ETag']
+
+    status, headers, body = build_conditional_response(prepared, identity_etag, 'gzip')
+    assert status == 304
+    assert body == b''
+    assert headers['ETag'] == prepared.etags['gzip']
+
+    status, _, _ = build_conditional_response(prepared, '"stale"', 'gzip')
+    assert status == 200
+
+
+class ChangeLogRedis:
+    """Serves catalog:changes entries for zrangebyscore"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        return [(f"{v}:{json.dumps(c)}", float(v)) for v, c in self.entries if low <= v <= high]
+
+
+def test_changes_since_merges_log():
+    """Changes are merged across versions and a trimmed log means a full payload"""
+    original = catalog_changelog.get_changelog_client
+    client = ChangeLogRedis([
+        (4, {'deepseek/deepseek-r1': 'added'}),
+        (5, {'deepseek/deepseek-r1': 'repriced', 'openai/gpt-4o': 'repriced'}),
+        (6, {'old/retired': 'removed'}),
+    ])
+    catalog_changelog.get_changelog_client = lambda: client
+    try:
+        assert catalog_changelog.changes_since(3, 6) == {
+            'deepseek/deepseek-r1': 'added', 'openai/gpt-4o': 'repriced', 'old/retired': 'removed'}
+        assert catalog_changelog.changes_since(5, 6) == {'old/retired': 'removed'}
+        assert catalog_changelog.changes_since(6, 6) == {}
+        assert catalog_changelog.changes_since(1, 6) is None
+        assert catalog_changelog.changes_since(7, 6) is None
+    finally:
+        catalog_changelog.get_changelog_client = original
+
+
+def test_delta_payload():
+    """since= returns only changed and removed models; an uncovered version gets everything"""
+    original = catalog_changelog.changes_since
+    catalog_changelog.changes_since = lambda since, until: (
+        {'openai/gpt-4o': 'repriced', 'old/retired': 'removed'} if since == 5 else None)
+    try:
+        catalog = _catalog(version=1, change_version=6)
+        delta = get_prepared_payload('test_delta', build_prices_data, catalog=catalog, since=5)
+        full = get_prepared_payload('test_delta', build_prices_data, catalog=catalog, since=2)
+    finally:
+        catalog_changelog.changes_since = original
+
+    data = json.loads(delta.body)
+    assert data['delta'] is True
+    assert data['version'] == 6
+    assert list(data['prices']) == ['openai/gpt-4o']
+    assert data['removed'] == ['old/retired']
+    assert data['last_updated'] == '2025-05-03T00:00:00'
+
+    data = json.loads(full.body)
+    assert 'delta' not in data
+    assert len(data['prices']) == 4
+
+
+def test_publish_records_and_invalidates():
+    """A committed edit gets a change log entry and a catalog invalidation; no edit, no version"""
+    import invalidation_bus
+    recorded, published = [], []
+    original = catalog_changelog.record_catalog_changes, invalidation_bus.publish
+    catalog_changelog.record_catalog_changes = lambda changes: recorded.append(changes) or 7
+    invalidation_bus.publish = lambda topic, **data: published.append((topic, data)) or True
+    try:
+        version = catalog_changelog.publish_catalog_changes({'openai/gpt-4o': catalog_changelog.UPDATED})
+        assert catalog_changelog.publish_catalog_changes({}) is None
+    finally:
+        catalog_changelog.record_catalog_changes, invalidation_bus.publish = original
+
+    assert version == 7
+    assert recorded == [{'openai/gpt-4o': 'updated'}]
+    assert published == [(invalidation_bus.MODEL_CATALOG_TOPIC, {'version': 7, 'changed': 1})]
+
+
+if __name__ == "__main__":
+    test_payload_contents()
+    test_rebuilt_only_on_new_version()
+    test_negotiation_and_not_modified()
+    test_changes_since_merges_log()
+    test_delta_payload()
+    test_publish_records_and_invalidates()
+    logger.info("Model payload tests passed")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test the shared OpenRouter HTTP client: one pooled session per process and
+connection-reuse / handshake statistics.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import openrouter_client
+from openrouter_client import get_openrouter_session, get_connection_stats, reset_connection_stats
+
+
+def test_session_is_shared():
+    """Repeated calls in the same process return the same pooled session"""
+    first = get_openrouter_session()
+    second = get_openrouter_session()
+    assert first is second
+
+    adapter = first.get_adapter('https://openrouter.ai/api/v1/chat/completions')
+    assert isinstance(adapter, openrouter_client._PooledAdapter)
+
+
+def test_session_rebuilt_after_fork():
+    """A session created in another process (e.g. gunicorn master) is not reused"""
+    first = get_openrouter_session()
+    openrouter_client._session_pid = -1
+    second = get_openrouter_session()
+    assert second is not first
+
+
+def test_reuse_stats():
+    """Reuse ratio and handshake averages are derived from the raw counters"""
+    reset_connection_stats()
+    stats = openrouter_client._stats['requests']
+    for _ in range(4):
+        stats.record_request()
+    stats.record_handshake(0.2)
+
+    snapshot = get_connection_stats()['requests']
+    assert snapshot['requests'] == 4
+    assert snapshot['connections_opened'] == 1
+    assert snapshot['connections_reused'] == 3
+    assert snapshot['reuse_ratio'] == 0.75
+    assert abs(snapshot['handshake_seconds_avg'] - 0.2) < 1e-9
+    reset_connection_stats()
+
+
+if __name__ == "__main__":
+    test_session_is_shared()
+    test_session_rebuilt_after_fork()
+    test_reuse_stats()
+    logger.info("OpenRouter client tests passed")
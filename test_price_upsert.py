@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the diff used by the price updater: only new or changed models are
+written, unchanged ones are left alone and vanished models are deactivated.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from price_updater import build_model_row, classify_model_changes, diff_model_rows, _SYNCED_COLUMNS
+from benchmark_price_upsert import build_fixture, change_prices
+
+
+def _rows(prices, api_models):
+    return {model_id: build_model_row(model_id, entry, api_models[model_id]) for model_id, entry in prices.items()}
+
+
+def _stored(rows):
+    return {model_id: {column: row[column] for column in _SYNCED_COLUMNS} for model_id, row in rows.items()}
+
+
+def test_first_load_inserts_everything():
+    """With an empty table every model is written"""
+    api_models, prices = build_fixture(50)
+    changed, unchanged, missing = diff_model_rows(_rows(prices, api_models), {})
+    assert len(changed) == 50
+    assert unchanged == [] and missing == []
+
+
+def test_only_changed_rows_written():
+    """An unchanged refresh writes nothing; moved prices write just those rows"""
+    api_models, prices = build_fixture(100)
+    current = _stored(_rows(prices, api_models))
+
+    changed, unchanged, missing = diff_model_rows(_rows(prices, api_models), current)
+    assert changed == [] and len(unchanged) == 100 and missing == []
+
+    moved = change_prices(prices, fraction=0.1)
+    changed, unchanged, missing = diff_model_rows(_rows(moved, api_models), current)
+    assert len(changed) == 10 and len(unchanged) == 90
+
+
+def test_vanished_models_deactivated():
+    """Active models missing from the API are deactivated once"""
+    api_models, prices = build_fixture(20)
+    current = _stored(_rows(prices, api_models))
+    gone = sorted(prices)[:3]
+    for model_id in gone:
+        del prices[model_id]
+
+    _, _, missing = diff_model_rows(_rows(prices, api_models), current)
+    assert sorted(missing) == gone
+
+    for model_id in gone:
+        current[model_id]['model_is_active'] = False
+    _, _, missing = diff_model_rows(_rows(prices, api_models), current)
+    assert missing == []
+
+
+def test_missing_cost_band_generated():
+    """Models without a cost band get one generated from their price"""
+    row = build_model_row('vendor/free-model:free', {
+        'input_price': 0.0, 'output_price': 0.0, 'context_length': 'Unknown', 'is_multimodal': False,
+        'supports_pdf': False, 'model_name': 'Free Model', 'cost_band': ''
+    }, {'supported_parameters': ['include_reasoning']})
+    assert row['cost_band'] == 'Free'
+    assert row['is_free'] and row['supports_reasoning']
+    assert row['context_length'] is None
+
+
+def test_changes_classified_for_changelog():
+    """Repriced, new, reactivated and vanished models get their own change kinds"""
+    api_models, prices = build_fixture(20)
+    current = _stored(_rows(prices, api_models))
+    model_ids = sorted(prices)
+    prices.pop(model_ids[0])
+    del current[model_ids[1]]
+    current[model_ids[2]]['model_is_active'] = False
+    moved = change_prices({model_ids[3]: prices[model_ids[3]]}, fraction=1.0)
+    prices.update(moved)
+
+    changed, _, missing = diff_model_rows(_rows(prices, api_models), current)
+    changes = classify_model_changes(changed, current, missing)
+    assert changes == {
+        model_ids[0]: 'removed',
+        model_ids[1]: 'added',
+        model_ids[2]: 'added',
+        model_ids[3]: 'repriced',
+    }
+
+
+if __name__ == "__main__":
+    test_first_load_inserts_everything()
+    test_only_changed_rows_written()
+    test_vanished_models_deactivated()
+    test_missing_cost_band_generated()
+    test_changes_classified_for_changelog()
+    logger.info("Price upsert tests passed")
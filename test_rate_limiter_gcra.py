@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test RedisRateLimiter: one script call per admitted request, the script reply
+mapped to the rate limit fields, and bursts beyond a worker's own allowance
+rejected without contacting Redis.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from redis_rate_limiter import RedisRateLimiter
+
+
+class ScriptedRedisClient:
+    """Answers the GCRA script with a scripted reply and records the calls"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def register_script(self, script):
+        def run(keys, args):
+            self.calls.append((keys, args))
+            return self.reply
+        return run
+
+
+class StubRedisCache:
+    namespace = 'rate_limit:'
+
+    def __init__(self, client):
+        self.redis_client = client
+
+    def _get_full_key(self, key):
+        return f"{self.namespace}:{key}"
+
+
+def _limiter(reply):
+    limiter = RedisRateLimiter()
+    limiter.redis = StubRedisCache(ScriptedRedisClient(reply))
+    return limiter
+
+
+def test_script_reply_mapped():
+    """Allowed and limited replies become count/remaining/reset"""
+    limiter = _limiter([0, 17, 9000])
+    info = limiter.is_rate_limited('user:chat', 20)
+    assert info == {'limited': False, 'count': 3, 'limit': 20, 'remaining': 17, 'reset': 9}
+    keys, args = limiter.redis.redis_client.calls[0]
+    assert keys == ['rate_limit::user:chat'] and args[1:] == [20, 60000]
+
+    limiter.redis.redis_client.reply = [1, 0, 2500]
+    info = limiter.is_rate_limited('user:chat', 20)
+    assert info['limited'] and info['remaining'] == 0 and info['reset'] == 3
+
+
+def test_local_bucket_absorbs_burst():
+    """Past its own allowance a worker rejects locally; other keys are unaffected"""
+    limiter = _limiter([0, 4, 1000])
+    results = [limiter.is_rate_limited('ip:upload', 5)['limited'] for _ in range(8)]
+    assert results == [False] * 5 + [True] * 3
+    assert len(limiter.redis.redis_client.calls) == 5
+    assert not limiter.is_rate_limited('ip:other', 5)['limited']
+
+
+def test_without_redis_local_limit_applies():
+    """With Redis unavailable requests are admitted up to the per-worker limit"""
+    limiter = RedisRateLimiter()
+    limiter.redis = None
+    results = [limiter.is_rate_limited('ip:chat', 3)['limited'] for _ in range(4)]
+    assert results == [False, False, False, True]
+
+
+if __name__ == "__main__":
+    test_script_reply_mapped()
+    test_local_bucket_absorbs_burst()
+    test_without_redis_local_limit_applies()
+    logger.info("Rate limiter tests passed")
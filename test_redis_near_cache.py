@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the RedisCache near cache: hot keys are served from process memory after
+the first Redis read, entries expire and are evicted least recently used first,
+and writes from another worker drop the local copy.
+"""
+import os
+import sys
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import redis_cache
+from redis_cache import NearCache, RedisCache, LOCAL_CACHE_TOPIC
+
+
+class CountingRedisClient:
+    """GET/SET/DELETE on a dict, counting GETs"""
+
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+
+def _cache(namespace):
+    cache = RedisCache(namespace=namespace, local_cache=True)
+    cache.redis_client = CountingRedisClient()
+    return cache
+
+
+def test_near_cache_lru_and_ttl():
+    """Oldest untouched entry is evicted first and expired entries are misses"""
+    near = NearCache('test_lru', ttl=60, max_entries=2)
+    near.put('a', 1)
+    near.put('b', 2)
+    assert near.get('a') == 1
+    near.put('c', 3)
+    assert near.get('b') is redis_cache._MISSING
+    assert near.get('a') == 1 and near.get('c') == 3
+
+    near.put('short', 'x', ttl=0.05)
+    time.sleep(0.1)
+    assert near.get('short') is redis_cache._MISSING
+
+
+def test_second_get_served_from_memory():
+    """Only the first read reaches Redis and the hit ratio reflects it"""
+    cache = _cache('test_near_hits')
+    cache.redis_client.values['test_near_hits:pricing'] = '{"models": 3}'
+
+    assert cache.get('pricing') == {'models': 3}
+    assert cache.get('pricing') == {'models': 3}
+    assert cache.get('missing') is None
+    assert cache.redis_client.gets == 2
+    assert (cache.local.hits, cache.local.l2_hits, cache.local.misses) == (1, 1, 1)
+
+    cache.delete('pricing')
+    assert cache.get('pricing') is None
+
+
+def test_remote_write_drops_local_copy():
+    """An invalidation from another worker drops the key; our own events are ignored"""
+    cache = _cache('test_near_remote')
+    cache.set('prefs', {'theme': 'dark'})
+    cache.redis_client.values['test_near_remote:prefs'] = '{"theme": "light"}'
+
+    redis_cache._on_local_cache_invalidated({'topic': LOCAL_CACHE_TOPIC, 'origin': os.getpid(),
+                                             'namespace': 'test_near_remote', 'keys': ['prefs']})
+    assert cache.get('prefs') == {'theme': 'dark'}
+
+    redis_cache._on_local_cache_invalidated({'topic': LOCAL_CACHE_TOPIC, 'origin': -1,
+                                             'namespace': 'test_near_remote', 'keys': ['prefs']})
+    assert cache.get('prefs') == {'theme': 'light'}
+
+
+if __name__ == "__main__":
+    test_near_cache_lru_and_ttl()
+    test_second_get_served_from_memory()
+    test_remote_write_drops_local_copy()
+    logger.info("Redis near cache tests passed")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test the lazy Redis session: requests that don't use the session send no
+Redis commands, saves write only the changed fields with the TTL, and
+sessions stored in the old single-value format are migrated to a hash.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from flask import Flask
+
+from cache_codec import encode_value
+from redis_session import RedisSessionInterface
+
+
+class RecordingRedisClient:
+    """Hash and string commands on dicts, recording every command"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.strings = {}
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(('HGETALL', key))
+        return {field.encode(): value for field, value in self.hashes.get(key, {}).items()}
+
+    def get(self, key):
+        self.commands.append(('GET', key))
+        return self.strings.get(key)
+
+    def hset(self, key, mapping):
+        self.commands.append(('HSET', key, tuple(sorted(mapping))))
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel(self, key, *fields):
+        self.commands.append(('HDEL', key, tuple(sorted(fields))))
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def expire(self, key, seconds):
+        self.commands.append(('EXPIRE', key))
+
+    def delete(self, *keys):
+        self.commands.append(('DEL',) + keys)
+        for key in keys:
+            self.hashes.pop(key, None)
+            self.strings.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+
+# Real app so cookie settings come from its SESSION_COOKIE_* config
+app = Flask(__name__)
+
+
+class FakeRequest:
+    def __init__(self, sid=None):
+        self.cookies = {'session': sid} if sid else {}
+
+
+class FakeResponse:
+    def __init__(self):
+        self.cookies = {}
+        self.vary = set()
+
+    def set_cookie(self, name, value, **kwargs):
+        self.cookies[name] = value
+
+    def delete_cookie(self, name, **kwargs):
+        self.cookies[name] = None
+
+
+def _interface():
+    interface = RedisSessionInterface()
+    interface.redis.redis_client = RecordingRedisClient()
+    return interface, interface.redis.redis_client
+
+
+def _request(interface, sid, handler):
+    session = interface.open_session(app, FakeRequest(sid))
+    handler(session)
+    response = FakeResponse()
+    interface.save_session(app, session, response)
+    return session, response
+
+
+def test_untouched_session_costs_nothing():
+    """Static files and health checks with a cookie send no commands and set no cookie"""
+    interface, client = _interface()
+    _, response = _request(interface, 'abc', lambda session: None)
+    assert client.commands == [] and response.cookies == {}
+
+
+def test_changed_fields_only():
+    """A read is one HGETALL; a write sends only the changed field and the TTL"""
+    interface, client = _interface()
+    session, response = _request(interface, None, lambda s: s.update(user_identifier='temp_1', theme='dark'))
+    sid = session.sid
+    key = f"session:hash:{sid}"
+    assert response.cookies['session'] == sid
+    assert client.commands[0][:2] == ('HSET', key) and 'theme' in client.commands[0][2]
+
+    client.commands = []
+    session, _ = _request(interface, sid, lambda s: s.get('user_identifier'))
+    assert session['user_identifier'] == 'temp_1'
+    assert client.commands == [('HGETALL', key)]
+
+    client.commands = []
+    def update_theme(s):
+        s['theme'] = 'light'
+        del s['user_identifier']
+    _request(interface, sid, update_theme)
+    assert client.commands == [('HGETALL', key), ('HSET', key, ('__refreshed_at', 'theme')),
+                               ('HDEL', key, ('user_identifier',)), ('EXPIRE', key)]
+
+
+def test_legacy_session_migrated():
+    """A session in the old format is read once and rewritten as a hash"""
+    interface, client = _interface()
+    legacy_key = interface.redis._get_full_key('old')
+    client.strings[legacy_key] = encode_value('{"_user_id": "7"}')
+
+    session, _ = _request(interface, 'old', lambda s: s.get('_user_id'))
+    assert session['_user_id'] == '7'
+    assert legacy_key not in client.strings
+    assert '_user_id' in client.hashes['session:hash:old']
+
+
+if __name__ == "__main__":
+    test_untouched_session_costs_nothing()
+    test_changed_fields_only()
+    test_legacy_session_migrated()
+    logger.info("Lazy Redis session tests passed")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the concurrent pre-stream stage runner used by /chat: stages overlap,
+a stage past its deadline is skipped, and failures fall back to defaults.
+"""
+import sys
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from stage_fanout import StageFanout, GEVENT_AVAILABLE
+
+
+def _sleep(seconds, value):
+    if GEVENT_AVAILABLE:
+        import gevent
+        gevent.sleep(seconds)
+    else:
+        time.sleep(seconds)
+    return value
+
+
+def test_stages_run_concurrently():
+    """Total wait is close to the slowest stage, not the sum of all stages"""
+    if not GEVENT_AVAILABLE:
+        logger.info("gevent not installed, skipping concurrency test")
+        return
+
+    fanout = StageFanout()
+    start = time.perf_counter()
+    fanout.spawn('memory_enrichment', _sleep, 0.2, 'memory', deadline=1.0)
+    fanout.spawn('chat_settings', _sleep, 0.2, {'temperature': 0.5}, deadline=1.0)
+    assert fanout.result('memory_enrichment') == 'memory'
+    assert fanout.result('chat_settings') == {'temperature': 0.5}
+    assert time.perf_counter() - start < 0.35
+
+
+def test_deadline_returns_default():
+    """A stage that misses its deadline is skipped and its default is used"""
+    if not GEVENT_AVAILABLE:
+        logger.info("gevent not installed, skipping deadline test")
+        return
+
+    fanout = StageFanout()
+    start = time.perf_counter()
+    fanout.spawn('rag_retrieval', _sleep, 1.0, ['chunk'], default=[], deadline=0.1)
+    assert fanout.result('rag_retrieval') == []
+    assert time.perf_counter() - start < 0.5
+
+
+def test_failure_returns_default():
+    """Exceptions inside a stage never reach the request"""
+    def fail():
+        raise RuntimeError("boom")
+
+    fanout = StageFanout()
+    fanout.spawn('chat_settings', fail, default={})
+    assert fanout.result('chat_settings') == {}
+    assert fanout.result('never_spawned', default='fallback') == 'fallback'
+
+
+if __name__ == "__main__":
+    test_stages_run_concurrently()
+    test_deadline_returns_default()
+    test_failure_returns_default()
+    logger.info("Stage fan-out tests passed")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test resumable chat streams: events get ids and are recorded in a Redis Stream,
+a reconnect replays after Last-Event-ID, and a detached stream is cancelled
+when nobody reconnects.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+import stream_replay
+from stream_replay import new_stream_id, parse_event_id, publish_stream, replay_stream, stream_owner
+
+
+class InMemoryStreamRedis:
+    """The handful of Redis commands stream_replay uses, without a server"""
+
+    def __init__(self):
+        self.values = {}
+        self.streams = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def exists(self, key):
+        return int(key in self.values or key in self.streams)
+
+    def expire(self, key, seconds):
+        return True
+
+    def xadd(self, key, fields, id='*'):
+        self.streams.setdefault(key, []).append((id, dict(fields)))
+
+    def xread(self, streams, count=None, block=None):
+        key, cursor = next(iter(streams.items()))
+        after = int(cursor.split('-')[1])
+        entries = [e for e in self.streams.get(key, []) if int(e[0].split('-')[1]) > after][:count]
+        return [[key, entries]] if entries else []
+
+
+def _events(closed, count=5):
+    try:
+        for i in range(count):
+            yield f'data: {{"content": "part {i}"}}\n\n'
+            yield ": keepalive\n\n"
+    except GeneratorExit:
+        closed.append(True)
+        raise
+
+
+def test_event_ids():
+    """Event ids round-trip and foreign Last-Event-ID values are ignored"""
+    stream_id = new_stream_id()
+    assert parse_event_id(f"{stream_id}:7") == (stream_id, 7)
+    assert parse_event_id('42') is None
+    assert parse_event_id(None) is None
+    assert parse_event_id(f"../{stream_id}:1") is None
+
+
+def test_replay_after_last_event():
+    """A reconnect gets exactly the events after its Last-Event-ID, then the stream ends"""
+    client = InMemoryStreamRedis()
+    stream_id = new_stream_id()
+
+    sent = list(publish_stream(stream_id, _events([]), owner='12', client=client))
+    data_events = [e for e in sent if not e.startswith(':')]
+    assert len(data_events) == 5
+    assert data_events[0].startswith(f"id: {stream_id}:1\ndata: ")
+    assert stream_owner(stream_id, client=client) == '12'
+
+    replayed = list(replay_stream(stream_id, 0, client=client))
+    assert replayed == data_events
+
+    resumed = list(replay_stream(stream_id, 3, client=client))
+    assert resumed == data_events[3:]
+
+
+def test_detached_stream_cancelled_without_reader():
+    """If nobody reconnects within the grace period the chat generator is closed"""
+    client = InMemoryStreamRedis()
+    stream_id = new_stream_id()
+    closed = []
+    original = stream_replay.STREAM_RESUME_GRACE, stream_replay.PRESENCE_CHECK_INTERVAL
+    stream_replay.STREAM_RESUME_GRACE, stream_replay.PRESENCE_CHECK_INTERVAL = -1, 0
+    try:
+        stream = publish_stream(stream_id, _events(closed, count=50), client=client)
+        next(stream)
+        stream.close()
+    finally:
+        stream_replay.STREAM_RESUME_GRACE, stream_replay.PRESENCE_CHECK_INTERVAL = original
+
+    assert closed == [True]
+    recorded = client.streams[stream_replay.stream_key(stream_id)]
+    assert len(recorded) < 50
+    assert 'end' in recorded[-1][1]
+
+
+def test_detached_stream_kept_for_reader():
+    """With a reader attached the detached stream is recorded to the end"""
+    client = InMemoryStreamRedis()
+    stream_id = new_stream_id()
+    closed = []
+    client.set(stream_replay.reader_key(stream_id), '1')
+
+    stream = publish_stream(stream_id, _events(closed, count=10), client=client)
+    next(stream)
+    stream.close()
+
+    assert closed == []
+    assert len(list(replay_stream(stream_id, 0, client=client))) == 10
+
+
+def test_without_redis_events_pass_through():
+    """Without Redis the chat generator is served unchanged"""
+    original = stream_replay.get_stream_client
+    stream_replay.get_stream_client = lambda: None
+    try:
+        sent = list(publish_stream(new_stream_id(), _events([], count=2)))
+    finally:
+        stream_replay.get_stream_client = original
+    assert sent == list(_events([], count=2))
+
+
+if __name__ == "__main__":
+    test_event_ids()
+    test_replay_after_last_event()
+    test_detached_stream_cancelled_without_reader()
+    test_detached_stream_kept_for_reader()
+    test_without_redis_events_pass_through()
+    logger.info("Stream replay tests passed")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test the cached user context: the principal serves cached flags without the
+User row and delegates everything else to it, a bundle is built once and then
+served from cache, and invalidation makes the next request rebuild it.
+"""
+import sys
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+from flask import Flask
+
+import user_context
+from redis_cache import RedisCache
+from user_context import UserPrincipal, get_user_context, invalidate_user_context, orm_user
+
+
+class DictRedisClient:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+
+class FakeUserRow:
+    def __init__(self):
+        self.credits = 500
+        self.enable_memory = True
+        self.paypal_email = 'old@example.com'
+
+
+FIELDS = {'id': 7, 'username': 'ana', 'email': 'ana@example.com', 'user_is_active': True,
+          'enable_memory': True, 'enable_model_fallback': False, 'enable_identity_prompt': True}
+
+
+def _use_cache():
+    cache = RedisCache(namespace='test_user_context', local_cache=True)
+    cache.redis_client = DictRedisClient()
+    user_context._cache = cache
+    return cache
+
+
+# Each request is modelled by a fresh application context (and so a fresh g)
+app = Flask(__name__)
+
+
+def test_principal_fields_and_delegation():
+    """Cached fields need no row; other reads and all writes go to the row"""
+    principal = UserPrincipal(FIELDS)
+    assert principal.get_id() == '7'
+    assert principal.enable_model_fallback is False
+    assert principal.__dict__['_user'] is None
+
+    row = FakeUserRow()
+    principal.__dict__['_user'] = row
+    assert principal.paypal_email == 'old@example.com'
+    principal.enable_memory = False
+    principal.paypal_email = 'new@example.com'
+    assert row.enable_memory is False and row.paypal_email == 'new@example.com'
+    assert principal.enable_memory is False
+    assert orm_user(principal) is row
+
+
+def test_bundle_cached_and_invalidated():
+    """One build per change: cached across requests, rebuilt after invalidation"""
+    _use_cache()
+    builds = []
+
+    def build(user_id):
+        builds.append(user_id)
+        return {'user': dict(FIELDS), 'balance': 500,
+                'chat_settings': {'temperature': 0.3}, 'preferences': {'1': 'openai/gpt-4o'}}
+
+    original_build = user_context.build_user_context
+    user_context.build_user_context = build
+    try:
+        with app.app_context():
+            assert get_user_context(7)['chat_settings'] == {'temperature': 0.3}
+            assert get_user_context('7') is get_user_context(7)
+        with app.app_context():
+            assert get_user_context(7)['preferences'] == {'1': 'openai/gpt-4o'}
+            assert builds == [7]
+            invalidate_user_context(7)
+        with app.app_context():
+            get_user_context(7)
+            assert builds == [7, 7]
+    finally:
+        user_context.build_user_context = original_build
+
+
+def test_without_redis_callers_query_directly():
+    """No cache: get_user_context returns None so callers keep their own queries"""
+    cache = _use_cache()
+    cache.redis_client = None
+    with app.app_context():
+        assert get_user_context(7) is None
+
+
+if __name__ == "__main__":
+    test_principal_fields_and_delegation()
+    test_bundle_cached_and_invalidated()
+    test_without_redis_callers_query_directly()
+    logger.info("User context tests passed")
@@ -86,14 +86,19 @@ def update_database_pdf_support():
     logger.info(f"Found {len(pdf_model_ids)} PDF-capable models")
     
     try:
+        previous = {model_id for (model_id,) in db.session.query(OpenRouterModel.model_id)
+                    .filter(OpenRouterModel.supports_pdf.is_(True))}
+        
         # First, reset all models' PDF support to False
         db.session.query(OpenRouterModel).update({OpenRouterModel.supports_pdf: False})
         
         # Then, set PDF support to True for identified models
+        enabled = set()
         for model_id in pdf_model_ids:
             model = OpenRouterModel.query.get(model_id)
             if model:
                 model.supports_pdf = True
+                enabled.add(model_id)
                 logger.info(f"Updated PDF support for {model.name} ({model_id})")
             else:
                 logger.warning(f"Model {model_id} not found in database")
@@ -101,6 +106,10 @@ def update_database_pdf_support():
         # Commit the changes
         db.session.commit()
         logger.info("Database updated successfully with PDF support information")
+        
+        # Tell clients and workers holding the catalog which models changed
+        from catalog_changelog import UPDATED, publish_catalog_changes
+        publish_catalog_changes({model_id: UPDATED for model_id in previous ^ enabled})
         return True
         
     except SQLAlchemyError as e:
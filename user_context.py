@@ -0,0 +1,208 @@
+"""
+User Context Module
+
+One cached bundle per signed-in user holding what most requests need: the
+user's flags, a balance snapshot, chat settings and preset preferences.
+
+Flask-Login's load_user returns a UserPrincipal built from the bundle, so an
+authenticated request no longer queries User, and chat() reads the feature
+flags and chat settings without further queries. Other User attributes (and
+any attribute assignment) go to the SQLAlchemy row, loaded on first use.
+
+Bundles are cached in process and in Redis (RedisCache near cache), and are
+loaded at most once per request. Routes that change any part of a bundle call
+invalidate_user_context after committing; the near cache drops the bundle in
+every worker. The balance snapshot is only as fresh as USER_CONTEXT_TTL and is
+used where the credit ledger is unavailable, never for charging.
+"""
+
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from flask import g, has_app_context
+from flask_login import UserMixin
+
+from database import db
+from redis_cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a bundle is cached in Redis (the in-process copy expires sooner)
+USER_CONTEXT_TTL = int(os.environ.get('USER_CONTEXT_TTL', '300'))
+
+# User columns kept in the bundle and served without loading the row
+PRINCIPAL_FIELDS = (
+    'id',
+    'username',
+    'email',
+    'user_is_active',
+    'enable_memory',
+    'enable_model_fallback',
+    'enable_identity_prompt',
+)
+
+_cache = None
+
+
+def _get_cache() -> Optional[RedisCache]:
+    """Get the bundle cache, or None while Redis is unavailable"""
+    global _cache
+    if _cache is None:
+        _cache = RedisCache(namespace='user_context', expire_time=USER_CONTEXT_TTL, local_cache=True)
+    return _cache if _cache.redis_client is not None else None
+
+
+class UserPrincipal(UserMixin):
+    """
+    current_user for requests authenticated from the session
+
+    Reads PRINCIPAL_FIELDS from the cached bundle. Anything else, and every
+    assignment, is delegated to the User row, loaded once on first use; call
+    invalidate_user_context after committing such a change.
+    """
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.__dict__['_fields'] = dict(fields)
+        self.__dict__['_user'] = None
+
+    @property
+    def orm_user(self):
+        """The SQLAlchemy User row behind this principal"""
+        user = self.__dict__['_user']
+        if user is None:
+            from models import User
+            user = db.session.get(User, self._fields['id'])
+            if user is None:
+                raise AttributeError(f"User {self._fields['id']} no longer exists")
+            self.__dict__['_user'] = user
+        return user
+
+    def __getattr__(self, name):
+        fields = self.__dict__['_fields']
+        if name in fields:
+            return fields[name]
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.orm_user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.orm_user, name, value)
+        if name in self._fields:
+            self._fields[name] = value
+
+    def __repr__(self):
+        return f"<UserPrincipal {self._fields.get('username')}>"
+
+
+def orm_user(user):
+    """
+    Get the SQLAlchemy User for current_user
+
+    Args:
+        user: A UserPrincipal, or a User (current_user on the login request itself)
+
+    Returns:
+        User: The mapped row (e.g. for db.session.refresh)
+    """
+    if isinstance(user, UserPrincipal):
+        return user.orm_user
+    if hasattr(user, '_get_current_object'):
+        return orm_user(user._get_current_object())
+    return user
+
+
+def build_user_context(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Read a user's bundle from the database
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        dict: {'user': {...}, 'balance', 'chat_settings', 'preferences'}, or
+            None if the user doesn't exist
+    """
+    from models import User, UserChatSettings, UserPreference
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    settings = UserChatSettings.query.filter_by(user_id=user_id).first()
+    preferences = UserPreference.query.filter_by(user_identifier=f"user_{user_id}").all()
+    return {
+        'user': {field: getattr(user, field) for field in PRINCIPAL_FIELDS},
+        'balance': user.credits,
+        'chat_settings': settings.to_dict() if settings else {},
+        'preferences': {str(p.preset_id): p.model_id for p in preferences},
+    }
+
+
+def get_user_context(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Get a user's bundle: from this request, the cache, or the database
+
+    The returned dict is shared; copy any part you modify.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        dict: The bundle, or None if the user doesn't exist or the cache is
+            unavailable (callers then query directly, as before)
+    """
+    user_id = int(user_id)
+    memo = None
+    if has_app_context():
+        memo = g.setdefault('_user_contexts', {})
+        if user_id in memo:
+            return memo[user_id]
+
+    cache = _get_cache()
+    if cache is None:
+        return None
+
+    key = str(user_id)
+    context = cache.get(key)
+    if context is None:
+        context = build_user_context(user_id)
+        if context is not None:
+            cache.set(key, context)
+
+    if memo is not None:
+        memo[user_id] = context
+    return context
+
+
+def invalidate_user_context(user_id: int):
+    """
+    Drop a user's bundle everywhere; call after committing a change to it
+
+    Args:
+        user_id: User ID
+    """
+    if has_app_context():
+        g.setdefault('_user_contexts', {}).pop(int(user_id), None)
+    cache = _get_cache()
+    if cache is not None:
+        cache.delete(str(user_id))
+
+
+def load_principal(user_id):
+    """
+    Load current_user for Flask-Login
+
+    Args:
+        user_id: User ID from the session
+
+    Returns:
+        UserPrincipal from the bundle, the User row if the cache is
+        unavailable, or None if the user doesn't exist
+    """
+    context = get_user_context(user_id)
+    if context is not None:
+        return UserPrincipal(context['user'])
+
+    from models import User
+    return db.session.get(User, int(user_id))
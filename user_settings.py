@@ -13,6 +13,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app import db
 from models import UserChatSettings
+from user_context import get_user_context, invalidate_user_context
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -211,6 +212,7 @@ def save_chat_settings():
         
         # Save to database
         db.session.commit()
+        invalidate_user_context(current_user.id)
         
         return jsonify({
             'success': True,
@@ -239,6 +241,11 @@ def init_user_settings(app):
 
 def get_chat_settings_for_user(user_id):
     """Get chat settings for a specific user (utility function for other modules)"""
+    # Usually already loaded with current_user; copied because callers adjust it
+    context = get_user_context(user_id)
+    if context is not None:
+        return dict(context['chat_settings'])
+    
     settings = UserChatSettings.query.filter_by(user_id=user_id).first()
     
     if settings:
@@ -259,14 +266,15 @@ def validate_model_specific_parameters(settings_dict, model_id):
     Returns:
         dict: The validated settings dictionary
     """
-    from models import OpenRouterModel
+    from model_catalog import get_model_catalog
     
     # If max_tokens is set, ensure it doesn't exceed the model's context length
     if 'max_tokens' in settings_dict and settings_dict['max_tokens'] is not None:
-        model = OpenRouterModel.query.filter_by(model_id=model_id).first()
+        catalog = get_model_catalog()
+        context_length = catalog.context_length(model_id) if catalog else None
         
-        if model and model.context_length:
+        if context_length:
             # Cap max_tokens at model's context length
-            settings_dict['max_tokens'] = min(settings_dict['max_tokens'], model.context_length)
+            settings_dict['max_tokens'] = min(settings_dict['max_tokens'], context_length)
     
     return settings_dict
\ No newline at end of file